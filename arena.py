@@ -0,0 +1,32 @@
+import argparse
+import os
+
+from src.arena import AGENT_FACTORIES, run_arena
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='plays AI agents against each other without a window')
+    parser.add_argument('--agents', nargs='+', choices=sorted(AGENT_FACTORIES), default=['heuristic', 'random'], help='agents to compare')
+    parser.add_argument('--games', type=int, default=10000, help='total number of games')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='games with the same seed and index are the same')
+    parser.add_argument('--record', default=None, help='append all the games to this game log')
+
+    return parser.parse_args()
+
+
+def print_progress(results, games_per_second):
+    print(f'\r{results.games} games, {games_per_second:.0f} games/s', end='', flush=True)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if len(set(args.agents)) < 2:
+        raise SystemExit('at least two different agents are needed')
+
+    results = run_arena(args.agents, args.games, workers=args.workers, seed=args.seed, on_progress=print_progress, record_path=args.record)
+
+    print()
+    print(results.format_report())
+    print(f'\n{results.games_per_second:.0f} games/s on {args.workers} workers, {results.games_per_second / args.workers:.0f} games/s per worker')
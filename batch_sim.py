@@ -0,0 +1,45 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.batch_simulator import BatchSimulator, check_against_scalar_rules
+from src.weights import HeuristicWeights, DEFAULT_WEIGHTS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='plays the heuristic agent against itself in NumPy batches')
+    parser.add_argument('--games', type=int, default=1_000_000, help='total number of games')
+    parser.add_argument('--batch-size', type=int, default=100_000, help='number of games played in lockstep')
+    parser.add_argument('--seed', type=int, default=0, help='the same seed plays the same games')
+    parser.add_argument('--weights', default=None, help='weights of the heuristic agent, written by tune.py')
+    parser.add_argument('--check', type=int, default=None, metavar='GAMES',
+                        help='instead compare the outcome statistics of that many games with the scalar rules')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    weights = HeuristicWeights.load(args.weights) if args.weights is not None else DEFAULT_WEIGHTS
+
+    if args.check is not None:
+        stats, ok = check_against_scalar_rules(args.check, args.seed, weights)
+
+        for name in ('batch', 'scalar'):
+            print(f"{name:6}: user win rate {stats[name]['user_win_rate']:.4f}, mean length {stats[name]['mean_length']:.2f}, "
+                  f"{stats[name]['games_per_second']:.0f} games/s")
+        print(f"z of the win rate {stats['win_rate_z']:+.2f}, z of the mean length {stats['length_z']:+.2f}")
+
+        if not ok:
+            raise SystemExit('the batch simulator does not match the scalar rules')
+    else:
+        simulator = BatchSimulator(weights, args.seed)
+
+        started_at = time.perf_counter()
+        winners, lengths = simulator.run(args.games, args.batch_size)
+        seconds = time.perf_counter() - started_at
+
+        print(f'user wins {np.mean(winners == 0):.4f}, agent wins {np.mean(winners == 1):.4f}, not finished {np.mean(winners == -1):.4f}')
+        print(f'mean length {lengths.mean():.2f} actions')
+        print(f'{args.games / seconds:.0f} games/s, {simulator.actions / seconds:.0f} actions/s')
@@ -0,0 +1,56 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # headless, before pygame is imported
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+
+import pygame as pg
+
+from src.benchmarks import BENCHMARKS, DEFAULT_THRESHOLD, run_benchmarks, compare_with_baseline, format_results, format_comparison
+
+BASELINE_PATH = 'benchmark_baseline.json'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='measures AI latency, the evaluation cache and the turn planner, animation and frame cost, deck and search state operations and startup')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='compare with the results in this JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to the baseline file instead of comparing')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='relative change of a median, that is a regression')
+
+    return parser.parse_args()
+
+
+def print_progress(name, seconds):
+    print(f'{name}: {seconds:.1f} s')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    pg.init()
+
+    results = run_benchmarks(args.only, on_benchmark=print_progress)
+    print(format_results(results))
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=4)
+
+        print(f'baseline saved to {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            comparison = compare_with_baseline(results, json.load(file), args.threshold)
+
+        print(format_comparison(comparison, args.threshold))
+
+        if any(is_regression for *_, is_regression in comparison):
+            raise SystemExit(1)
+    else:
+        print(f'no baseline at {args.baseline}, run with --save-baseline to create it')
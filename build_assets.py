@@ -0,0 +1,24 @@
+import argparse
+import time
+
+from src.asset_pack import ASSET_PACK_PATH, PACK_RENDER_SCALES, AssetPack, build_asset_pack
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='packs all the images, decoded and scaled, into one file, that the game maps at startup')
+    parser.add_argument('--output', default=ASSET_PACK_PATH)
+    parser.add_argument('--scales', type=float, nargs='+', default=list(PACK_RENDER_SCALES), help='render scales to pack the images for')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    started_at = time.perf_counter()
+    build_asset_pack(args.output, args.scales)
+
+    with AssetPack(args.output) as pack:
+        stats = pack.stats()
+
+    print(f"{stats['entries']} images, {stats['bytes'] / 2**20:.1f} MB, built in {time.perf_counter() - started_at:.1f} s")
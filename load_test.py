@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+
+from src.load_test import run_load_test
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='plays many games against the game server at once and measures the move latency')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8101)
+    parser.add_argument('--unix', default=None, help='connect to this Unix socket instead of TCP')
+    parser.add_argument('--sessions', type=int, default=1000, help='games going on at once')
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds')
+    parser.add_argument('--think-time', type=float, default=0.5, help='average pause of a player before a move, seconds')
+    parser.add_argument('--seed', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    results, server_stats = asyncio.run(run_load_test(
+        sessions=args.sessions,
+        connections=args.connections,
+        duration_s=args.duration,
+        think_time_s=args.think_time,
+        host=args.host,
+        port=args.port,
+        unix_path=args.unix,
+        seed=args.seed,
+    ))
+
+    print(results.format_report())
+    print(f"server: {server_stats['sessions']} sessions, {server_stats['bytes_per_session']} bytes per session")
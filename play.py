@@ -1,6 +1,22 @@
+import time
+
+STARTED_AT = time.perf_counter()  # before the heavy imports, so they are counted in the startup time
+
+import argparse
+
 import pygame as pg
 
+from src.agent import HeuristicAgent
+from src.asset_pack import ASSET_PACK_PATH, AssetPack
+from src.const import FPS, AGENT, AI_DEADLINE_MS, RENDER_SCALE
 from src.controller import GameController
+from src.endgame import EndgameSolver, format_endgame_stats
+from src.game_record import MAX_SEED, GameLog, GameRecordWriter
+from src.mcts import MCTSAgent
+from src.planner import PlanningAgent
+from src.profiler import FrameProfiler
+from src.surface_cache import surface_cache
+from src.weights import HeuristicWeights, DEFAULT_WEIGHTS
 
 pg.mixer.pre_init(22100, -16, 2, 64)
 pg.init()
@@ -9,6 +25,99 @@ s = pg.mixer.Sound('./src/sounds/forbidden-sournd.wav')
 s.set_volume(0.1)
 
 
+def parse_seed(value):
+    seed = int(value)
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f'the seed has to be from 0 to {MAX_SEED}, so it fits the game log')
+
+    return seed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='101 card game against the AI opponent')
+    parser.add_argument('--fps', type=int, default=FPS, help='frame rate cap, used while the cards are moving')
+    parser.add_argument('--render-scale', type=float, default=RENDER_SCALE, help='internal resolution relative to 1920x1080, e.g. 0.5 on slow machines')
+    parser.add_argument('--asset-pack', default=ASSET_PACK_PATH, help='the asset pack to map, it is built if it is missing or stale')
+    parser.add_argument('--no-asset-pack', action='store_true', help='decode the images instead of mapping the prebuilt asset pack')
+    parser.add_argument('--agent', choices=['heuristic', 'endgame', 'mcts', 'planner'], default='heuristic', help='the AI opponent')
+    parser.add_argument('--weights', default=None, help='weights of the heuristic agent, written by tune.py')
+    parser.add_argument('--eval-cache', action='store_true', help='keep the valued moves of the heuristic agent in the evaluation cache')
+    parser.add_argument('--ai-time-ms', type=int, default=500, help='time budget of one MCTS decision')
+    parser.add_argument('--ai-rollouts', type=int, default=None, help='max number of rollouts of one MCTS decision')
+    parser.add_argument('--ai-deadline-ms', type=int, default=AI_DEADLINE_MS, help='after that a quick fallback move is made instead of the AI move')
+    parser.add_argument('--ai-stats', action='store_true', help='print rollouts per second and tree size of every MCTS decision, the planning time of every planned turn, or the endgame table hit rate after every endgame search')
+    parser.add_argument('--seed', type=parse_seed, default=None, help=f'seed of the deck from 0 to {MAX_SEED}, the same seed deals the same cards')
+    parser.add_argument('--record', default=None, help='append the game to this game log')
+    parser.add_argument('--replay', default=None, help='show a game from this game log instead of playing')
+    parser.add_argument('--game', type=int, default=-1, help='index of the replayed game in the log, the last one by default')
+    parser.add_argument('--speed', type=float, default=1.0, help='speed of the replay')
+    parser.add_argument('--profile', action='store_true', help='time every phase of every frame, F3 shows the timings')
+    parser.add_argument('--startup-time', action='store_true', help='print the time to the first frame and quit')
+    parser.add_argument('--profile-export', default=None, help='write the timings of every frame to this .csv or .jsonl file')
+
+    return parser.parse_args()
+
+
+def print_decision_stats(stats):
+    print(f"rollouts: {stats['rollouts']}, rollouts/s: {stats['rollouts_per_second']:.0f}, "
+          f"tree size: {stats['tree_size']}, time: {stats['time_ms']:.1f} ms")
+
+
+def print_plan_stats(stats):
+    print(f"plan of {stats['plan_length']} actions: {stats['sequences']} sequences, {stats['nodes']} positions, "
+          f"{stats['pruned']} pruned, time: {stats['time_ms']:.1f} ms")
+
+
+def print_endgame_stats(stats):
+    print('\n'.join(format_endgame_stats(stats)))
+
+
+def print_startup_time():
+    print(f'first frame after {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms')
+    print('\n'.join(surface_cache.format_report()))  # the images decoded on demand held up the first frame
+    raise SystemExit
+
+
+def create_agent(args):
+    if args.agent == 'mcts':
+        return MCTSAgent(
+            AGENT,
+            time_budget_ms=args.ai_time_ms,
+            max_rollouts=args.ai_rollouts,
+            on_decision=print_decision_stats if args.ai_stats else None,
+        )
+
+    weights = HeuristicWeights.load(args.weights) if args.weights is not None else DEFAULT_WEIGHTS
+
+    if args.agent == 'planner':
+        return PlanningAgent(AGENT, weights=weights, on_plan=print_plan_stats if args.ai_stats else None)
+
+    if args.agent == 'endgame':
+        return HeuristicAgent(AGENT, endgame_solver=EndgameSolver(on_solve=print_endgame_stats if args.ai_stats else None), weights=weights, use_evaluation_cache=args.eval_cache)
+
+    return HeuristicAgent(AGENT, weights=weights, use_evaluation_cache=args.eval_cache)
+
+
 if __name__ == '__main__':
-    game = GameController(sound_controller=s)
+    args = parse_args()
+
+    replay = None
+    if args.replay is not None:
+        with GameLog(args.replay) as game_log:
+            replay = game_log[args.game]
+
+    game = GameController(
+        sound_controller=s,
+        fps=args.fps,
+        agent=create_agent(args),
+        seed=args.seed,
+        game_log=GameRecordWriter.open(args.record) if args.record is not None else None,
+        replay=replay,
+        replay_speed=args.speed,
+        profiler=FrameProfiler(export_path=args.profile_export) if args.profile or args.profile_export else None,
+        on_first_frame=print_startup_time if args.startup_time else None,
+        ai_deadline_ms=args.ai_deadline_ms,
+        render_scale=args.render_scale,
+        asset_pack=None if args.no_asset_pack else AssetPack.open(args.asset_pack),
+    )
     game.main_loop()
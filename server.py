@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+
+from src.server import run_server, MAX_SESSIONS, SESSION_IDLE_TIMEOUT_S, AGENT_WORKERS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='serves many 101 games against the AI opponent over a JSON lines protocol')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8101)
+    parser.add_argument('--unix', default=None, help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--max-sessions', type=int, default=MAX_SESSIONS)
+    parser.add_argument('--idle-timeout', type=float, default=SESSION_IDLE_TIMEOUT_S, help='seconds, after that an idle session is dropped')
+    parser.add_argument('--agent-workers', type=int, default=AGENT_WORKERS, help='threads making the moves of the agent')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    asyncio.run(run_server(
+        host=args.host,
+        port=args.port,
+        unix_path=args.unix,
+        max_sessions=args.max_sessions,
+        idle_timeout_s=args.idle_timeout,
+        agent_workers=args.agent_workers,
+    ))
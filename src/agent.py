@@ -0,0 +1,279 @@
+from operator import itemgetter
+from random import Random
+
+from src.card import CARDS, CARDS_BY_BIT
+from src.const import DRAW, PASS, Rank, Suit, SUITS, RANKS, RANK_MASKS, SUIT_MASKS, CARD_BITS, iterate_bits
+from src.endgame import ENDGAME_MAX_HAND_SIZE, ENDGAME_TOLERANCE
+from src.evaluation_cache import get_shared_cache
+from src.weights import DEFAULT_WEIGHTS
+
+
+class HeuristicAgent:
+    """
+        Greedy agent, that values every possible move with a table of points (HeuristicWeights) and makes the best one.
+
+        The agent does not touch the game by itself, choose_action only returns the action,
+        which then has to be applied with RulesEngine.apply.
+
+        All the counting is made on the bitboard of the hand (see CARD_BITS), so it does not depend on the number of cards.
+
+        Under a Six, that it can not cover, the agent draws cards until it can cover the Six or nothing is left to draw,
+        as RulesEngine lets every player do (DRAW keeps can_get_new_card while six_in_action). The agent of the original
+        GameController drew only one card there and then finished its move with the Six uncovered, which was not
+        allowed to the user. So the results of the games played with RulesEngine (arena.py, tune.py) are not comparable
+        with the ones played by that agent.
+
+        With an EndgameSolver, when the opponent has one card left and the hand of the agent is small, the agent checks
+        its move with the search: if another action gives the opponent a noticeably lower chance to go out, it is made instead.
+
+        With use_evaluation_cache the ranked moves of a position are kept in the EvaluationCache of the weights,
+        shared by all the agents with the same weights. It is off by default: valuing the moves of a bitboard hand
+        costs about as much as the canonical key, and few positions come again in different games,
+        so it pays off only when the same positions are valued many times (compare with benchmark.py --only ai_cache).
+    """
+
+    def __init__(self, player, endgame_solver=None, weights=DEFAULT_WEIGHTS, use_evaluation_cache=False):
+        self.player = player
+        self.endgame_solver = endgame_solver
+        self.weights = weights
+        self.evaluation_cache = get_shared_cache(weights) if use_evaluation_cache else None
+
+    def choose_action(self, rules):
+        action = self._choose_heuristic_action(rules)
+
+        if self.endgame_solver is not None and self._is_endgame(rules):
+            chances = self.endgame_solver.solve(rules, self.player)
+
+            if chances is not None:
+                best_action = min(chances, key=chances.get)
+                if chances[best_action] < chances.get(action, 1.0) - ENDGAME_TOLERANCE:
+                    return best_action
+
+        return action
+
+    def _choose_heuristic_action(self, rules):
+        ranked_moves = self.get_ranked_moves(rules)
+
+        if ranked_moves:  # the best move is made
+            return rules.deck.cards_by_bit[ranked_moves[0][1]]
+
+        if rules.state.can_through_only_by_rank and rules.deck.card_in_action.rank != Rank.six:
+            return PASS  # nothing to through up, so the move is finished
+
+        if rules.can_draw_card():
+            return DRAW  # getting a card from a deck, and checking if there are any possible moves on the next call (under a Six again and again)
+
+        return PASS  # we still have no possible moves, and we have already got a card from a deck
+
+    def get_ranked_moves(self, rules):
+        """
+            The moves the agent can make now, as (points, bit), from the best one to the worst one
+            (the lowest bit first of the equal ones). Without any, the agent draws a card or passes.
+        """
+
+        state = rules.state
+        hand_bits = state.get_player_cards(self.player).bits
+        card_in_action = rules.deck.card_in_action
+        only_by_rank = state.can_through_only_by_rank
+        in_danger = len(state.get_player_cards(state.get_opponent(self.player))) == 1
+
+        if card_in_action is None:
+            return self._rank_moves(hand_bits, None, only_by_rank, in_danger)
+
+        if self.evaluation_cache is None or self._has_one_move_at_most(hand_bits, card_in_action, only_by_rank):
+            return self._rank_moves(hand_bits, card_in_action.id, only_by_rank, in_danger)  # a single move is not worth a cache entry
+
+        return self.evaluation_cache.get_ranked_moves(hand_bits, card_in_action.id, only_by_rank, in_danger, self._rank_moves)
+
+    @staticmethod
+    def _has_one_move_at_most(hand_bits, card_in_action, only_by_rank):
+        if only_by_rank:
+            moves = hand_bits & RANK_MASKS[card_in_action.rank]  # a Six in action is not counted exactly, it is just not cached
+        else:
+            moves = hand_bits & (RANK_MASKS[card_in_action.rank] | SUIT_MASKS[card_in_action.suit] | RANK_MASKS[Rank.jack])
+
+        return moves & (moves - 1) == 0
+
+    def _is_endgame(self, rules):
+        state = rules.state
+        opponent_cards = state.get_player_cards(state.get_opponent(self.player))
+
+        return len(opponent_cards) == 1 and len(state.get_player_cards(self.player)) <= ENDGAME_MAX_HAND_SIZE and rules.deck.card_in_action is not None
+
+    def _rank_moves(self, hand_bits, card_in_action_id, only_by_rank, in_danger):
+        """
+            get_ranked_moves of the position, depends only on the arguments, so it can be cached.
+
+            After a move only the cards of the same rank can be thrown up, like:
+                I have three cards: 9 spades 9 diamonds and 9 hearts, so I can make a move with 9 spades
+                and through up 9 diamonds and 9 hearts.
+        """
+
+        card_in_action = CARDS[card_in_action_id] if card_in_action_id is not None else None
+
+        if only_by_rank and card_in_action.rank == Rank.six:
+            return self._rank_sequences_to_cover_six(hand_bits, card_in_action.suit)
+
+        if only_by_rank:
+            moves = hand_bits & RANK_MASKS[card_in_action.rank]  # cards we can through up
+        else:
+            moves = self._get_all_possible_moves(hand_bits, card_in_action)
+
+        ranked_moves = [(self._value_the_move(hand_bits, CARDS_BY_BIT[bit], in_danger), bit) for bit in iterate_bits(moves)]
+        if len(ranked_moves) > 1:
+            ranked_moves.sort(key=itemgetter(0), reverse=True)  # the sort is stable, so the equal moves stay from the lowest bit
+
+        return ranked_moves
+
+    def _value_the_move(self, hand_bits, move_card, in_danger=False) -> int:
+        """
+            This function calculates the value of the move.
+
+            move_card is object of Card from the hand of the agent.
+        """
+
+        if in_danger:  # if user have only 1 card, the game is almost over, and we got to play aggressive in order not to lose
+            return self._value_the_move_in_danger_situation(hand_bits, move_card)  # so in danger situation, the value of moves that makes our opponent get cards are higher
+
+        weights = self.weights
+        suit, rank = move_card.suit, move_card.rank
+        move_points = weights.rank_points[rank]  # getting initial points of our card
+        same_rank_cards = self._count_cards_with_specific_rank(hand_bits, rank)
+
+        if rank == Rank.queen and suit == Suit.spades:  # adding points if it is queen spades
+            move_points += weights.queen_of_spades
+
+        move_points += (same_rank_cards - 1) * weights.same_rank  # counting the number of cards we can through up and giving extra points if there are any
+        move_points += (same_rank_cards - 1) * weights.rank_points[rank]  # we need it, so the sequence of two Aces will value more than two 9.
+
+        if self._count_cards_with_specific_suit(hand_bits, suit) == 1 and same_rank_cards == 1:
+            move_points -= weights.lonely_suit  # decreasing our points if we don't have the suit we are going to through
+
+        if rank == Rank.six:  # if our move is Six, we find the best sequence which we can cover this Six with
+            move_points += self._find_max_rank_sequence(hand_bits, suit).bit_count() * weights.six_sequence
+
+        return move_points
+
+    def _get_all_possible_moves(self, hand_bits, card_in_action):
+        """
+            Returns bitboard of the cards Agent can through, as RulesEngine.get_possible_moves_mask after a finished move.
+        """
+
+        moves = hand_bits
+        if card_in_action is not None:
+            moves &= RANK_MASKS[card_in_action.rank] | SUIT_MASKS[card_in_action.suit] | RANK_MASKS[Rank.jack]
+
+        for six_bit in iterate_bits(moves & RANK_MASKS[Rank.six]):
+            six_card = CARDS_BY_BIT[six_bit]
+
+            if not self._can_cover_six(hand_bits, six_card.suit):  # if we have a Six, but we have nothing to "cover" it, we won't through this Six
+                moves &= ~six_bit
+
+        return moves
+
+    def _value_the_move_in_danger_situation(self, hand_bits, move_card):
+        """
+            This method counts the points of the move in danger situation, when Agent on the edge of losing.
+
+            In such situation, we have to make moves that makes our opponent take cards.
+        """
+
+        weights = self.weights
+        suit, rank = move_card.suit, move_card.rank
+        move_points = weights.rank_points[rank]
+        same_rank_cards = self._count_cards_with_specific_rank(hand_bits, rank)
+
+        if rank == Rank.seven:
+            move_points += weights.danger_seven * same_rank_cards
+
+        if rank == Rank.eight:
+            move_points += weights.danger_eight * same_rank_cards
+
+        if rank == Rank.queen and suit == Suit.spades:
+            move_points += weights.danger_queen_of_spades
+
+        if self._count_cards_with_specific_suit(hand_bits, suit) == 1 and same_rank_cards == 1:
+            move_points -= weights.danger_lonely_suit
+
+        return move_points
+
+    @staticmethod
+    def _count_cards_with_specific_rank(hand_bits, rank):
+        return (hand_bits & RANK_MASKS[rank]).bit_count()
+
+    @staticmethod
+    def _count_cards_with_specific_suit(hand_bits, suit):
+        return (hand_bits & SUIT_MASKS[suit]).bit_count()
+
+    def _can_cover_six(self, hand_bits, six_suit, check_another_sixs=True):
+        if self._count_cards_with_specific_suit(hand_bits, six_suit) > 1:
+            return True
+
+        if check_another_sixs:
+            another_sixs = hand_bits & RANK_MASKS[Rank.six] & ~SUIT_MASKS[six_suit]
+
+            return any(self._can_cover_six(hand_bits, suit, check_another_sixs=False) for suit in SUITS if another_sixs & SUIT_MASKS[suit])
+
+        return False
+
+    def _find_best_sequence_to_cover_six(self, hand_bits, six_suit):
+        """
+            Returns the bit of the card, that has to be thrown first to cover the Six of six_suit with the longest sequence.
+        """
+
+        ranked_moves = self._rank_sequences_to_cover_six(hand_bits, six_suit)
+
+        return ranked_moves[0][1] if ranked_moves else 0
+
+    def _rank_sequences_to_cover_six(self, hand_bits, six_suit):
+        """
+            The cards, that can be thrown first to cover the Six of six_suit: a card of the suit, that starts the longest
+            sequence, and the other Sixes, that go with their own sequences. The points are twice the length of the sequence,
+            plus one for the card of the suit, so it wins over a Six with the sequence of the same length.
+        """
+
+        ranked_moves = []
+
+        max_sequence = self._find_max_rank_sequence(hand_bits, six_suit)
+        if max_sequence:
+            ranked_moves.append((2 * max_sequence.bit_count() + 1, max_sequence & SUIT_MASKS[six_suit]))
+
+        for suit in SUITS:
+            six_bit = CARD_BITS[Rank.six, suit]
+
+            if suit != six_suit and hand_bits & six_bit:
+                ranked_moves.append((2 * (self._find_max_rank_sequence(hand_bits, suit).bit_count() + 1), six_bit))
+
+        ranked_moves.sort(key=itemgetter(0), reverse=True)  # the Sixes were added from the lowest bit
+
+        return ranked_moves
+
+    def _find_max_rank_sequence(self, hand_bits, suit):
+        """
+            Returns bitboard of the largest group of cards with the same rank, that contains a card of the suit (Sixes are not counted).
+        """
+
+        max_sequence = 0
+        suit_cards = hand_bits & SUIT_MASKS[suit] & ~RANK_MASKS[Rank.six]
+
+        for rank in RANKS:
+            if suit_cards & RANK_MASKS[rank]:
+                sequence = hand_bits & RANK_MASKS[rank]
+
+                if sequence.bit_count() > max_sequence.bit_count():
+                    max_sequence = sequence
+
+        return max_sequence
+
+
+class RandomAgent:
+    """
+        Makes a random legal action. Used as the weakest opponent and as a fast rollout policy.
+    """
+
+    def __init__(self, player, rng: Random = None):
+        self.player = player
+        self.rng = rng if rng is not None else Random()
+
+    def choose_action(self, rules):
+        return self.rng.choice(rules.get_legal_actions())
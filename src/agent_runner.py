@@ -0,0 +1,106 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.agent import HeuristicAgent
+from src.const import AI_DEADLINE_MS
+
+
+class AgentRunner:
+    """
+        Lets an agent think in a worker thread, so the main loop keeps handling events and animating meanwhile.
+
+        The agent gets a clone of the game, never the game itself. Every request is tagged with the version
+        of the game (the number of the actions applied so far): if the game has changed before the agent is done,
+        its action is stale and is thrown away. If the agent is not done by the deadline, it is asked to stop
+        (if it can), and the fallback agent makes the move instead.
+
+        An agent with plan_turn (PlanningAgent) is asked for the whole rest of its turn at once, any other agent
+        for one action, so poll always returns a list of actions.
+    """
+
+    def __init__(self, agent, deadline_ms=AI_DEADLINE_MS, fallback_agent=None, latency_window=100):
+        self.agent = agent
+        self.deadline_ms = deadline_ms
+        self.fallback_agent = fallback_agent if fallback_agent is not None else HeuristicAgent(agent.player)
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='agent')
+        self.future = None
+        self.requested_version = None
+        self.requested_at = 0.0
+
+        self.latencies_ms = deque(maxlen=latency_window)
+        self.last_latency_ms = None
+        self.decisions = 0
+        self.fallbacks = 0
+        self.stale_results = 0
+
+    def poll(self, rules, version):
+        """
+            Returns the actions of the agent for the game rules at the given version, or None if they are not ready yet.
+            The first poll of a version starts the thinking.
+        """
+
+        if self.future is not None and self.requested_version != version:
+            self._drop_request()
+            self.stale_results += 1
+
+        if self.future is None:
+            self.future = self.executor.submit(self._think, rules.clone())
+            self.requested_version = version
+            self.requested_at = time.perf_counter()
+            return None
+
+        if self.future.done():
+            actions = self.future.result()
+            self.future = None
+            self._record_latency()
+            return actions
+
+        if (time.perf_counter() - self.requested_at) * 1000 >= self.deadline_ms:
+            self._drop_request()
+            self.fallbacks += 1
+            self._record_latency()
+            return [self.fallback_agent.choose_action(rules)]
+
+        return None
+
+    def _think(self, rules):
+        plan_turn = getattr(self.agent, 'plan_turn', None)
+        if plan_turn is not None:
+            return plan_turn(rules)
+
+        return [self.agent.choose_action(rules)]
+
+    def _drop_request(self):
+        """
+            Forgets the running request, its result will be ignored. The agent is asked to stop, as nobody needs it.
+        """
+
+        stop = getattr(self.agent, 'stop', None)
+        if stop is not None:
+            stop()
+
+        self.future = None
+
+    def _record_latency(self):
+        self.last_latency_ms = (time.perf_counter() - self.requested_at) * 1000
+        self.latencies_ms.append(self.last_latency_ms)
+        self.decisions += 1
+
+    def format_report(self):
+        latencies = sorted(self.latencies_ms)
+        if not latencies:
+            return ['ai: no decisions']
+
+        p50 = latencies[(len(latencies) - 1) // 2]
+        p95 = latencies[round((len(latencies) - 1) * 0.95)]
+
+        return [
+            f'ai latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, last {self.last_latency_ms:.1f} ms',
+            f'ai decisions {self.decisions}, fallbacks {self.fallbacks}, stale {self.stale_results}',
+        ]
+
+    def close(self):
+        self._drop_request()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,129 @@
+import time
+
+import numpy as np
+
+from src.const import MOVE_SPEED
+
+MIN_MOVE_DURATION = 0.05  # seconds, so even a short move is visible
+
+
+def linear(t):
+    return t
+
+
+def ease_out_cubic(t):
+    return 1 - (1 - t) ** 3
+
+
+def ease_in_out_quad(t):
+    return np.where(t < 0.5, 2 * t * t, 1 - (-2 * t + 2) ** 2 / 2)
+
+
+EASINGS = {
+    'linear': linear,
+    'ease_out_cubic': ease_out_cubic,
+    'ease_in_out_quad': ease_in_out_quad,
+}
+
+
+class Animator:
+    """
+        Moves sprites with time-based tweens.
+
+        Start and end positions, start times and durations of all the active tweens are kept in contiguous arrays,
+        so one update is a few vectorized operations, however many cards are flying. The position depends only
+        on the elapsed time, so a slow frame does not slow the animation down.
+
+        A sprite has at most one tween: a new move of a sprite, that is still moving, starts from where it is now.
+    """
+
+    def __init__(self, easing='ease_out_cubic', capacity=64, clock=time.perf_counter):
+        self.easing = EASINGS[easing]
+        self.clock = clock
+
+        self.starts = np.zeros((capacity, 2))
+        self.ends = np.zeros((capacity, 2))
+        self.start_times = np.zeros(capacity)
+        self.durations = np.ones(capacity)
+
+        self.sprites = []  # sprites[i] is moved by the tween i, only the first len(sprites) rows of the arrays are active
+        self.slots = {}  # sprite -> index of its tween
+
+    def is_animating(self):
+        return len(self.sprites) != 0
+
+    def move(self, sprites, dest_positions, speed=MOVE_SPEED):
+        """
+            Starts moving sprites to dest_positions with speed pixels per second.
+        """
+
+        now = self.clock()
+
+        for sprite, dest_position in zip(sprites, dest_positions):
+            slot = self.slots.get(sprite)
+            if slot is None:
+                slot = self._add_slot(sprite)
+
+            start = sprite.pos
+            distance = np.hypot(dest_position[0] - start[0], dest_position[1] - start[1])
+
+            self.starts[slot] = start
+            self.ends[slot] = dest_position
+            self.start_times[slot] = now
+            self.durations[slot] = max(distance / speed, MIN_MOVE_DURATION)
+
+    def update(self, now=None):
+        """
+            Puts all the moving sprites to their positions at the time now and drops the finished tweens.
+        """
+
+        active = len(self.sprites)
+        if active == 0:
+            return
+
+        if now is None:
+            now = self.clock()
+
+        progress = np.clip((now - self.start_times[:active]) / self.durations[:active], 0.0, 1.0)
+        eased = self.easing(progress)
+
+        starts = self.starts[:active]
+        positions = np.rint(starts + (self.ends[:active] - starts) * eased[:, None]).astype(int)
+
+        for sprite, position in zip(self.sprites, positions.tolist()):
+            sprite.pos = position
+
+        finished = progress >= 1.0
+        if finished.any():
+            self._remove_finished(finished)
+
+    def _add_slot(self, sprite):
+        slot = len(self.sprites)
+
+        if slot == len(self.start_times):
+            self._grow()
+
+        self.sprites.append(sprite)
+        self.slots[sprite] = slot
+
+        return slot
+
+    def _grow(self):
+        capacity = len(self.start_times) * 2
+
+        self.starts = np.resize(self.starts, (capacity, 2))
+        self.ends = np.resize(self.ends, (capacity, 2))
+        self.start_times = np.resize(self.start_times, capacity)
+        self.durations = np.resize(self.durations, capacity)
+
+    def _remove_finished(self, finished):
+        keep = np.flatnonzero(~finished)
+        active = len(keep)
+
+        self.starts[:active] = self.starts[keep]
+        self.ends[:active] = self.ends[keep]
+        self.start_times[:active] = self.start_times[keep]
+        self.durations[:active] = self.durations[keep]
+
+        self.sprites = [self.sprites[i] for i in keep.tolist()]
+        self.slots = {sprite: slot for slot, sprite in enumerate(self.sprites)}
@@ -0,0 +1,226 @@
+import io
+import math
+import struct
+import time
+from itertools import permutations
+from multiprocessing import Pool
+from random import Random
+
+from src.agent import HeuristicAgent, RandomAgent
+from src.const import USER, AGENT
+from src.endgame import EndgameSolver, format_endgame_stats
+from src.game_record import GameRecordWriter
+from src.mcts import MCTSAgent
+from src.planner import PlanningAgent
+from src.simulation import play_headless_game
+
+ARENA_MCTS_ROLLOUTS = 200
+GAMES_PER_TASK = 250
+
+AGENT_FACTORIES = {
+    'heuristic': lambda player, rng: HeuristicAgent(player),
+    'endgame': lambda player, rng: HeuristicAgent(player, endgame_solver=EndgameSolver()),
+    'planner': lambda player, rng: PlanningAgent(player),
+    'random': lambda player, rng: RandomAgent(player, rng),
+    'mcts': lambda player, rng: MCTSAgent(player, time_budget_ms=None, max_rollouts=ARENA_MCTS_ROLLOUTS, rng=rng),
+}
+
+# one record per game: game index, index of the agent in the first (USER) seat, index of the agent in the second seat, result
+GAME_RECORD = struct.Struct('<IBBB')
+FIRST_SEAT_WON, SECOND_SEAT_WON, NOT_FINISHED = 0, 1, 2
+
+ENDGAME_COUNTERS = ('solved', 'timeouts', 'hits', 'misses', 'evictions')  # EndgameSolver.stats, that are summed over the games
+
+
+def get_game_rng(seed, game_index):
+    """
+        Every game gets its own stream of random numbers, so the result of a game depends only on
+        (seed, game_index), and not on the worker or the order the games are played in.
+    """
+
+    return Random(seed * 1_000_003 + game_index)
+
+
+def play_games(task):
+    """
+        Worker function: plays games [first_game, first_game + games_number) and returns their packed results
+        and, if record_games is set, the records of the games for the game log, and the summed counters of the endgame solvers.
+    """
+
+    agent_names, pairings, seed, first_game, games_number, record_games = task
+    records = bytearray()
+    endgame_counters = dict.fromkeys(ENDGAME_COUNTERS, 0)
+    game_log = GameRecordWriter(io.BytesIO(), write_header=False) if record_games else None
+
+    for game_index in range(first_game, first_game + games_number):
+        first, second = pairings[game_index % len(pairings)]
+
+        game_rng = get_game_rng(seed, game_index)
+        user_agent = AGENT_FACTORIES[agent_names[first]](USER, Random(game_rng.getrandbits(64)))
+        agent_agent = AGENT_FACTORIES[agent_names[second]](AGENT, Random(game_rng.getrandbits(64)))
+
+        deck_seed = game_rng.getrandbits(32)
+        if game_log is not None:
+            game_log.start_game(deck_seed)
+
+        winner = play_headless_game(user_agent, agent_agent, rng=Random(deck_seed), listener=game_log)
+        result = FIRST_SEAT_WON if winner == USER else SECOND_SEAT_WON if winner == AGENT else NOT_FINISHED
+
+        records += GAME_RECORD.pack(game_index, first, second, result)
+
+        for agent in (user_agent, agent_agent):
+            endgame_solver = getattr(agent, 'endgame_solver', None)
+            if endgame_solver is not None:
+                stats = endgame_solver.stats()
+                for counter in ENDGAME_COUNTERS:
+                    endgame_counters[counter] += stats[counter]
+
+    if game_log is None:
+        return bytes(records), b'', endgame_counters
+
+    game_log.flush()
+    return bytes(records), game_log.file.getvalue(), endgame_counters
+
+
+class ArenaResults:
+    def __init__(self, agent_names):
+        self.agent_names = agent_names
+
+        agents_number = len(agent_names)
+        self.wins = [[0] * agents_number for _ in range(agents_number)]  # wins[a][b] - how many times a has beaten b
+        self.first_seat_wins = 0
+        self.not_finished = 0
+        self.games = 0
+        self.endgame_counters = dict.fromkeys(ENDGAME_COUNTERS, 0)
+
+    def add_records(self, records: bytes):
+        for _, first, second, result in GAME_RECORD.iter_unpack(records):
+            self.games += 1
+
+            if result == FIRST_SEAT_WON:
+                self.wins[first][second] += 1
+                self.first_seat_wins += 1
+            elif result == SECOND_SEAT_WON:
+                self.wins[second][first] += 1
+            else:
+                self.not_finished += 1
+
+    def add_endgame_counters(self, endgame_counters):
+        for counter, value in endgame_counters.items():
+            self.endgame_counters[counter] += value
+
+    def get_endgame_stats(self):
+        """
+            EndgameSolver.stats of all the endgame solvers of the arena together, or None, if none of the agents has one.
+        """
+
+        counters = self.endgame_counters
+        if not counters['solved'] and not counters['timeouts']:
+            return None
+
+        lookups = counters['hits'] + counters['misses']
+        return dict(counters, hit_rate=counters['hits'] / lookups if lookups else 0.0)
+
+    def get_win_rate(self, a, b):
+        """
+            Returns the win rate of a against b with its 95% Wilson confidence interval.
+        """
+
+        wins = self.wins[a][b]
+        games = wins + self.wins[b][a]
+        if games == 0:
+            return 0.0, 0.0, 1.0
+
+        return (wins / games, *wilson_interval(wins, games))
+
+    def get_elo_ratings(self, iterations=200):
+        """
+            Bradley-Terry maximum likelihood ratings of all agents on the Elo scale, the average rating is 1500.
+        """
+
+        agents_number = len(self.agent_names)
+        strengths = [1.0] * agents_number
+
+        for _ in range(iterations):
+            for a in range(agents_number):
+                total_wins = sum(self.wins[a])
+                denominator = sum(
+                    (self.wins[a][b] + self.wins[b][a]) / (strengths[a] + strengths[b])
+                    for b in range(agents_number) if b != a
+                )
+
+                if denominator > 0:
+                    strengths[a] = max(total_wins, 0.5) / denominator  # 0.5 keeps the agents, that have never won, finite
+
+            norm = math.exp(sum(math.log(strength) for strength in strengths) / agents_number)
+            strengths = [strength / norm for strength in strengths]
+
+        return {name: 1500 + 400 * math.log10(strength) for name, strength in zip(self.agent_names, strengths)}
+
+    def format_report(self):
+        lines = []
+
+        for a, b in permutations(range(len(self.agent_names)), 2):
+            if a < b:
+                rate, low, high = self.get_win_rate(a, b)
+                games = self.wins[a][b] + self.wins[b][a]
+                lines.append(f'{self.agent_names[a]:>10} vs {self.agent_names[b]:<10} {rate:6.1%}  [{low:.1%}, {high:.1%}]  games: {games}')
+
+        lines.append('')
+        for name, rating in sorted(self.get_elo_ratings().items(), key=lambda item: -item[1]):
+            lines.append(f'{name:>10}  Elo {rating:7.1f}')
+
+        if self.games:
+            lines.append('')
+            lines.append(f'first seat wins {self.first_seat_wins / self.games:.1%}, not finished games: {self.not_finished}')
+
+        endgame_stats = self.get_endgame_stats()
+        if endgame_stats is not None:
+            lines.append('')
+            lines.extend(format_endgame_stats(endgame_stats))
+
+        return '\n'.join(lines)
+
+
+def wilson_interval(wins, games, z=1.96):
+    rate = wins / games
+    denominator = 1 + z ** 2 / games
+    center = (rate + z ** 2 / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games + z ** 2 / (4 * games ** 2)) / denominator
+
+    return center - margin, center + margin
+
+
+def run_arena(agent_names, games_number, workers=None, seed=0, on_progress=None, record_path=None):
+    """
+        Plays games_number headless games between every ordered pair of agents (so both agents play in both seats),
+        spreading them over a pool of worker processes. With record_path all the games are appended to that game log.
+    """
+
+    pairings = list(permutations(range(len(agent_names)), 2))
+    tasks = [
+        (agent_names, pairings, seed, first_game, min(GAMES_PER_TASK, games_number - first_game), record_path is not None)
+        for first_game in range(0, games_number, GAMES_PER_TASK)
+    ]
+
+    results = ArenaResults(agent_names)
+    started_at = time.perf_counter()
+
+    game_log = GameRecordWriter.open(record_path) if record_path is not None else None
+
+    with Pool(workers) as pool:
+        for records, game_log_records, endgame_counters in pool.imap_unordered(play_games, tasks):
+            results.add_records(records)
+            results.add_endgame_counters(endgame_counters)
+
+            if game_log is not None:
+                game_log.write_records(game_log_records)
+
+            if on_progress is not None:
+                on_progress(results, results.games / (time.perf_counter() - started_at))
+
+    if game_log is not None:
+        game_log.close()
+
+    results.games_per_second = results.games / (time.perf_counter() - started_at)
+    return results
@@ -0,0 +1,225 @@
+"""
+    Pack of all the images of the game, already decoded and scaled, so the game starts without decoding PNG or JPEG.
+
+    The file starts with FILE_HEADER (magic, version and the length of the index), then goes the index in JSON:
+    the sources (path -> size, mtime and sha256 of the image the pack was built from) and the entries
+    (key -> offset, width, height and pixel format), then the raw pixels of the entries, every one aligned to
+    ALIGNMENT bytes. The file is memory-mapped, and every entry becomes a surface with pg.image.frombuffer.
+
+    Cards are packed in the sizes they have at PACK_RENDER_SCALES, the board in the render sizes of the same scales.
+    Any other size is just loaded from the source images, as without the pack.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import pygame as pg
+
+from src.const import Rank, Suit, RANKS, SUITS, CARD_SIZE, LOGICAL_SIZE
+from src.surface_cache import SurfaceCache
+from src.viewport import Viewport
+
+MAGIC = b'101A'
+VERSION = 1
+
+FILE_HEADER = struct.Struct('<4sHI')  # magic, version, length of the index
+ALIGNMENT = 64
+
+ASSET_PACK_PATH = 'src/img/assets.pack'
+BOARD_PATH = 'src/img/board.jpg'
+PACK_RENDER_SCALES = (0.5, 0.75, 1.0)
+
+
+def get_source_paths():
+    return [BOARD_PATH, SurfaceCache.get_picture_path(Rank.back_side, Suit.back_side)] \
+        + [SurfaceCache.get_picture_path(rank, suit) for suit in SUITS for rank in RANKS]
+
+
+def get_card_key(rank, suit, size):
+    return f'card/{rank}/{suit}/{size[0]}x{size[1]}'
+
+
+def get_board_key(size):
+    return f'board/{size[0]}x{size[1]}'
+
+
+def load_board_image(render_size):
+    """
+        The board at the logical size (cut from the bigger picture) scaled to the render size.
+    """
+
+    board_image = pg.Surface(LOGICAL_SIZE)
+    board_image.blit(pg.image.load(BOARD_PATH), (0, 0))
+
+    if tuple(render_size) != LOGICAL_SIZE:
+        board_image = pg.transform.smoothscale(board_image, render_size)
+
+    return board_image
+
+
+def hash_file(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def get_source_info(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': hash_file(path)}
+
+
+def build_asset_pack(path=ASSET_PACK_PATH, render_scales=PACK_RENDER_SCALES):
+    """
+        Decodes and scales all the images and writes them to the pack. The pack is written to a temporary file first,
+        so the game never maps a half-written one.
+    """
+
+    images = {}  # key -> (surface, pixel format)
+    for render_scale in render_scales:
+        viewport = Viewport(render_scale)
+        card_size = viewport.scale_size(CARD_SIZE)
+
+        images[get_board_key(viewport.render_size)] = (load_board_image(viewport.render_size), 'RGB')
+        for rank, suit in [(Rank.back_side, Suit.back_side)] + [(rank, suit) for suit in SUITS for rank in RANKS]:
+            images[get_card_key(rank, suit, card_size)] = (SurfaceCache.load_image(rank, suit, card_size), 'RGBA')
+
+    entries = {}
+    chunks = []
+    offset = 0
+    for key, (surface, pixel_format) in images.items():
+        pixels = pg.image.tostring(surface, pixel_format)
+        entries[key] = [offset, surface.get_width(), surface.get_height(), pixel_format]
+
+        padding = -len(pixels) % ALIGNMENT
+        chunks.append(pixels + bytes(padding))
+        offset += len(pixels) + padding
+
+    index = json.dumps({
+        'render_scales': list(render_scales),
+        'sources': {source_path: get_source_info(source_path) for source_path in get_source_paths()},
+        'entries': entries,
+    }).encode()
+
+    header_size = FILE_HEADER.size + len(index)
+    header_size += -header_size % ALIGNMENT
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(FILE_HEADER.pack(MAGIC, VERSION, len(index)))
+        file.write(index)
+        file.write(bytes(header_size - FILE_HEADER.size - len(index)))
+        for chunk in chunks:
+            file.write(chunk)
+
+    os.replace(temporary_path, path)
+
+
+class AssetPack:
+    """
+        Memory-mapped asset pack. The surfaces share the memory of the map, until they are converted
+        to the display format, so the pack has to stay open while the game goes on.
+    """
+
+    def __init__(self, path=ASSET_PACK_PATH):
+        self.path = path
+
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, index_length = FILE_HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f'{path} is not an asset pack of version {VERSION}')
+
+        index = json.loads(self.map[FILE_HEADER.size:FILE_HEADER.size + index_length])
+        self.render_scales = tuple(index['render_scales'])
+        self.sources = index['sources']
+        self.entries = index['entries']
+
+        header_size = FILE_HEADER.size + index_length
+        self.data_offset = header_size + -header_size % ALIGNMENT
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, path=ASSET_PACK_PATH, render_scales=PACK_RENDER_SCALES):
+        """
+            Opens the pack, building it first if there is none, or if it is stale (made of other images or scales).
+        """
+
+        pack = None
+        if os.path.exists(path):
+            try:
+                pack = cls(path)
+            except ValueError:
+                pass
+
+        if pack is not None and pack.render_scales == tuple(render_scales) and not pack.is_stale():
+            return pack
+
+        if pack is not None:
+            pack.close()
+
+        build_asset_pack(path, render_scales)
+        return cls(path)
+
+    def is_stale(self):
+        """
+            The sources are hashed only if their size or mtime differ from the ones in the pack,
+            so a fresh pack is checked without reading the images.
+        """
+
+        source_paths = get_source_paths()
+        if set(source_paths) != set(self.sources):
+            return True
+
+        for source_path in source_paths:
+            packed = self.sources[source_path]
+
+            try:
+                stat = os.stat(source_path)
+            except FileNotFoundError:
+                return True
+
+            if stat.st_size == packed['size'] and stat.st_mtime_ns == packed['mtime_ns']:
+                continue
+
+            if stat.st_size != packed['size'] or hash_file(source_path) != packed['sha256']:
+                return True
+
+        return False
+
+    def get_card(self, rank, suit, size):
+        return self._get_surface(get_card_key(rank, suit, size))
+
+    def get_board(self, size):
+        return self._get_surface(get_board_key(size))
+
+    def _get_surface(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        offset, width, height, pixel_format = entry
+        start = self.data_offset + offset
+        pixels = memoryview(self.map)[start:start + width * height * len(pixel_format)]
+
+        return pg.image.frombuffer(pixels, (width, height), pixel_format)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': len(self.map)}
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,418 @@
+"""
+    Simulator of many games at once, for the statistics of the rules and of the heuristic policy.
+
+    All the games of the batch are kept as struct-of-arrays: the hands are 36-bit bitboards (uint64) of the two players,
+    the draw pile is a row of card ids with the number of cards left in it, the discard pile is a bitboard, and the turn
+    flags are packed like in SearchState. Every step all the games make one action at once, the action is chosen
+    by the vectorized HeuristicAgent (both players play it) and applied with NumPy masks by the rules of RulesEngine.
+    Finished games are compacted out of the arrays, so the long games at the end do not drag the short ones along.
+
+    A card id is its bit index (see CARD_BITS): suit index * 9 + rank index.
+"""
+
+import time
+from random import Random
+
+import numpy as np
+
+from src.agent import HeuristicAgent
+from src.card import CARDS
+from src.const import USER, AGENT, Rank, Suit, RANKS, SUITS, CARD_BITS, RANK_MASKS, SUIT_MASKS
+from src.deck import Deck
+from src.rules import GameState, RulesEngine, RulesListener
+from src.search_state import ONLY_BY_RANK, SIX_IN_ACTION, CAN_GET_NEW_CARD, SHOW_SKIP_BUTTON, CARD_EFFECTS
+from src.simulation import MAX_ACTIONS_PER_GAME
+from src.weights import DEFAULT_WEIGHTS
+
+CARDS_NUMBER = len(SUITS) * len(RANKS)
+DRAW_ACTION, PASS_ACTION = CARDS_NUMBER, CARDS_NUMBER + 1  # action codes, besides the card ids
+PLAYER_CODES = (USER, AGENT)  # players are 0 and 1 in the arrays
+NO_WINNER = -1
+MAX_TAKEN_CARDS = 5
+REFILL_FRACTION = 0.125  # new games are dealt, when that part of the batch is free
+
+SIX = RANKS.index(Rank.six)
+SEVEN = RANKS.index(Rank.seven)
+EIGHT = RANKS.index(Rank.eight)
+QUEEN_OF_SPADES = CARD_BITS[Rank.queen, Suit.spades].bit_length() - 1
+
+CARD_IDS = np.arange(CARDS_NUMBER)
+CARD_RANKS = CARD_IDS % len(RANKS)  # rank index of every card id
+CARD_SUITS = CARD_IDS // len(RANKS)
+BITS = np.uint64(1) << CARD_IDS.astype(np.uint64)
+
+RANK_MASKS_BY_INDEX = np.array([RANK_MASKS[rank] for rank in RANKS], dtype=np.uint64)
+SUIT_MASKS_BY_INDEX = np.array([SUIT_MASKS[suit] for suit in SUITS], dtype=np.uint64)
+RANK_MASKS_BY_CARD = np.array([RANK_MASKS[card.rank] for card in CARDS], dtype=np.uint64)
+ALLOWED_MASKS_BY_CARD = np.array([RANK_MASKS[card.rank] | SUIT_MASKS[card.suit] | RANK_MASKS[Rank.jack] for card in CARDS], dtype=np.uint64)
+SIX_IDS = np.array([CARD_BITS[Rank.six, suit].bit_length() - 1 for suit in SUITS])
+SIX_BITS_BY_SUIT = np.array([CARD_BITS[Rank.six, suit] for suit in SUITS], dtype=np.uint64)
+
+TAKEN_CARDS_BY_CARD = np.array([CARD_EFFECTS[card.bit][0] for card in CARDS], dtype=np.int8)
+FLAGS_BY_CARD = np.array([CARD_EFFECTS[card.bit][1] for card in CARDS], dtype=np.int8)
+
+
+def _popcount(bits):
+    return np.bitwise_count(bits).astype(np.int64)
+
+
+class ActionCounter(RulesListener):
+    def __init__(self):
+        self.actions = 0
+
+    def on_action(self, player, action):
+        self.actions += 1
+
+
+class BatchSimulator:
+    """
+        Plays games heuristic agent against heuristic agent, batch_size of them in lockstep. When enough games
+        of the batch are over, it is filled up with new deals, so every step works on a full batch.
+
+        The deals and the reshuffles are made with a NumPy Generator, so the games are not the same ones
+        as with a seeded Deck, but they come from the same distribution: the outcome statistics are compared
+        with the ones of RulesEngine by check_against_scalar_rules.
+    """
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, seed=0, max_actions=MAX_ACTIONS_PER_GAME):
+        self.rng = np.random.default_rng(seed)
+        self.max_actions = max_actions
+
+        # the points of HeuristicAgent._value_the_move and _value_the_move_in_danger_situation by rank index
+        self.rank_points = np.array([weights.rank_points[rank] for rank in RANKS], dtype=np.float64)
+        self.same_rank_points = weights.same_rank + self.rank_points
+        self.danger_same_rank_points = np.zeros(len(RANKS))
+        self.danger_same_rank_points[[SEVEN, EIGHT]] = weights.danger_seven, weights.danger_eight
+        self.weights = weights
+
+        self.steps = 0
+        self.actions = 0
+
+    def run(self, games, batch_size=100_000):
+        """
+            Plays games games, up to batch_size at once. Returns the winners (0 - USER, 1 - AGENT, -1 - not finished
+            in max_actions) and the number of the actions of every game.
+        """
+
+        winners = np.full(games, NO_WINNER, dtype=np.int8)
+        lengths = np.zeros(games, dtype=np.int32)
+
+        self._clear()
+        dealt_games = 0
+
+        while dealt_games < games or len(self.game_indices):
+            free_places = batch_size - len(self.game_indices)
+            if dealt_games < games and free_places >= batch_size * REFILL_FRACTION:
+                games_number = min(free_places, games - dealt_games)
+                self._deal(np.argsort(self.rng.random((games_number, CARDS_NUMBER)), axis=1).astype(np.int8), dealt_games)
+                dealt_games += games_number
+
+            self._step(winners, lengths)
+
+        return winners, lengths
+
+    def _clear(self):
+        self.game_indices = np.zeros(0, dtype=np.int64)
+        self.started_at = np.zeros(0, dtype=np.int64)  # the step, the game was dealt at
+        self.deck_orders = np.zeros((0, CARDS_NUMBER), dtype=np.int8)
+        self.deck_sizes = np.zeros(0, dtype=np.int64)
+        self.hands = np.zeros((0, 2), dtype=np.uint64)
+        self.deactivated_cards = np.zeros(0, dtype=np.uint64)
+        self.card_in_action = np.zeros(0, dtype=np.int64)
+        self.players = np.zeros(0, dtype=np.int64)
+        self.flags = np.zeros(0, dtype=np.int8)
+        self.winners = np.zeros(0, dtype=np.int8)
+
+    def _deal(self, deck_orders, first_game_index=0):
+        """
+            Adds the games to the batch, and deals the cards like Deck.initialize_deck: the last cards of every deck
+            order are drawn first, 5 to the agent, 4 to the user and one on the table. Then the card on the table
+            takes effect, as in start_game.
+        """
+
+        games_number = len(deck_orders)
+        hands = np.zeros((games_number, 2), dtype=np.uint64)
+        hands[:, 1] = np.bitwise_or.reduce(BITS[deck_orders[:, -5:]], axis=1)
+        hands[:, 0] = np.bitwise_or.reduce(BITS[deck_orders[:, -9:-5]], axis=1)
+
+        first_row = len(self.game_indices)
+        self.game_indices = np.concatenate([self.game_indices, np.arange(first_game_index, first_game_index + games_number)])
+        self.started_at = np.concatenate([self.started_at, np.full(games_number, self.steps)])
+        self.deck_orders = np.concatenate([self.deck_orders, deck_orders])
+        self.deck_sizes = np.concatenate([self.deck_sizes, np.full(games_number, CARDS_NUMBER - 10)])
+        self.hands = np.concatenate([self.hands, hands])
+        self.deactivated_cards = np.concatenate([self.deactivated_cards, np.zeros(games_number, dtype=np.uint64)])
+        self.card_in_action = np.concatenate([self.card_in_action, deck_orders[:, -10].astype(np.int64)])
+        self.players = np.concatenate([self.players, np.zeros(games_number, dtype=np.int64)])
+        self.flags = np.concatenate([self.flags, np.zeros(games_number, dtype=np.int8)])
+        self.winners = np.concatenate([self.winners, np.full(games_number, NO_WINNER, dtype=np.int8)])
+
+        rows = np.arange(first_row, first_row + games_number)
+        self._check_the_effect_of_the_move(rows, self.card_in_action[rows])
+
+    def _step(self, winners, lengths):
+        """
+            Every game of the batch makes one action, the games, that are over, go to winners and lengths.
+        """
+
+        self._apply(self._choose_actions())
+        self.steps += 1
+        self.actions += len(self.game_indices)
+
+        game_lengths = self.steps - self.started_at
+        is_over = (self.winners != NO_WINNER) | (game_lengths >= self.max_actions)
+
+        if is_over.any():
+            winners[self.game_indices[is_over]] = self.winners[is_over]
+            lengths[self.game_indices[is_over]] = game_lengths[is_over]
+            self._compact(~is_over)
+
+    def _compact(self, keep):
+        for name in ('game_indices', 'started_at', 'deck_orders', 'deck_sizes', 'hands', 'deactivated_cards', 'card_in_action',
+                     'players', 'flags', 'winners'):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def _choose_actions(self):
+        """
+            HeuristicAgent.choose_action (without the endgame solver) for every game: the action code of every game.
+        """
+
+        games_number = len(self.game_indices)
+        rows = np.arange(games_number)
+
+        hands = self.hands[rows, self.players]
+        card_in_action = self.card_in_action
+        only_by_rank = (self.flags & ONLY_BY_RANK) != 0
+
+        actions = np.full(games_number, PASS_ACTION, dtype=np.int64)
+        moves = np.zeros(games_number, dtype=np.uint64)  # the best one of them is made, if there are any
+
+        # HeuristicAgent._rank_moves with can_through_only_by_rank: covering a six, or throwing up
+        covers_six = only_by_rank & (CARD_RANKS[card_in_action] == SIX)
+        decides = ~only_by_rank
+
+        if covers_six.any():
+            games = np.flatnonzero(covers_six)
+            first_cards = self._find_best_sequence_to_cover_six(hands[games], CARD_SUITS[card_in_action[games]])
+
+            actions[games] = first_cards
+            decides[games[first_cards < 0]] = True
+
+        throws_up = only_by_rank & ~covers_six
+        moves[throws_up] = hands[throws_up] & RANK_MASKS_BY_CARD[card_in_action[throws_up]]
+
+        # after a finished move, and when a six can not be covered: a possible move, or DRAW or PASS
+        if decides.any():
+            games = np.flatnonzero(decides)
+            possible_moves = self._get_all_possible_moves(hands[games], card_in_action[games], only_by_rank[games])
+            moves[games] = possible_moves
+
+            can_draw = ((self.flags[games] & CAN_GET_NEW_CARD) != 0) & ((self.deck_sizes[games] != 0) | (self.deactivated_cards[games] != 0))
+            actions[games] = np.where(can_draw, DRAW_ACTION, PASS_ACTION)
+
+        moves_number = _popcount(moves)
+        actions = np.where(moves_number == 1, _popcount(moves - np.uint64(1)), actions)  # the only move is made without valuing it
+
+        if (moves_number > 1).any():
+            games = np.flatnonzero(moves_number > 1)
+            opponent_hands = self.hands[games, 1 - self.players[games]]
+            actions[games] = self._choose_best_move(hands[games], moves[games], _popcount(opponent_hands) == 1)
+
+        return actions
+
+    def _get_all_possible_moves(self, hands, card_in_action, only_by_rank):
+        moves = hands & np.where(only_by_rank, RANK_MASKS_BY_CARD[card_in_action], ALLOWED_MASKS_BY_CARD[card_in_action])
+
+        # a six is not thrown, if there is nothing to cover it with (see HeuristicAgent._can_cover_six)
+        suit_counts = _popcount(hands[:, None] & SUIT_MASKS_BY_INDEX)
+        has_coverable_six = ((hands[:, None] & SIX_BITS_BY_SUIT) != 0) & (suit_counts > 1)
+        can_cover_any = has_coverable_six.any(axis=1)
+
+        for suit_index in range(len(SUITS)):
+            can_cover = (suit_counts[:, suit_index] > 1) | can_cover_any
+            moves = np.where(can_cover, moves, moves & ~SIX_BITS_BY_SUIT[suit_index])
+
+        return moves
+
+    @staticmethod
+    def _get_hand_counts(hands):
+        """
+            The number of cards of every rank and of every suit in every hand.
+        """
+
+        return _popcount(hands[:, None] & RANK_MASKS_BY_INDEX), _popcount(hands[:, None] & SUIT_MASKS_BY_INDEX)
+
+    @staticmethod
+    def _find_max_rank_sequences(hands, rank_counts):
+        """
+            HeuristicAgent._find_max_rank_sequence for every suit: (the number of the cards of the sequence,
+            the rank index of the sequence) of shape (games, suits), the number is 0 if there is no sequence.
+        """
+
+        # the larger group wins, the first rank of RANKS wins a tie, sixes are not counted
+        presence = ((hands[:, None] & BITS) != 0).reshape(-1, len(SUITS), len(RANKS))
+        keys = np.where(presence, rank_counts[:, None, :] * 16 + (15 - np.arange(len(RANKS))), -1)
+        keys[:, :, SIX] = -1
+        best_keys = keys.max(axis=2)
+
+        return np.where(best_keys >= 0, best_keys // 16, 0), 15 - best_keys % 16
+
+    def _find_best_sequence_to_cover_six(self, hands, six_suits):
+        """
+            HeuristicAgent._find_best_sequence_to_cover_six: the id of the first card of the longest cover, or -1.
+        """
+
+        rows = np.arange(len(hands))
+        rank_counts, _ = self._get_hand_counts(hands)
+        sequence_lengths, sequence_ranks = self._find_max_rank_sequences(hands, rank_counts)
+
+        max_lengths = sequence_lengths[rows, six_suits]
+        first_cards = np.where(max_lengths > 0, six_suits * len(RANKS) + sequence_ranks[rows, six_suits], -1)
+
+        for suit_index in range(len(SUITS)):
+            is_better = (six_suits != suit_index) & ((hands & SIX_BITS_BY_SUIT[suit_index]) != 0) & (sequence_lengths[:, suit_index] + 1 > max_lengths)
+
+            first_cards = np.where(is_better, suit_index * len(RANKS) + SIX, first_cards)
+            max_lengths = np.where(is_better, sequence_lengths[:, suit_index] + 1, max_lengths)
+
+        return first_cards
+
+    def _choose_best_move(self, hands, moves, in_danger):
+        """
+            the first of HeuristicAgent.get_ranked_moves: the id of the move with the most points, the lowest id of the equal ones.
+        """
+
+        weights = self.weights
+        rank_counts, suit_counts = self._get_hand_counts(hands)
+
+        # the points, that depend only on the rank, are counted for 9 ranks, the penalty of the lonely suit
+        # (the only card of its suit and of its rank) for 4 suits, and then they are combined into (games, suits, ranks)
+        points_by_rank = np.where(
+            in_danger[:, None],
+            self.rank_points + self.danger_same_rank_points * rank_counts,
+            self.rank_points + (rank_counts - 1) * self.same_rank_points,
+        )
+        lonely_suit_points = np.where(in_danger, weights.danger_lonely_suit, weights.lonely_suit)[:, None] * (suit_counts == 1)
+
+        points = points_by_rank[:, None, :] - lonely_suit_points[:, :, None] * (rank_counts == 1)[:, None, :]
+        points = points.reshape(len(hands), CARDS_NUMBER)
+        points[:, QUEEN_OF_SPADES] += np.where(in_danger, weights.danger_queen_of_spades, weights.queen_of_spades)
+
+        covers_six = ~in_danger & ((moves & np.uint64(RANK_MASKS[Rank.six])) != 0)
+        if covers_six.any():
+            games = np.flatnonzero(covers_six)
+            sequence_lengths, _ = self._find_max_rank_sequences(hands[games], rank_counts[games])
+            points[games[:, None], SIX_IDS] += sequence_lengths * weights.six_sequence
+
+        points[(moves[:, None] & BITS) == 0] = -np.inf
+        return points.argmax(axis=1)
+
+    def _apply(self, actions):
+        games = np.flatnonzero(actions < CARDS_NUMBER)
+        if len(games):
+            self._make_a_move(games, actions[games])
+
+        games = np.flatnonzero(actions == DRAW_ACTION)
+        if len(games):
+            self._players_get_a_card_from_deck(games, self.players[games])
+
+            flags = self.flags[games]
+            self.flags[games] = np.where(flags & SIX_IN_ACTION, flags, flags & ~CAN_GET_NEW_CARD | SHOW_SKIP_BUTTON)
+
+        games = np.flatnonzero(actions == PASS_ACTION)
+        if len(games):
+            self.players[games] ^= 1
+            self.flags[games] = self.flags[games] & SIX_IN_ACTION | CAN_GET_NEW_CARD
+
+    def _make_a_move(self, games, cards):
+        players = self.players[games]
+
+        self.deactivated_cards[games] |= BITS[self.card_in_action[games]]
+        self.card_in_action[games] = cards
+        self.hands[games, players] &= ~BITS[cards]
+
+        self._check_the_effect_of_the_move(games, cards)
+
+        is_over = self.hands[games, players] == 0
+        self.winners[games[is_over]] = players[is_over]
+
+    def _check_the_effect_of_the_move(self, games, cards):
+        self.flags[games] = FLAGS_BY_CARD[cards]
+
+        taken_cards = TAKEN_CARDS_BY_CARD[cards]
+        for card_number in range(1, MAX_TAKEN_CARDS + 1):
+            takes = taken_cards >= card_number
+            if not takes.any():
+                break
+
+            self._players_get_a_card_from_deck(games[takes], 1 - self.players[games[takes]])
+
+    def _players_get_a_card_from_deck(self, games, players):
+        is_empty = self.deck_sizes[games] == 0
+        if is_empty.any():
+            self._reshuffle_the_decks(games[is_empty])
+
+        has_cards = self.deck_sizes[games] != 0  # nothing to reshuffle, all cards are in hands
+        games, players = games[has_cards], players[has_cards]
+
+        self.deck_sizes[games] -= 1
+        cards = self.deck_orders[games, self.deck_sizes[games]]
+        self.hands[games, players] |= BITS[cards]
+
+    def _reshuffle_the_decks(self, games):
+        deactivated_cards = self.deactivated_cards[games]
+
+        keys = self.rng.random((len(games), CARDS_NUMBER))
+        keys[(deactivated_cards[:, None] & BITS) == 0] = 2.0  # the cards, that are not in the discard pile, go to the end
+
+        self.deck_orders[games] = np.argsort(keys, axis=1)
+        self.deck_sizes[games] = _popcount(deactivated_cards)
+        self.deactivated_cards[games] = 0
+
+
+def check_against_scalar_rules(games, seed=0, weights=DEFAULT_WEIGHTS, max_z=4.0):
+    """
+        Plays games games with BatchSimulator and with RulesEngine and HeuristicAgent, and compares the win rate
+        of the first player and the mean length of a game. Returns the statistics and whether they match
+        (every difference is less than max_z standard errors).
+    """
+
+    started_at = time.perf_counter()
+    winners, lengths = BatchSimulator(weights, seed).run(games)
+    batch_seconds = time.perf_counter() - started_at
+
+    scalar_winners = []
+    scalar_lengths = []
+    agents = {player: HeuristicAgent(player, weights=weights) for player in PLAYER_CODES}
+
+    started_at = time.perf_counter()
+    for game_index in range(games):
+        counter = ActionCounter()
+        rules = RulesEngine(GameState(Deck(Random(seed * 1_000_003 + game_index))), listener=counter)
+        rules.start_game()
+
+        while not rules.state.game_is_over and counter.actions < MAX_ACTIONS_PER_GAME:
+            rules.apply(agents[rules.state.current_player_move].choose_action(rules))
+
+        scalar_winners.append(PLAYER_CODES.index(rules.state.winner) if rules.state.winner is not None else NO_WINNER)
+        scalar_lengths.append(counter.actions)
+    scalar_seconds = time.perf_counter() - started_at
+
+    scalar_winners = np.array(scalar_winners)
+    scalar_lengths = np.array(scalar_lengths)
+
+    user_wins, scalar_user_wins = (winners == 0).mean(), (scalar_winners == 0).mean()
+    pooled = (user_wins + scalar_user_wins) / 2
+    win_rate_z = (user_wins - scalar_user_wins) / max(np.sqrt(pooled * (1 - pooled) * 2 / games), 1e-12)
+
+    length_z = (lengths.mean() - scalar_lengths.mean()) / max(np.sqrt((lengths.var() + scalar_lengths.var()) / games), 1e-12)
+
+    stats = {
+        'games': games,
+        'batch': {'user_win_rate': float(user_wins), 'mean_length': float(lengths.mean()), 'games_per_second': games / batch_seconds},
+        'scalar': {'user_win_rate': float(scalar_user_wins), 'mean_length': float(scalar_lengths.mean()), 'games_per_second': games / scalar_seconds},
+        'win_rate_z': float(win_rate_z),
+        'length_z': float(length_z),
+    }
+
+    return stats, abs(win_rate_z) < max_z and abs(length_z) < max_z
@@ -0,0 +1,436 @@
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from random import Random
+
+import pygame as pg
+
+from src.agent import HeuristicAgent
+from src.animation import Animator
+from src.asset_pack import AssetPack, build_asset_pack
+from src.const import USER, AGENT, DECK_POSITION, TABLE_CENTER, Rank, Suit
+from src.deck import Deck
+from src.evaluation_cache import get_shared_cache
+from src.renderer import DirtyRenderer
+from src.rules import GameState, RulesEngine
+from src.planner import PlanningAgent
+from src.search_state import SearchState
+from src.simulation import play_headless_game
+from src.viewport import viewport
+from src.weights import DEFAULT_WEIGHTS
+
+AI_HAND_SIZES = (1, 2, 3, 5, 8, 12, 16, 20, 25)
+AI_POSITIONS_PER_HAND_SIZE = 200
+ANIMATION_SPRITES = (1, 8, 36, 100)
+ANIMATION_UPDATES = 2000
+RENDER_FRAMES = 500
+DECK_DRAWS_PER_SAMPLE = 10000
+DECK_SAMPLES = 20
+SEARCH_GAMES = 200
+SEARCH_PASSES = 20
+STARTUP_RUNS = 5
+CACHE_GAMES = 1000
+CACHE_GAMES_PER_SAMPLE = 100
+
+DEFAULT_THRESHOLD = 0.25  # a metric regresses, if its median is that much worse than the baseline
+
+
+def summarize(samples, unit, better='lower'):
+    """
+        Statistical summary of the samples of one metric. better tells the direction: 'lower' for times,
+        'higher' for throughputs, the comparison with the baseline uses the median.
+    """
+
+    samples = sorted(samples)
+
+    return {
+        'unit': unit,
+        'better': better,
+        'n': len(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'min': samples[0],
+        'median': statistics.median(samples),
+        'p95': samples[round((len(samples) - 1) * 0.95)],
+        'max': samples[-1],
+    }
+
+
+def create_ai_position(hand_size, rng):
+    """
+        Position of a fresh deal, where the agent has hand_size cards and starts its move on the opponent's card.
+    """
+
+    rules = RulesEngine(GameState(Deck(Random(rng.getrandbits(32)))))
+    rules.start_game()
+
+    deck = rules.deck
+    while len(deck.agent_cards) < hand_size and deck.deck_cards:
+        deck.agent_cards.add(deck.deck_cards.pop())
+    while len(deck.agent_cards) > hand_size:
+        deck.deck_cards.append(deck.agent_cards.pop())
+
+    rules.state.current_player_move = USER
+    rules.finish_move()  # the user has finished its move, so the move of the agent begins
+
+    return rules
+
+
+def benchmark_ai_latency(seed=0):
+    results = {}
+    agent = HeuristicAgent(AGENT)
+
+    for hand_size in AI_HAND_SIZES:
+        rng = Random(seed * 1_000_003 + hand_size)
+        samples = []
+
+        for _ in range(AI_POSITIONS_PER_HAND_SIZE):
+            rules = create_ai_position(hand_size, rng)
+
+            started_at = time.perf_counter()
+            agent.choose_action(rules)
+            samples.append((time.perf_counter() - started_at) * 1e6)
+
+        results[f'ai_latency/hand_{hand_size}'] = summarize(samples, 'us')
+
+    return results
+
+
+def benchmark_evaluation_cache(seed=0):
+    """
+        Self-play of HeuristicAgent without and with the evaluation cache (the same games), and the hit rate
+        and memory of the cache after them. The cache starts empty.
+    """
+
+    cache = get_shared_cache(DEFAULT_WEIGHTS)
+    cache.clear()
+
+    results = {}
+    for use_evaluation_cache in (False, True):
+        samples = []
+
+        for first_game in range(0, CACHE_GAMES, CACHE_GAMES_PER_SAMPLE):
+            started_at = time.perf_counter()
+
+            for game_index in range(first_game, first_game + CACHE_GAMES_PER_SAMPLE):
+                user_agent = HeuristicAgent(USER, use_evaluation_cache=use_evaluation_cache)
+                agent_agent = HeuristicAgent(AGENT, use_evaluation_cache=use_evaluation_cache)
+                play_headless_game(user_agent, agent_agent, rng=Random(seed * 1_000_003 + game_index))
+
+            samples.append(CACHE_GAMES_PER_SAMPLE / (time.perf_counter() - started_at))
+
+        name = 'with_cache' if use_evaluation_cache else 'without_cache'
+        results[f'ai_cache/selfplay_{name}'] = summarize(samples, 'games/s', better='higher')
+
+    results['ai_cache/hit_rate'] = summarize([cache.hit_rate], 'ratio', better='higher')
+    results['ai_cache/memory'] = summarize([cache.memory_bytes() / 2 ** 20], 'MiB')
+
+    return results
+
+
+def benchmark_planner(seed=0):
+    """
+        Time of PlanningAgent.plan_turn and the number of the sequences of the turn it explores, by the hand size.
+    """
+
+    results = {}
+    planner = PlanningAgent(AGENT)
+
+    for hand_size in AI_HAND_SIZES:
+        rng = Random(seed * 1_000_003 + hand_size)
+        time_samples = []
+        sequence_samples = []
+
+        for _ in range(AI_POSITIONS_PER_HAND_SIZE):
+            planner.plan_turn(create_ai_position(hand_size, rng))
+
+            time_samples.append(planner.last_plan_stats['time_ms'])
+            sequence_samples.append(planner.last_plan_stats['sequences'])
+
+        results[f'planner/hand_{hand_size}'] = summarize(time_samples, 'ms')
+        results[f'planner/hand_{hand_size}/sequences'] = summarize(sequence_samples, 'sequences')
+
+    return results
+
+
+class _PointSprite:
+    def __init__(self, pos):
+        self.pos = pos
+
+
+def benchmark_animation(seed=0):
+    """
+        Cost of one Animator.update with N cards flying at once. The clock is faked, so no tween ever finishes.
+    """
+
+    results = {}
+    rng = Random(seed)
+
+    for sprites_number in ANIMATION_SPRITES:
+        now = [0.0]
+        animator = Animator(clock=lambda: now[0])
+
+        sprites = [_PointSprite((rng.uniform(0, 1920), rng.uniform(0, 1080))) for _ in range(sprites_number)]
+        animator.move(sprites, [(rng.uniform(0, 1920), rng.uniform(0, 1080)) for _ in sprites], speed=1e-3)
+
+        samples = []
+        for _ in range(ANIMATION_UPDATES):
+            now[0] += 0.01
+
+            started_at = time.perf_counter()
+            animator.update()
+            samples.append((time.perf_counter() - started_at) * 1e6)
+
+        results[f'animation_update/sprites_{sprites_number}'] = summarize(samples, 'us')
+
+    return results
+
+
+def benchmark_render():
+    """
+        Cost of a frame of DirtyRenderer (drawing and pg.display.update), with full hands on the table and one card
+        moving, as during the animation, and of a frame, that is redrawn completely (after VIDEOEXPOSE).
+    """
+
+    from src.card_sprite import CardSprite  # needs the video mode to be set for the images
+
+    screen = pg.display.set_mode(viewport.render_size, pg.SCALED)
+    with tempfile.TemporaryDirectory() as directory, _build_temporary_asset_pack(directory) as asset_pack:
+        background = asset_pack.get_board(viewport.render_size).convert()
+    renderer = DirtyRenderer(screen, background)
+
+    deck = pg.sprite.Group([CardSprite(DECK_POSITION.x, DECK_POSITION.y, Rank.back_side, Suit.back_side)])
+    agent_cards = pg.sprite.Group([CardSprite(100 + i * 90, 150, Rank.back_side, Suit.back_side) for i in range(8)])
+    user_cards = pg.sprite.Group([CardSprite(100 + i * 1.35 * 90, 750, rank, Suit.hearts) for i, rank in enumerate(
+        (Rank.six, Rank.seven, Rank.eight, Rank.nine, Rank.ten, Rank.jack, Rank.queen, Rank.king))])
+    moving_card = CardSprite(TABLE_CENTER.x, TABLE_CENTER.y, Rank.ace, Suit.spades)
+    layers = [deck, pg.sprite.Group([moving_card]), agent_cards, user_cards]
+
+    pg.display.update(renderer.render(layers))
+
+    moving_samples = []
+    for frame in range(RENDER_FRAMES):
+        moving_card.pos = (TABLE_CENTER.x + frame % 400, TABLE_CENTER.y + frame % 200)
+
+        started_at = time.perf_counter()
+        pg.display.update(renderer.render(layers))
+        moving_samples.append((time.perf_counter() - started_at) * 1000)
+
+    full_samples = []
+    for _ in range(RENDER_FRAMES // 5):
+        renderer.mark_all_dirty()
+
+        started_at = time.perf_counter()
+        pg.display.update(renderer.render(layers))
+        full_samples.append((time.perf_counter() - started_at) * 1000)
+
+    return {
+        'render_frame/one_card_moving': summarize(moving_samples, 'ms'),
+        'render_frame/full_redraw': summarize(full_samples, 'ms'),
+    }
+
+
+def benchmark_deck(seed=0):
+    """
+        Draws from the deck, every drawn card goes to the discard pile, so the deck is reshuffled every ~30 draws.
+    """
+
+    deck = Deck(Random(seed))
+    deck.initialize_deck()
+
+    samples = []
+    for _ in range(DECK_SAMPLES):
+        started_at = time.perf_counter()
+
+        for _ in range(DECK_DRAWS_PER_SAMPLE):
+            deck.deactivated_cards.append(deck.get_random_card_from_deck())
+
+        samples.append(DECK_DRAWS_PER_SAMPLE / (time.perf_counter() - started_at))
+
+    return {'deck/draws_with_reshuffles': summarize(samples, 'draws/s', better='higher')}
+
+
+def create_search_positions(games, actions_per_game=30, seed=0):
+    """
+        Positions of randomly played games (up to actions_per_game of every game), with their legal actions.
+    """
+
+    positions = []
+
+    for game_index in range(games):
+        rng = Random(seed * 1_000_003 + game_index)
+        rules = RulesEngine(GameState(Deck(Random(rng.getrandbits(32)))))
+        rules.start_game()
+
+        for _ in range(actions_per_game):
+            if rules.state.game_is_over:
+                break
+
+            search_state = SearchState.from_rules(rules)
+            positions.append((search_state, search_state.get_legal_actions()))
+
+            rules.apply(rng.choice(rules.get_legal_actions()))
+
+    return positions
+
+
+def benchmark_search_state(seed=0):
+    """
+        SearchState: applying and taking back every legal action of every position, and cloning the positions.
+    """
+
+    positions = create_search_positions(SEARCH_GAMES, seed=seed)
+    apply_undo_samples = []
+    clone_samples = []
+
+    for _ in range(SEARCH_PASSES):
+        pairs = 0
+        started_at = time.perf_counter()
+
+        for search_state, actions in positions:
+            apply = search_state.apply
+            undo = search_state.undo
+
+            for action in actions:
+                undo(apply(action))
+
+            pairs += len(actions)
+
+        apply_undo_samples.append(pairs / (time.perf_counter() - started_at))
+
+        started_at = time.perf_counter()
+        for search_state, _ in positions:
+            search_state.clone()
+
+        clone_samples.append(len(positions) / (time.perf_counter() - started_at))
+
+    return {
+        'search_state/apply_undo': summarize(apply_undo_samples, 'pairs/s', better='higher'),
+        'search_state/clone': summarize(clone_samples, 'clones/s', better='higher'),
+    }
+
+
+def benchmark_startup():
+    """
+        Time to the first frame of play.py, in a new process every time, in two modes: warm_pack maps an asset pack,
+        that is built before the runs (in a temporary directory, so the pack of the source tree is neither used nor made),
+        and is in the page cache after the first run, no_pack decodes the images. The first run of every mode is not counted.
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        _build_temporary_asset_pack(directory).close()
+        pack_path = os.path.join(directory, 'assets.pack')
+
+        return {
+            'startup/first_frame/warm_pack': summarize(_measure_startup(['--asset-pack', pack_path]), 'ms'),
+            'startup/first_frame/no_pack': summarize(_measure_startup(['--no-asset-pack']), 'ms'),
+        }
+
+
+def _measure_startup(options):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy')
+    samples = []
+
+    for run in range(STARTUP_RUNS + 1):
+        output = subprocess.run([sys.executable, 'play.py', '--startup-time', *options], env=env, capture_output=True, text=True, check=True).stdout
+        first_frame_ms = float(re.search(r'first frame after (\d+) ms', output).group(1))
+
+        if run > 0:
+            samples.append(first_frame_ms)
+
+    return samples
+
+
+def _build_temporary_asset_pack(directory):
+    """
+        Builds the asset pack in directory and opens it: the benchmarks do not depend on the pack of the source tree, and do not write it.
+    """
+
+    path = os.path.join(directory, 'assets.pack')
+    build_asset_pack(path)
+
+    return AssetPack(path)
+
+
+BENCHMARKS = {
+    'ai': benchmark_ai_latency,
+    'ai_cache': benchmark_evaluation_cache,
+    'planner': benchmark_planner,
+    'animation': benchmark_animation,
+    'render': benchmark_render,
+    'deck': benchmark_deck,
+    'search': benchmark_search_state,
+    'startup': benchmark_startup,
+}
+
+
+def run_benchmarks(names=tuple(BENCHMARKS), on_benchmark=None):
+    results = {}
+
+    for name in names:
+        started_at = time.perf_counter()
+        results.update(BENCHMARKS[name]())
+
+        if on_benchmark is not None:
+            on_benchmark(name, time.perf_counter() - started_at)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pg.version.ver,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare_with_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+        Returns (metric, baseline median, median, relative change, is regression) for every metric in both runs.
+        The change is positive, when the metric got worse.
+    """
+
+    comparison = []
+
+    for metric, summary in results['results'].items():
+        baseline_summary = baseline['results'].get(metric)
+        if baseline_summary is None:
+            continue
+
+        old, new = baseline_summary['median'], summary['median']
+        if summary['better'] == 'lower':
+            change = new / old - 1 if old else 0.0
+        else:
+            change = old / new - 1 if new else float('inf')
+
+        comparison.append((metric, old, new, change, change > threshold))
+
+    return comparison
+
+
+def format_results(results):
+    lines = [f"{'metric':40} {'median':>12} {'p95':>12} {'stdev':>12}  unit"]
+
+    for metric, summary in results['results'].items():
+        lines.append(f"{metric:40} {summary['median']:12.4g} {summary['p95']:12.4g} {summary['stdev']:12.4g}  {summary['unit']}")
+
+    return '\n'.join(lines)
+
+
+def format_comparison(comparison, threshold=DEFAULT_THRESHOLD):
+    lines = [f"{'metric':40} {'baseline':>12} {'now':>12} {'change':>8}"]
+
+    for metric, old, new, change, is_regression in comparison:
+        lines.append(f"{metric:40} {old:12.4g} {new:12.4g} {change:+8.1%}{'  REGRESSION' if is_regression else ''}")
+
+    regressions = sum(is_regression for *_, is_regression in comparison)
+    lines.append(f'{regressions} regressions worse than {threshold:.0%}')
+
+    return '\n'.join(lines)
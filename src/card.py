@@ -1,30 +1,50 @@
-from src.const import Rank, CARD_SIZE
-from src.card_sprite import CardSprite
+from src.const import SUITS, RANKS, CARD_BITS
 
 
 class Card:
-    def __init__(self, pos_x, pos_y, rank, suit):
-        self.position_x = pos_x
-        self.position_y = pos_y
-        self.rank = rank
-        self.suit = suit
+    """
+        Immutable value of one of the 36 cards.
 
-        if rank == Rank.back_side:
-            picture_path = 'src/img/back-side.png'
-        else:
-            picture_path = f'src/img/cards/{rank}_of_{suit}.png'
+        Cards are flyweights: there is only one Card for every (rank, suit), all of them are in CARDS, ordered by id.
+        The id is the index of the bit of the card in the bitboards (see CARD_BITS), so equality and hashing are
+        just comparing small ints. The card knows nothing about how it is drawn, sprites belong to the view.
+    """
 
-        self.sprite = CardSprite(self.position_x, self.position_y, picture_path)
+    __slots__ = ('rank', 'suit', 'id', 'bit')
 
-    def was_chosen(self, mouse_pos) -> bool:
-        width, height = CARD_SIZE
-        x, y = mouse_pos.x, mouse_pos.y
-        card_pos_x, card_pos_y = self.sprite.pos
+    def __init__(self, rank, suit, card_id):
+        object.__setattr__(self, 'rank', rank)
+        object.__setattr__(self, 'suit', suit)
+        object.__setattr__(self, 'id', card_id)
+        object.__setattr__(self, 'bit', CARD_BITS[rank, suit])
 
-        fits_y = card_pos_y - height // 2 < y < card_pos_y + height // 2
-        fits_x = card_pos_x - width // 2 < x < card_pos_x + width // 2
+    def __setattr__(self, name, value):
+        raise AttributeError('cards are immutable')
 
-        return fits_x and fits_y
+    def __eq__(self, other):
+        if isinstance(other, Card):
+            return self.id == other.id
+
+        return NotImplemented
 
     def __hash__(self):
-        return hash(self.rank + self.suit)
+        return self.id
+
+    def __reduce__(self):
+        return get_card_by_id, (self.id,)  # unpickled cards are the same canonical objects
+
+    def __repr__(self):
+        return f'Card({self.rank!r}, {self.suit!r})'
+
+
+CARDS = tuple(sorted((Card(rank, suit, CARD_BITS[rank, suit].bit_length() - 1) for suit in SUITS for rank in RANKS), key=lambda card: card.id))
+CARDS_BY_BIT = {card.bit: card for card in CARDS}
+CARDS_BY_RANK_AND_SUIT = {(card.rank, card.suit): card for card in CARDS}
+
+
+def get_card(rank, suit) -> Card:
+    return CARDS_BY_RANK_AND_SUIT[rank, suit]
+
+
+def get_card_by_id(card_id) -> Card:
+    return CARDS[card_id]
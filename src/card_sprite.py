@@ -1,57 +1,30 @@
-import math
-
 import pygame as pg
-from src.const import MOVE_SPEED, CARD_SIZE
+from src.const import CARD_SIZE
+from src.surface_cache import surface_cache
+from src.viewport import viewport
 
 
 class CardSprite(pg.sprite.Sprite):
-    def __init__(self, pos_x, pos_y, picture_path):
+    """
+        pos is in the logical coordinates, the rect is in the pixels of the render surface.
+    """
+
+    def __init__(self, pos_x, pos_y, rank, suit):
         super().__init__()
 
-        self.image = pg.image.load(picture_path)
-        self.image = pg.transform.scale(self.image, CARD_SIZE)
+        self.image = surface_cache.get(rank, suit, viewport.scale_size(CARD_SIZE))
         self.rect = self.image.get_rect()
 
-        self.rect.center = (pos_x, pos_y)
-        self.rect.size = CARD_SIZE
+        self.pos = (pos_x, pos_y)
 
     @property
     def pos(self):
-        return self.rect.center
+        return self._pos
 
     @pos.setter
     def pos(self, pos):
-        self.rect.center = pos
-
-
-class SpriteMove:
-    def __init__(self, sprites, dest_positions):
-        self.sprites = sprites
-        self.dest_positions = dest_positions
-
-        for sprite, dest_position in zip(self.sprites, self.dest_positions):
-            sprite.start_pos = sprite.pos
-            sprite.angle = math.atan2(dest_position[1] - sprite.start_pos[1], dest_position[0] - sprite.start_pos[0])
-            sprite.distance = SpriteMove.calc_distance(dest_position, sprite.start_pos)
-            sprite.completed = False
-
-    @staticmethod
-    def calc_distance(point1, point2):
-        return math.sqrt(math.pow(point1[0] - point2[0], 2) + math.pow(point1[1] - point2[1], 2))
-
-    def update(self):
-        for sprite, dest_position in zip(self.sprites, self.dest_positions):
-            if sprite.completed:
-                continue
-
-            new_pos = (sprite.pos[0] + MOVE_SPEED * math.cos(sprite.angle), sprite.pos[1] + MOVE_SPEED * math.sin(sprite.angle))
-            distance = SpriteMove.calc_distance(new_pos, sprite.start_pos)
-
-            if distance < sprite.distance:
-                sprite.pos = new_pos
-            else:
-                sprite.pos = dest_position
-                sprite.completed = True
+        self._pos = pos
+        self.rect.center = viewport.to_render(pos)
 
-    def is_completed(self):
-        return all([sprite.completed for sprite in self.sprites])
+    def contains(self, pos) -> bool:
+        return self.rect.collidepoint(viewport.to_render(pos))
@@ -1,27 +1,37 @@
-from typing import Tuple
 from collections import namedtuple
 
-from screeninfo import get_monitors
-
-
-def get_game_screen_size() -> Tuple[int, int]:
-    monitor = get_monitors()[0]
-
-    return monitor.width, monitor.height
-
 
 USER = 'USER'
 AGENT = 'AGENT'
 
+DRAW = 'DRAW'  # actions, that can be made instead of throwing a card
+PASS = 'PASS'
+
 Point = namedtuple('Point', 'x y')
 
-SCREEN_SIZE = get_game_screen_size()
-FPS = 100
+FPS = 100  # the cap of the frame rate, frames are rendered that often only while the cards are moving
+IDLE_WAIT_TIMEOUT_MS = 500  # how long the game sleeps waiting for the user input, when nothing is happening
+AI_DEADLINE_MS = 3000  # after that the AI opponent makes a quick heuristic move instead of its own one
+REPLAY_ACTION_DELAY_MS = 400  # pause between the actions of a replayed game at normal speed
+
+PROFILER_WINDOW = 600  # frames, the percentiles are computed over
+PROFILER_OVERLAY_REFRESH_MS = 250
+
+LOGICAL_SIZE = (1920, 1080)  # all the positions and sizes are given in these units, whatever the window and render resolution is
+RENDER_SCALE = 1.0  # the frame is rendered at LOGICAL_SIZE * RENDER_SCALE pixels, and scaled to the window once
 
 CARD_SIZE = (120, 190)
 
 DECK_POSITION = Point(1000, 395)
 TABLE_CENTER = Point(500, 395)
+SKIP_BUTTON_POSITION = Point(100, 395)
+
+HAND_LEFT = 100  # x of the first card of a hand
+AGENT_HAND_Y = 150
+AGENT_CARD_STEP = 90
+USER_HAND_Y = 750
+USER_CARD_STEP = 1.35 * 90
+USER_HAND_TOP, USER_HAND_BOTTOM = 700, 1000  # clicks between them are checked against the user cards
 
 
 def change_card_size(multiplier):
@@ -29,7 +39,12 @@ def change_card_size(multiplier):
     CARD_SIZE = CARD_SIZE[0]*multiplier, CARD_SIZE[1]*multiplier
 
 
-MOVE_SPEED = 15
+MOVE_SPEED = 1500  # pixels per second
+
+UI_FONT_NAME = 'liberationmono'
+UI_FONT_SIZE = 60
+UI_PANEL_FONT_NAME = 'liberationmono'
+UI_PANEL_FONT_SIZE = 18
 
 
 class Color:
@@ -67,6 +82,14 @@ class Suit:
     back_side = 'back_side'
 
 
+class Effect:  # what happens after a card is thrown
+    opponent_skips_move = 'opponent_skips_move'  # ace
+    opponent_takes_one = 'opponent_takes_one'  # eight
+    opponent_takes_two_and_skips = 'opponent_takes_two_and_skips'  # seven
+    opponent_takes_five_and_skips = 'opponent_takes_five_and_skips'  # queen of spades
+    six_must_be_covered = 'six_must_be_covered'  # six
+
+
 CARDS_POINTS_BY_RANK = {
     Rank.six: 0,
     Rank.seven: 50,
@@ -78,3 +101,27 @@ CARDS_POINTS_BY_RANK = {
     Rank.king: 0,
     Rank.ace: 25
 }
+
+
+# Bitboard representation of a set of cards: every card is one bit of a 36-bit integer,
+# bit index = suit index * 9 + rank index. Counting cards of some rank or suit is then a mask and a popcount.
+SUITS = (Suit.hearts, Suit.diamonds, Suit.clubs, Suit.spades)
+RANKS = (Rank.six, Rank.seven, Rank.eight, Rank.nine, Rank.ten, Rank.jack, Rank.queen, Rank.king, Rank.ace)
+
+CARD_BITS = {
+    (rank, suit): 1 << (suit_index * len(RANKS) + rank_index)
+    for suit_index, suit in enumerate(SUITS)
+    for rank_index, rank in enumerate(RANKS)
+}
+
+SUIT_MASKS = {suit: ((1 << len(RANKS)) - 1) << (suit_index * len(RANKS)) for suit_index, suit in enumerate(SUITS)}
+RANK_MASKS = {rank: sum(CARD_BITS[rank, suit] for suit in SUITS) for rank in RANKS}
+
+FULL_DECK_MASK = (1 << len(SUITS) * len(RANKS)) - 1
+
+
+def iterate_bits(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
@@ -1,423 +1,432 @@
 import math
-from random import sample, choice
+from collections import deque
+from random import Random
 
 import pygame as pg
 
-from src.card import Card
-from src.card_sprite import SpriteMove
+from src.agent import HeuristicAgent
+from src.agent_runner import AgentRunner
+from src.animation import Animator
+from src.asset_pack import load_board_image
+from src.card_sprite import CardSprite
 from src.deck import Deck
+from src.game_record import get_action_from_record
+from src.renderer import DirtyRenderer
+from src.rules import GameState, RulesEngine, RulesListener, ListenerGroup
+from src.surface_cache import surface_cache
+from src.ui import TextWidget, TextPanel, GameOverBanner
+from src.viewport import viewport
 from src.const import *
 
 
-class GameController:
-    def __init__(self, sound_controller=None):
+class GameController(RulesListener):
+    def __init__(self, sound_controller=None, fps=FPS, agent=None, seed=None, game_log=None, replay=None, replay_speed=1.0, profiler=None, on_first_frame=None,
+                 ai_deadline_ms=AI_DEADLINE_MS, render_scale=RENDER_SCALE, asset_pack=None):
+        """
+            game_log - GameRecordWriter, the game is appended to it.
+            replay - GameRecord, that is shown instead of the real game, replay_speed times faster than the normal animation.
+            profiler - FrameProfiler, that times every frame, F3 shows its overlay.
+            on_first_frame - called once, right after the first frame is on the screen.
+            ai_deadline_ms - how long the agent may think in the background, before a fallback move is made.
+            render_scale - the frame is rendered at LOGICAL_SIZE * render_scale pixels, lower it on slow machines.
+            asset_pack - AssetPack, the images are taken from instead of decoding them.
+        """
+
         self.sound_controller = sound_controller
+        self.fps = fps
 
-        self.screen = pg.display.set_mode(SCREEN_SIZE)
+        # the frame is rendered at the fixed logical resolution (times render_scale), SDL scales it to the window
+        viewport.set_render_scale(render_scale)
+        self.screen = pg.display.set_mode(viewport.render_size, pg.SCALED)
         self.clock = pg.time.Clock()
 
-        self.background_image = pg.image.load('src/img/board.jpg')
-        self.screen.blit(self.background_image, (0, 0))
+        self.asset_pack = asset_pack
+        surface_cache.asset_pack = asset_pack
+
+        self.background_image = self._load_background()
+        self.renderer = DirtyRenderer(self.screen, self.background_image)
+
+        surface_cache.preload_in_background(viewport.scale_size(CARD_SIZE))
+
+        if replay is not None:
+            seed = replay.seed
+        elif seed is None:
+            seed = Random().getrandbits(32)
 
-        self.deck = Deck()
-    
-        self.deck_card_sprite_group = pg.sprite.Group([self.deck.create_card(DECK_POSITION, Suit.back_side, Rank.back_side).sprite])
+        self.game_log = game_log
+        if game_log is not None:
+            game_log.start_game(seed)
+
+        self.replay_actions = deque(replay.get_actions()) if replay is not None else None
+        self.replay_speed = replay_speed
+        self.last_replay_action_at = 0
+
+        self.deck = Deck(Random(seed))
+        self.state = GameState(self.deck)
+        self.rules = RulesEngine(self.state, listener=self if game_log is None else ListenerGroup(game_log, self))
+        self.agent = agent if agent is not None else HeuristicAgent(AGENT)
+        self.agent_runner = AgentRunner(self.agent, deadline_ms=ai_deadline_ms)
+        self.actions_applied = 0  # the version of the game, the results of the agent are valid only for the version they were asked for
+        self.agent_plan = deque()  # the rest of the actions of the agent in this turn, one is applied after every animation
+
+        self.card_sprites = {}  # card id -> CardSprite
+        self.free_back_side_sprites = []
+
+        self.deck_card_sprite_group = pg.sprite.Group([CardSprite(DECK_POSITION.x, DECK_POSITION.y, Rank.back_side, Suit.back_side)])
         self.card_in_action_sprite_group = pg.sprite.Group([])
         self.user_cards_sprites = pg.sprite.Group([])
         self.agent_cards_sprites = pg.sprite.Group([])
 
-        self.sprite_moves = []
-        self.current_player_move = USER
-        self.game_is_over = False
+        self.animator = Animator()
         self.is_animating = True
+        self.game_over_is_drawn = False
+
+        self.frames_rendered = 0  # frames, that have pushed something to the display
+        self.frames_skipped = 0  # loop iterations, when nothing has changed, so nothing was drawn
 
-        self.show_skip_button = True
-        self.skip_button_pos = Point(100, 395)
+        self.skip_button = TextWidget('SKIP', SKIP_BUTTON_POSITION)
+        self.skip_button_sprites = pg.sprite.Group([self.skip_button])
 
-        self.can_through_only_by_rank = True  # this value represents if we have already made a move.
-        # if can_through_only_by_rank is True, that means that we can only through cards with the same rank, as on the table
-        #
-        # If we through QUEEN, now we can through up only cards with the rank of QUEEN, and can_through_only_by_rank will be True
+        self.on_first_frame = on_first_frame
 
-        self.can_get_new_card = False
-        self.six_in_action = False
+        self.profiler = profiler
+        self.profiler_overlay = TextPanel(topleft=(10, 10))
+        self.profiler_overlay_sprites = pg.sprite.Group([self.profiler_overlay])
+        self.profiler_overlay_is_shown = False
+        self.profiler_overlay_updated_at = 0
 
-        self._initialize_board()
+        s_w, s_h = LOGICAL_SIZE
+        self.game_over_banner = GameOverBanner(center=(s_w//2, s_h//2))
+
+        self.rules.start_game()
+
+    def _load_background(self):
+        background_image = self.asset_pack.get_board(viewport.render_size) if self.asset_pack is not None else None
+        if background_image is None:
+            background_image = load_board_image(viewport.render_size)
+
+        return background_image.convert()
 
     def main_loop(self):
+        if self.profiler is not None:
+            self._profiled_main_loop()
+
         while True:
-            self._check_if_game_is_over()
-            self.is_animating = len(self.sprite_moves) != 0
+            is_idle = self._start_frame()
+
+            self._handle_events(self._get_events(wait=is_idle))
+            self._make_ai_action()
+            self._update_animation()
+            self._update_display(self._draw_frame())
 
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    exit()
-                elif not self.is_animating and event.type == pg.MOUSEBUTTONDOWN:
-                    self._check_user_input()
+            if not is_idle:
+                self.clock.tick(self.fps)
 
-            if self.game_is_over:
-                continue
+    def _profiled_main_loop(self):
+        """
+            The same loop as main_loop, but every phase is timed. It is kept separate,
+            so the game without the profiler does not pay anything for it.
+        """
 
-            if not self.is_animating and self.current_player_move == AGENT and not self.can_through_only_by_rank:
-                self._ai_decide_which_move_to_make()
-            elif not self.is_animating and self.current_player_move == AGENT:
-                self._ai_through_up_all_possible_cards()
+        profiler = self.profiler
 
+        while True:
+            profiler.start_frame()
+            is_idle = self._start_frame()
+
+            events = self._get_events(wait=is_idle)
+            profiler.mark('wait' if is_idle else 'events')
+            self._handle_events(events)
+            profiler.mark('events')
+            self._make_ai_action()
+            profiler.mark('ai')
             self._update_animation()
+            profiler.mark('animation')
+            dirty_rects = self._draw_frame()
+            profiler.mark('draw')
+            self._update_display(dirty_rects)
+            profiler.mark('display')
+
+            if not is_idle:
+                self.clock.tick(self.fps)
+                profiler.mark('tick')
+
+            profiler.end_frame()
+            self._update_profiler_overlay()
+
+    def _start_frame(self):
+        surface_cache.take_preloaded()
+        self.is_animating = self.animator.is_animating()
+        return self._is_idle()
+
+    def _handle_events(self, events):
+        for event in events:
+            if event.type == pg.QUIT:
+                self._quit()
+            elif event.type == pg.VIDEOEXPOSE:
+                self.renderer.mark_all_dirty()
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F3 and self.profiler is not None:
+                self.profiler_overlay_is_shown = not self.profiler_overlay_is_shown
+            elif not self.is_animating and not self.state.game_is_over and event.type == pg.MOUSEBUTTONDOWN:
+                self._check_user_input()
+
+    def _make_ai_action(self):
+        if self.is_animating or self.state.game_is_over:
+            return
 
-            self.screen.blit(self.background_image, (0, 0))
-
-            self.deck_card_sprite_group.draw(self.screen)
-            self.card_in_action_sprite_group.draw(self.screen)
-            self.agent_cards_sprites.draw(self.screen)
-            self.user_cards_sprites.draw(self.screen)
+        if self.replay_actions is not None:
+            self._make_replay_action()
+        elif self.state.current_player_move == AGENT:
+            if not self.agent_plan:
+                actions = self.agent_runner.poll(self.rules, self.actions_applied)
+                if actions is None:
+                    return
 
-            if self.show_skip_button:
-                self._render_skip_button()
+                self.agent_plan.extend(actions)
 
-            pg.display.update()
-            self.clock.tick(FPS)
+            action = self.agent_plan.popleft()
+            if action in self.rules.get_legal_actions():
+                self.rules.apply(action)
+            else:  # the plan does not fit the game any more, the agent is asked again
+                self.agent_plan.clear()
 
-    def _check_user_input(self):
-        rel = pg.mouse.get_rel()  # we need these three lines, so that if we click mouse once it won't make 100 events of it
-        if math.fabs(rel[0]) < 1 and math.fabs(rel[1]) < 1:
+    def _update_profiler_overlay(self):
+        if not self.profiler_overlay_is_shown:
             return
 
-        if self.current_player_move == USER:
-            mouse_pos = Point(*pg.mouse.get_pos())
+        now = pg.time.get_ticks()
+        if now - self.profiler_overlay_updated_at >= PROFILER_OVERLAY_REFRESH_MS:
+            self.profiler_overlay.set_lines(self.profiler.format_report() + surface_cache.format_report() + self._format_agent_report())
+            self.profiler_overlay_updated_at = now
 
-            if self.can_get_new_card and self._user_has_chosen_deck(mouse_pos):
-                self._player_gets_a_card_from_deck(USER)
+    def _is_idle(self):
+        """
+            Nothing is going to change on the screen until the user does something:
+            there is no animation, and either it is the user's move, or the game is over.
+        """
 
-                if not self.six_in_action:
-                    self.can_get_new_card = False
-                    self.show_skip_button = True
-            elif 700 < mouse_pos.y < 1000:
-                for user_card in self.deck.user_cards:
-                    if user_card.was_chosen(mouse_pos):
-                        if self.can_make_move(user_card):
-                            self._make_a_move(user_card)
-                            break
-                        else:
-                            self.sound_controller.play(0, 0, fade_ms=5)
-            elif self._user_is_pressing_skip_button(mouse_pos):
-                self.current_player_move = AGENT
-                self.show_skip_button = False
-                self.can_get_new_card = True
-                self.can_through_only_by_rank = False
+        if self.is_animating:
+            return False
 
-    def _check_if_game_is_over(self):
-        if len(self.deck.agent_cards) == 0 or len(self.deck.user_cards) == 0:
-            self._draw_game_over(self.current_player_move)
-            self.game_is_over = True
+        if self.replay_actions and not self.state.game_is_over:
+            return False
 
-    def _user_has_chosen_deck(self, mouse_pos):
-        width, height = CARD_SIZE
-        x, y = mouse_pos.x, mouse_pos.y
+        return self.state.game_is_over or self.replay_actions is not None or self.state.current_player_move == USER
 
-        fits_y = DECK_POSITION.y - height // 2 < y < DECK_POSITION.y + height // 2
-        fits_x = DECK_POSITION.x - width // 2 < x < DECK_POSITION.x + width // 2
+    @staticmethod
+    def _get_events(wait):
+        if not wait:
+            return pg.event.get()
 
-        return fits_y and fits_x
+        event = pg.event.wait(IDLE_WAIT_TIMEOUT_MS)  # sleeping, until the user does something
+        events = pg.event.get()
 
-    def _update_animation(self):
-        for move in self.sprite_moves:
-            move.update()
-
-            if move.is_completed():
-                self.sprite_moves.remove(move)
-
-    def _initialize_board(self):
-        self.deck.initialize_deck()
-        
-        self.agent_cards_sprites.add([self.deck.create_card(DECK_POSITION, Suit.back_side, Rank.back_side).sprite for i in range(len(self.deck.agent_cards))])
-        self.user_cards_sprites.add([c.sprite for c in self.deck.user_cards])
-        self.card_in_action_sprite_group.add(self.deck.card_in_action.sprite)
-        
-        self.sprite_moves.append(SpriteMove([self.deck.card_in_action.sprite], [TABLE_CENTER]))
-        
-        agent_cards_coords = [Point(100 + i * 90, 150) for i in range(len(self.deck.agent_cards))]
-        self.sprite_moves.append(SpriteMove(list(self.agent_cards_sprites), agent_cards_coords))
-
-        user_cards_coords = [Point(100 + (i * 1.35) * 90, 750) for i in range(len(self.deck.user_cards))]
-        self.sprite_moves.append(SpriteMove(list(self.user_cards_sprites), user_cards_coords))
-
-        self._check_the_effect_of_the_move()
-
-    def can_make_move(self, chosen_card: Card):
-        return self.deck.card_in_action is None \
-               or ((self.deck.card_in_action.suit == chosen_card.suit or chosen_card.rank == Rank.jack) and not self.can_through_only_by_rank) \
-               or self.deck.card_in_action.rank == chosen_card.rank \
+        if event.type != pg.NOEVENT:
+            events.insert(0, event)
 
-    def _user_is_pressing_skip_button(self, mouse_pos):
-        fits_x = self.skip_button_pos.x - 50 < mouse_pos.x < self.skip_button_pos.x + 50
-        fits_y = self.skip_button_pos.y - 50 < mouse_pos.y < self.skip_button_pos.y + 50
+        return events
 
-        return self.show_skip_button and fits_x and fits_y
+    def _draw_frame(self):
+        if self.state.game_is_over and not self.animator.is_animating() and not self.game_over_is_drawn:
+            self._draw_game_over(self.state.winner)
 
-    def _make_a_move(self, card: Card):
-        self.deck.deactivated_cards.add(self.deck.card_in_action)
+        return self.renderer.render(self._get_render_layers())
 
-        if self.current_player_move == USER:
-            self.deck.user_cards.difference_update({card})
-            self.user_cards_sprites.remove(card.sprite)
+    def _update_display(self, dirty_rects):
+        if dirty_rects:
+            pg.display.update(dirty_rects)
+            self.frames_rendered += 1
 
-            user_cards_coords = [Point(100 + (i * 1.35) * 90, 750) for i in range(len(self.deck.user_cards))]
-            self.sprite_moves.append(SpriteMove(list(self.user_cards_sprites), user_cards_coords))
-            self.sprite_moves.append(SpriteMove([card.sprite], [TABLE_CENTER]))
+            if self.frames_rendered == 1 and self.on_first_frame is not None:
+                self.on_first_frame()
         else:
-            self.deck.agent_cards.difference_update({card})
-            self.agent_cards_sprites = pg.sprite.Group([self.deck.create_card(Point(100 + i * 90, 150), Suit.back_side, Rank.back_side).sprite for i in range(len(self.deck.agent_cards))])
-            card.sprite.pos = (100, 150)
-            self.sprite_moves.append(SpriteMove([card.sprite], [TABLE_CENTER]))
-
-        self.deck.card_in_action = card
-        self.card_in_action_sprite_group = pg.sprite.Group([card.sprite])
-
-        self._check_the_effect_of_the_move()
-
-    def _check_the_effect_of_the_move(self):
-        self.can_get_new_card = False
-        self.show_skip_button = True
-        self.can_through_only_by_rank = True
-        self.six_in_action = False
-
-        if self.deck.card_in_action.rank == Rank.ace:
-            self._opponent_skips_move()
-        elif self.deck.card_in_action.rank == Rank.eight:
-            target_player = USER if self.current_player_move == AGENT else AGENT
-
-            self._player_gets_a_card_from_deck(target_player)
-        elif self.deck.card_in_action.rank == Rank.seven:
-            target_player = USER if self.current_player_move == AGENT else AGENT
-
-            self._player_gets_a_card_from_deck(target_player)
-            self._player_gets_a_card_from_deck(target_player)
-
-            self._opponent_skips_move()
-        elif self.deck.card_in_action.suit == Suit.spades and self.deck.card_in_action.rank == Rank.queen:
-            target_player = USER if self.current_player_move == AGENT else AGENT
-
-            self._player_gets_a_card_from_deck(target_player)
-            self._player_gets_a_card_from_deck(target_player)
-            self._player_gets_a_card_from_deck(target_player)
-            self._player_gets_a_card_from_deck(target_player)
-            self._player_gets_a_card_from_deck(target_player)
-
-            self._opponent_skips_move()
-        elif self.deck.card_in_action.rank == Rank.six:
-            self.six_in_action = True
-            self.can_get_new_card = True
-            self.show_skip_button = False
-            self.can_through_only_by_rank = False
-
-    def _player_gets_a_card_from_deck(self, player):
-        random_card = self.deck.get_random_card_from_deck()
+            self.frames_skipped += 1
 
-        if player == USER:
-            self.deck.user_cards.add(random_card)
-            self.user_cards_sprites.add(random_card.sprite)
+    def _make_replay_action(self):
+        if not self.replay_actions:
+            return
 
-            destination_pos = Point(100 + ((len(self.deck.user_cards) - 1) * 1.35) * 90, 750)
-            self.sprite_moves.append(SpriteMove([random_card.sprite], [destination_pos]))
-        else:
-            self.deck.agent_cards.add(random_card)
-            card_sprite = self.deck.create_card(DECK_POSITION, Suit.back_side, Rank.back_side).sprite
-            self.agent_cards_sprites.add(card_sprite)
+        now = pg.time.get_ticks()
+        if now - self.last_replay_action_at < REPLAY_ACTION_DELAY_MS / self.replay_speed:
+            return
 
-            destination_pos = Point(100 + (len(self.deck.agent_cards) - 1) * 90, 150)
-            self.sprite_moves.append(SpriteMove([card_sprite], [destination_pos]))
+        _, action = self.replay_actions.popleft()
+        self.rules.apply(get_action_from_record(self.rules, action))
+        self.last_replay_action_at = now
 
-    def _opponent_skips_move(self):
-        self.show_skip_button = False
-        self.can_get_new_card = True
-        self.can_through_only_by_rank = False
+    def _move_sprites(self, sprites, dest_positions):
+        self.animator.move(sprites, dest_positions, speed=MOVE_SPEED * self.replay_speed)
 
-    def _ai_decide_which_move_to_make(self):
-        """
-            The function, that decides which move Agent is going to make.
-        """
+    def _format_agent_report(self):
+        lines = self.agent_runner.format_report()
 
-        ai_has_any_moves = len(self._ai_get_all_possible_moves())  # checking if there are any moves Agent can make
+        endgame_solver = getattr(self.agent, 'endgame_solver', None)
+        if endgame_solver is not None:
+            lines += endgame_solver.format_report()
 
-        if self.can_get_new_card and not ai_has_any_moves:
-            self._player_gets_a_card_from_deck(AGENT)
-            self.can_get_new_card = False
-            self._ai_decide_which_move_to_make()  # getting a card from a deck, and checking if there are any possible moves again
-        elif not ai_has_any_moves:  # we still have no possible moves, and we have already got a card from a deck
-            self._ai_finishes_his_move()
-        else:
-            self.can_get_new_card = False
+        return lines
 
-            possible_moves = self._ai_get_all_possible_moves()  # getting all possible moves
-            best_card_to_move = max(possible_moves, key=self._ai_value_the_move)  # value each possible move, and choose the best one
+    def _quit(self):
+        self.agent_runner.close()
 
-            self._make_a_move(best_card_to_move)
+        if self.game_log is not None:
+            self.game_log.close()
 
-    def _ai_value_the_move(self, move_card: Card) -> int:
-        """
-            This function calculates the value of the move.
-        
-            move_card is object of Card from self.deck.agent_cards.
-        """
-        
-        if len(self.deck.user_cards) == 1:  # if user have only 1 card, the game is almost over, and we got to play aggressive in order not to lose 
-            return self._ai_value_the_move_in_danger_situation(move_card)  # so in danger situation, the value of moves that makes our opponent get cards are higher
+        if self.profiler is not None:
+            self.profiler.close()
+            print('\n'.join(self.profiler.format_report() + surface_cache.format_report() + self._format_agent_report()))
 
-        suit, rank = move_card.suit, move_card.rank
-        move_points = CARDS_POINTS_BY_RANK[rank]  # getting initial points of our card
+        exit()
 
-        if rank == Rank.queen and suit == Suit.spades:  # adding points if it is queen spades
-            move_points += 150
+    def on_action(self, player, action):
+        self.actions_applied += 1
 
-        move_points += (self._ai_count_cards_with_specific_rank(rank) - 1) * 60  # counting the number of cards we can through up and giving extra points if there are any
-        move_points += (self._ai_count_cards_with_specific_rank(rank) - 1) * CARDS_POINTS_BY_RANK[rank]  # we need it, so the sequence of two Aces will value more than two 9.
+    def on_game_over(self, winner):
+        if self.game_log is not None:
+            self.game_log.flush()
 
-        if self._ai_count_cards_with_specific_suit(suit) == 1 and self._ai_count_cards_with_specific_rank(rank) == 1:
-            move_points -= 70  # decreasing our points if we don't have the suit we are going to through
+    def get_frame_stats(self):
+        return {'frames_rendered': self.frames_rendered, 'frames_skipped': self.frames_skipped}
 
-        if move_card.rank == Rank.six:  # if our move is Six, we find the best sequence which we can cover this Six with
-            move_points += len(self._ai_find_max_rank_sequence(suit)) * 60
+    def _get_render_layers(self):
+        layers = [
+            self.deck_card_sprite_group,
+            self.card_in_action_sprite_group,
+            self.agent_cards_sprites,
+            self.user_cards_sprites,
+        ]
 
-        return move_points
-    
-    def _ai_get_all_possible_moves(self):
-        moves = []
-        for card in self.deck.agent_cards:
-            if self.can_make_move(card):
-                if card.rank != Rank.six or self._ai_can_cover_six(card.suit):  # if we have a Six, but we have nothing to "cover" it, we won't through this Six
-                    moves.append(card)
+        if self.state.show_skip_button:
+            layers.append(self.skip_button_sprites)
 
-        return moves
+        if self.game_over_is_drawn:
+            layers.append(self.game_over_banner)
 
-    def _ai_value_the_move_in_danger_situation(self, move_card: Card):
-        """
-            This method counts the points of the move in danger situation, when Agent on the edge of losing.
+        if self.profiler_overlay_is_shown:
+            layers.append(self.profiler_overlay_sprites)
 
-            In such situation, we have to make moves that makes our opponent take cards.
-        """
+        return layers
 
-        suit, rank = move_card.suit, move_card.rank
-        move_points = CARDS_POINTS_BY_RANK[rank]
+    def _check_user_input(self):
+        rel = pg.mouse.get_rel()  # we need these three lines, so that if we click mouse once it won't make 100 events of it
+        if math.fabs(rel[0]) < 1 and math.fabs(rel[1]) < 1:
+            return
 
-        if rank == Rank.seven:
-            move_points += 250 * self._ai_count_cards_with_specific_rank(Rank.seven)
+        if self.state.current_player_move == USER and self.replay_actions is None:
+            mouse_pos = viewport.to_logical(pg.mouse.get_pos())  # pg.SCALED gives the position on the render surface
 
-        if rank == Rank.eight:
-            move_points += 120 * self._ai_count_cards_with_specific_rank(Rank.eight)
+            if self.rules.can_draw_card() and self._user_has_chosen_deck(mouse_pos):
+                self.rules.apply(DRAW)
+            elif USER_HAND_TOP < mouse_pos.y < USER_HAND_BOTTOM:
+                for user_card in self.deck.user_cards:
+                    if self._get_card_sprite(user_card).contains(mouse_pos):
+                        if self.rules.can_make_move(user_card):
+                            self.rules.apply(user_card)
+                            break
+                        else:
+                            self.sound_controller.play(0, 0, fade_ms=5)
+            elif self._user_is_pressing_skip_button(mouse_pos):
+                self.rules.apply(PASS)
 
-        if rank == Rank.queen and suit == Suit.spades:
-            move_points += 350
+    def _user_has_chosen_deck(self, mouse_pos):
+        width, height = CARD_SIZE
+        x, y = mouse_pos.x, mouse_pos.y
 
-        if self._ai_count_cards_with_specific_suit(suit) == 1 and self._ai_count_cards_with_specific_rank(rank) == 1:
-            move_points -= 70
+        fits_y = DECK_POSITION.y - height // 2 < y < DECK_POSITION.y + height // 2
+        fits_x = DECK_POSITION.x - width // 2 < x < DECK_POSITION.x + width // 2
 
-        return move_points
+        return fits_y and fits_x
 
-    def _ai_count_cards_with_specific_rank(self, rank):
-        result = 0
-        for card in self.deck.agent_cards:
-            if card.rank == rank:
-                result += 1
+    def _update_animation(self):
+        self.animator.update()
 
-        return result
+    def on_cards_dealt(self):
+        self.agent_cards_sprites.add([self._get_back_side_sprite(DECK_POSITION) for i in range(len(self.deck.agent_cards))])
+        self.user_cards_sprites.add([self._get_card_sprite(c) for c in self.deck.user_cards])
+        self.card_in_action_sprite_group.add(self._get_card_sprite(self.deck.card_in_action))
 
-    def _ai_count_cards_with_specific_suit(self, suit):
-        result = 0
-        for card in self.deck.agent_cards:
-            if card.suit == suit:
-                result += 1
+        self._move_sprites([self._get_card_sprite(self.deck.card_in_action)], [TABLE_CENTER])
 
-        return result
+        agent_cards_coords = [self._get_agent_card_position(i) for i in range(len(self.deck.agent_cards))]
+        self._move_sprites(list(self.agent_cards_sprites), agent_cards_coords)
 
-    def _ai_finishes_his_move(self):
-        self.can_get_new_card = True
-        self.show_skip_button = False
-        self.can_through_only_by_rank = False
-        self.current_player_move = USER
+        user_cards_coords = [self._get_user_card_position(i) for i in range(len(self.deck.user_cards))]
+        self._move_sprites(list(self.user_cards_sprites), user_cards_coords)
 
-    def _ai_through_up_all_possible_cards(self):
-        """
-            This method checks if we can through up any cards, and if not finishes the Agent move.
+    def _user_is_pressing_skip_button(self, mouse_pos):
+        return self.state.show_skip_button and self.skip_button.contains(mouse_pos)
 
-            By through up, I mean put additional cards, like:
-                I have three cards: 9 spades 9 diamonds and 9 hearts, so I can make a move with 9 spades
-                and through up 9 diamonds and 9 hearts.
-        """
+    def on_card_played(self, player, card):
+        card_sprite = self._get_card_sprite(card)
 
-        possible_thoughts = []
+        if player == USER:
+            self.user_cards_sprites.remove(card_sprite)
 
-        if self.deck.card_in_action.rank == Rank.six:
-            best_sequence = self._ai_find_best_sequence_to_cover_six(self.deck.card_in_action.suit)
-            self._make_a_move(best_sequence[0])
+            user_cards_coords = [self._get_user_card_position(i) for i in range(len(self.deck.user_cards))]
+            self._move_sprites(list(self.user_cards_sprites), user_cards_coords)
+            self._move_sprites([card_sprite], [TABLE_CENTER])
         else:
-            for card in self.deck.agent_cards:
-                if self.deck.card_in_action.rank == card.rank:
-                    possible_thoughts.append(card)
+            back_side_sprite = self.agent_cards_sprites.sprites()[-1]  # the agent has one card less, the rest of the sprites are reused
+            self.agent_cards_sprites.remove(back_side_sprite)
+            self.free_back_side_sprites.append(back_side_sprite)
 
-            if possible_thoughts:
-                self._make_a_move(max(possible_thoughts, key=self._ai_value_the_move))
-            else:
-                self._ai_finishes_his_move()
+            for i, agent_card_sprite in enumerate(self.agent_cards_sprites):
+                agent_card_sprite.pos = self._get_agent_card_position(i)
 
-    def _ai_can_cover_six(self, six_suit, check_another_sixs=True):
-        if self._ai_count_cards_with_specific_suit(six_suit) > 1:
-            return True
+            card_sprite.pos = self._get_agent_card_position(0)
+            self._move_sprites([card_sprite], [TABLE_CENTER])
 
-        if self._ai_count_cards_with_specific_rank(Rank.six) > 1 and check_another_sixs:
-            another_six = []
-            for card in self.deck.agent_cards:
-                if card.rank == Rank.six and card.suit != six_suit:
-                    another_six.append(card)
+        self.card_in_action_sprite_group = pg.sprite.Group([card_sprite])
 
-            return any([self._ai_can_cover_six(another_six.suit, check_another_sixs=False) for another_six in another_six])
-
-    def _ai_find_best_sequence_to_cover_six(self, six_suit):
-        max_sequence = self._ai_find_max_rank_sequence(six_suit)
+    def on_card_drawn(self, player, card):
+        if player == USER:
+            card_sprite = self._get_card_sprite(card)
+            card_sprite.pos = DECK_POSITION  # the card could have been on the table before the deck was reshuffled
+            self.user_cards_sprites.add(card_sprite)
 
-        for card in self.deck.agent_cards:
-            if card.rank == Rank.six and card.suit != six_suit:
-                new_best_sequence = self._ai_find_max_rank_sequence(card.suit)
-                if len(new_best_sequence) + 1 > len(max_sequence):
-                    max_sequence = [card]
-                    max_sequence.extend(new_best_sequence)
+            destination_pos = self._get_user_card_position(len(self.deck.user_cards) - 1)
+            self._move_sprites([card_sprite], [destination_pos])
+        else:
+            card_sprite = self._get_back_side_sprite(DECK_POSITION)
+            self.agent_cards_sprites.add(card_sprite)
 
-        return max_sequence
+            destination_pos = self._get_agent_card_position(len(self.deck.agent_cards) - 1)
+            self._move_sprites([card_sprite], [destination_pos])
 
-    def _ai_find_max_rank_sequence(self, suit):
-        max_sequence = []
+    @staticmethod
+    def _get_agent_card_position(index):
+        return Point(HAND_LEFT + index * AGENT_CARD_STEP, AGENT_HAND_Y)
 
-        for card in self.deck.agent_cards:
-            if card.suit == suit and card.rank != Rank.six:
-                if self._ai_count_cards_with_specific_rank(card.rank) > len(max_sequence):
-                    max_sequence = [card]
+    @staticmethod
+    def _get_user_card_position(index):
+        return Point(HAND_LEFT + index * USER_CARD_STEP, USER_HAND_Y)
 
-                    for another_card in self.deck.agent_cards:
-                        if another_card.rank == card.rank and another_card.suit != card.suit:
-                            max_sequence.append(another_card)
+    def _get_card_sprite(self, card):
+        """
+            Every card has one sprite, created when the card is shown for the first time.
+        """
 
-        return max_sequence
+        card_sprite = self.card_sprites.get(card.id)
+        if card_sprite is None:
+            card_sprite = self.card_sprites[card.id] = CardSprite(DECK_POSITION.x, DECK_POSITION.y, card.rank, card.suit)
 
-    def _draw_game_over(self, winner):
-        font = pg.font.SysFont('liberationmono', 60)
-        game_over_text = font.render('GAME OVER', True, Color.LIGHT_RED, Color.WHITE)
+        return card_sprite
 
-        s_w, s_h = SCREEN_SIZE
-        pos_game_over = game_over_text.get_rect(center=(s_w//2, s_h//2))
+    def _get_back_side_sprite(self, position: Point):
+        """
+            Back side sprites of the agent's cards are reused: a played card gives its sprite back to the pool.
+        """
 
-        winning_string = 'User is a winner' if winner == USER else 'Agent is a winner'
-        winning_text = font.render(winning_string, True, Color.LIGHT_RED, Color.WHITE)
-        pos_winner_text = winning_text.get_rect(center=(s_w//2, s_h//2 + 100))
+        if self.free_back_side_sprites:
+            back_side_sprite = self.free_back_side_sprites.pop()
+            back_side_sprite.pos = position
 
-        self.screen.blit(game_over_text, pos_game_over)
-        self.screen.blit(winning_text, pos_winner_text)
-        pg.display.update()
+            return back_side_sprite
 
-    def _render_skip_button(self):
-        font = pg.font.SysFont('liberationmono', 60)
+        return CardSprite(position.x, position.y, Rank.back_side, Suit.back_side)
 
-        skip_text = font.render('SKIP', True, Color.LIGHT_RED, Color.WHITE)
-        pos_skip_text = skip_text.get_rect(center=(self.skip_button_pos.x, self.skip_button_pos.y))
+    def _draw_game_over(self, winner):
+        winning_string = 'User is a winner' if winner == USER else 'Agent is a winner'
 
-        self.screen.blit(skip_text, pos_skip_text)
-        pg.display.update()
+        self.game_over_banner.set_winner(winning_string)
+        self.game_over_is_drawn = True  # the banner is a layer now, so the renderer draws it only once
@@ -1,50 +1,200 @@
-from random import sample, choice
+from random import Random
 
-from src.card import Card
-from src.const import Rank, Suit, Point, DECK_POSITION
+from src.card import CARDS, CARDS_BY_BIT
+from src.const import iterate_bits
+
+
+def _get_bits(cards):
+    bits = 0
+
+    for card in cards:
+        bits |= card.bit
+
+    return bits
+
+
+class CardSet(set):
+    """
+        Set of cards, that keeps the bitboard of its cards (see CARD_BITS) in the bits attribute.
+        Every mutator of set is overridden, so bits can not go out of sync with the cards.
+    """
+
+    def __init__(self, cards=()):
+        super().__init__(cards)
+        self.bits = _get_bits(self)
+
+    def add(self, card):
+        super().add(card)
+        self.bits |= card.bit
+
+    def remove(self, card):
+        super().remove(card)
+        self.bits &= ~card.bit
+
+    def discard(self, card):
+        super().discard(card)
+        self.bits &= ~card.bit
+
+    def pop(self):
+        card = super().pop()
+        self.bits &= ~card.bit
+
+        return card
+
+    def clear(self):
+        super().clear()
+        self.bits = 0
+
+    def update(self, *others):
+        for cards in others:
+            for card in cards:
+                self.add(card)
+
+    def difference_update(self, *others):
+        for cards in others:
+            for card in cards:
+                self.discard(card)
+
+    def intersection_update(self, *others):
+        super().intersection_update(*others)
+        self.bits = _get_bits(self)
+
+    def symmetric_difference_update(self, cards):
+        super().symmetric_difference_update(cards)
+        self.bits = _get_bits(self)
+
+    def __ior__(self, cards):
+        self.update(cards)
+        return self
+
+    def __isub__(self, cards):
+        self.difference_update(cards)
+        return self
+
+    def __iand__(self, cards):
+        self.intersection_update(cards)
+        return self
+
+    def __ixor__(self, cards):
+        self.symmetric_difference_update(cards)
+        return self
+
+
+class CardPile(list):
+    """
+        Ordered pile of cards (the deck or the deactivated cards), the top of the pile is the end of the list,
+        so taking a card is an O(1) pop. Like CardSet it keeps the bitboard of its cards in the bits attribute,
+        and every mutator of list is overridden. The cards of a pile are different, so the bit of a card is dropped,
+        when the card leaves the pile. Changing the cards by index recounts the bits, so shuffle a plain list instead.
+    """
+
+    def __init__(self, cards=()):
+        super().__init__(cards)
+        self.bits = _get_bits(self)
+
+    def append(self, card):
+        super().append(card)
+        self.bits |= card.bit
+
+    def extend(self, cards):
+        for card in cards:
+            self.append(card)
+
+    def insert(self, index, card):
+        super().insert(index, card)
+        self.bits |= card.bit
+
+    def remove(self, card):
+        super().remove(card)
+        self.bits &= ~card.bit
+
+    def pop(self, index=-1):
+        card = super().pop(index)
+        self.bits &= ~card.bit
+
+        return card
+
+    def clear(self):
+        super().clear()
+        self.bits = 0
+
+    def __setitem__(self, index, cards):
+        super().__setitem__(index, cards)
+        self.bits = _get_bits(self)
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.bits = _get_bits(self)
+
+    def __iadd__(self, cards):
+        self.extend(cards)
+        return self
+
+    def __imul__(self, times):
+        super().__imul__(times)
+        self.bits = _get_bits(self)
+        return self
 
 
 class Deck:
-    def __init__(self):
-        self.user_cards = set()
-        self.agent_cards = set()
-        self.deck_cards = set()
-        self.deactivated_cards = set()
+    def __init__(self, rng: Random = None):
+        self.rng = rng if rng is not None else Random()  # pass a seeded Random to get the same deals again
+
+        self.user_cards = CardSet()
+        self.agent_cards = CardSet()
+        self.deck_cards = CardPile()  # shuffled draw pile
+        self.deactivated_cards = CardPile()  # discard pile, it becomes the new draw pile, when the deck is over
         self.card_in_action = None
 
-    def initialize_deck(self):
-        self.deck_cards = self._create_all_possible_cards()
+        self.cards_by_bit = CARDS_BY_BIT  # the cards are shared flyweights, so every deck has the same ones
 
-        self.agent_cards = set(sample(self.deck_cards, 5))
-        self.deck_cards.difference_update(self.agent_cards)
+    def initialize_deck(self):
+        all_cards = list(CARDS)  # the order of ids, so a seed gives the same deal in every process
+        self.rng.shuffle(all_cards)
+        self.deck_cards = CardPile(all_cards)
+        self.deactivated_cards = CardPile()
 
-        self.user_cards = set(sample(self.deck_cards, 4))
-        self.deck_cards.difference_update(self.user_cards)
+        self.agent_cards = CardSet(self.deck_cards.pop() for _ in range(5))
+        self.user_cards = CardSet(self.deck_cards.pop() for _ in range(4))
 
         self.card_in_action = self.get_random_card_from_deck()
 
+    def copy(self):
+        """
+            Returns the deck, that can be played on without changing this one. The cards themselves are shared,
+            the copy of the rng draws the same cards after a reshuffle.
+        """
+
+        deck = Deck(Random())
+        deck.rng.setstate(self.rng.getstate())
+
+        deck.user_cards = CardSet(self.user_cards)
+        deck.agent_cards = CardSet(self.agent_cards)
+        deck.deck_cards = CardPile(self.deck_cards)
+        deck.deactivated_cards = CardPile(self.deactivated_cards)
+        deck.card_in_action = self.card_in_action
+
+        return deck
+
+    def has_cards_to_draw(self):
+        return len(self.deck_cards) != 0 or len(self.deactivated_cards) != 0
+
     def get_random_card_from_deck(self):
         if len(self.deck_cards) == 0:
             self._reshuffle_the_deck()
 
-        random_card = choice(list(self.deck_cards))
-        self.deck_cards.difference_update({random_card})
-
-        return random_card
-
-    def _create_all_possible_cards(self):
-        suits = [Suit.clubs, Suit.spades, Suit.diamonds, Suit.hearts]
-        ranks = [Rank.six, Rank.seven, Rank.eight, Rank.nine, Rank.ten, Rank.jack, Rank.queen, Rank.king, Rank.ace]
+        if len(self.deck_cards) == 0:  # nothing to reshuffle, all cards are in hands
+            return None
 
-        return {self.create_card(DECK_POSITION, suit, rank) for suit in suits for rank in ranks}
+        return self.deck_cards.pop()
 
-    @staticmethod
-    def create_card(position: Point, suit, rank):
-        return Card(suit=suit, rank=rank, pos_x=position.x, pos_y=position.y)
+    def get_cards(self, mask):
+        return [self.cards_by_bit[bit] for bit in iterate_bits(mask)]
 
     def _reshuffle_the_deck(self):
-        self.deck_cards = self.deactivated_cards
-        self.deactivated_cards = set()
+        cards = list(self.deactivated_cards)
+        self.rng.shuffle(cards)  # only the discard pile is shuffled, the cards in hands stay where they are
+        self.deactivated_cards[:] = cards  # one recount of the bits, not one for every swap of the shuffle
 
-        for card in self.deck_cards:
-            card.sprite.pos = DECK_POSITION
+        self.deck_cards = self.deactivated_cards
+        self.deactivated_cards = CardPile()
@@ -0,0 +1,232 @@
+import time
+from collections import OrderedDict
+from math import comb
+
+from src.const import DRAW, PASS, Rank, RANKS, RANK_MASKS, SUIT_MASKS, FULL_DECK_MASK, iterate_bits
+from src.search_state import ONLY_BY_RANK, SIX_IN_ACTION, CAN_GET_NEW_CARD, SHOW_SKIP_BUTTON, CARD_RANKS, CARD_SUITS, \
+    QUEEN_OF_SPADES, TAKEN_CARDS, SKIPPING_RANKS, get_turn_flags
+
+ENDGAME_MAX_HAND_SIZE = 6  # the solver is used only when the hand of the agent is that small
+ENDGAME_MAX_DEPTH = 3  # actions of the agent, after that the position is valued as if the agent finished the move (less than 8, see the keys)
+ENDGAME_TABLE_SIZE = 1 << 18  # positions in the transposition table
+ENDGAME_TIME_BUDGET_MS = 50
+ENDGAME_TOLERANCE = 0.02  # the heuristic move is kept, unless the search finds a move, that is that much safer
+TIME_CHECK_INTERVAL = 16  # new positions between the checks of the clock
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class EndgameSolver:
+    """
+        Expectiminimax for the end of the game, when the opponent has one card left.
+
+        The solver plays out the move of the agent: every card it can throw, DRAW (a chance node over the unseen
+        cards, every unseen card is equally likely to be drawn) and PASS. A finished move is valued with
+        the exact probability, that the opponent goes out on its next move, holding random unseen cards.
+        Emptying its own hand is worth 0.
+
+        Positions are kept in a transposition table with LRU eviction. The key packs into one int the hand
+        of the agent, the unseen cards, the card in action, the hand size of the opponent, the cards left to draw,
+        the turn flags (can_through_only_by_rank, six_in_action, ...) and the remaining depth.
+        If the search does not fit into the time budget, solve returns None and the caller falls back to its heuristic.
+    """
+
+    def __init__(self, table_size=ENDGAME_TABLE_SIZE, time_budget_ms=ENDGAME_TIME_BUDGET_MS, max_depth=ENDGAME_MAX_DEPTH, on_solve=None):
+        self.table_size = table_size
+        self.time_budget_ms = time_budget_ms
+        self.max_depth = max_depth
+        self.on_solve = on_solve  # called with the stats after every solved or timed out position
+
+        self.table = OrderedDict()
+        self.deadline = None
+        self.new_positions = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.solved = 0
+        self.timeouts = 0
+
+    def solve(self, rules, player):
+        """
+            Returns the chance of the opponent to go out after every legal action (a card of the hand, DRAW or PASS),
+            if the agent goes on playing the best way, or None, if the time budget is over.
+        """
+
+        state = rules.state
+        deck = rules.deck
+        card_in_action = deck.card_in_action.bit
+
+        hand = state.get_player_cards(player).bits
+        unseen = FULL_DECK_MASK & ~hand & ~deck.deactivated_cards.bits & ~card_in_action
+        opponent_cards = len(state.get_player_cards(state.get_opponent(player)))
+        cards_to_draw = len(deck.deck_cards) + len(deck.deactivated_cards)
+        flags = get_turn_flags(state)
+
+        self.deadline = time.perf_counter() + self.time_budget_ms / 1000
+
+        try:
+            values = {
+                action: self._get_action_value(hand, unseen, card_in_action, opponent_cards, cards_to_draw, flags,
+                                               action if action in (DRAW, PASS) else action.bit, self.max_depth)
+                for action in rules.get_legal_actions()
+            }
+        except SearchTimeout:
+            self.timeouts += 1
+            self._report()
+            return None
+
+        self.solved += 1
+        self._report()
+        return values
+
+    def _get_value(self, hand, unseen, card_in_action, opponent_cards, cards_to_draw, flags, depth):
+        """
+            The lowest chance of the opponent to go out, that the agent can reach from this position.
+        """
+
+        key = hand | unseen << 36 | card_in_action << 72 | opponent_cards << 108 | cards_to_draw << 114 | flags << 120 | depth << 124
+
+        value = self.table.get(key)
+        if value is not None:
+            self.table.move_to_end(key)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        self.new_positions += 1
+        if self.new_positions % TIME_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        value = min(
+            self._get_action_value(hand, unseen, card_in_action, opponent_cards, cards_to_draw, flags, action, depth)
+            for action in self._get_actions(hand, card_in_action, cards_to_draw, flags)
+        )
+
+        self._store(key, value)
+        return value
+
+    @staticmethod
+    def _get_actions(hand, card_in_action, cards_to_draw, flags):
+        allowed_cards = RANK_MASKS[CARD_RANKS[card_in_action]]
+        if not flags & ONLY_BY_RANK:
+            allowed_cards |= SUIT_MASKS[CARD_SUITS[card_in_action]] | RANK_MASKS[Rank.jack]
+
+        actions = list(iterate_bits(hand & allowed_cards))
+
+        if flags & CAN_GET_NEW_CARD and cards_to_draw:
+            actions.append(DRAW)
+        if flags & SHOW_SKIP_BUTTON or not actions:
+            actions.append(PASS)
+
+        return actions
+
+    def _get_action_value(self, hand, unseen, card_in_action, opponent_cards, cards_to_draw, flags, action, depth):
+        if action == PASS or depth == 0:
+            return self._get_chance_to_go_out(unseen, card_in_action, opponent_cards, cards_to_draw)
+
+        if action == DRAW:
+            if not flags & SIX_IN_ACTION:
+                flags = flags & ~CAN_GET_NEW_CARD | SHOW_SKIP_BUTTON
+
+            drawn_cards = unseen.bit_count()
+            if not drawn_cards:
+                return self._get_chance_to_go_out(unseen, card_in_action, opponent_cards, cards_to_draw)
+
+            return sum(
+                self._get_value(hand | card, unseen & ~card, card_in_action, opponent_cards, cards_to_draw - 1, flags, depth - 1)
+                for card in iterate_bits(unseen)
+            ) / drawn_cards
+
+        hand &= ~action
+        if not hand:
+            return 0.0  # the agent goes out itself
+
+        rank = CARD_RANKS[action]
+        flags = ONLY_BY_RANK | SHOW_SKIP_BUTTON
+
+        cards_to_draw += 1  # the card in action goes to the deactivated cards, so it can be drawn after a reshuffle
+        taken_cards = 5 if action == QUEEN_OF_SPADES else TAKEN_CARDS.get(rank, 0)
+        taken_cards = min(taken_cards, cards_to_draw)
+
+        if action == QUEEN_OF_SPADES or rank in SKIPPING_RANKS:
+            flags = CAN_GET_NEW_CARD  # the opponent skips the move, so the agent goes on
+        elif rank == Rank.six:
+            flags = SIX_IN_ACTION | CAN_GET_NEW_CARD
+
+        return self._get_value(hand, unseen, action, opponent_cards + taken_cards, cards_to_draw - taken_cards, flags, depth - 1)
+
+    def _get_chance_to_go_out(self, unseen, card_in_action, opponent_cards, cards_to_draw):
+        """
+            Chance, that the opponent with opponent_cards random unseen cards throws all of them in its next move.
+            It can do it only with the cards of one rank, the first of them has to fit the card in action.
+        """
+
+        key = unseen | card_in_action << 36 | opponent_cards << 72 | (cards_to_draw != 0) << 78 | 1 << 127  # no position key has the bit 127
+
+        chance = self.table.get(key)
+        if chance is not None:
+            self.table.move_to_end(key)
+            self.hits += 1
+            return chance
+
+        self.misses += 1
+
+        fitting_cards = unseen & (RANK_MASKS[CARD_RANKS[card_in_action]] | SUIT_MASKS[CARD_SUITS[card_in_action]] | RANK_MASKS[Rank.jack])
+        unseen_number = unseen.bit_count()
+
+        if opponent_cards > unseen_number:
+            chance = 0.0
+        elif opponent_cards == 1:
+            chance = fitting_cards.bit_count() / unseen_number
+
+            if cards_to_draw and unseen_number > 1:  # with a card, that does not fit, the opponent draws one, throws it, and throws its card after it, if the rank is the same
+                for card in iterate_bits(unseen & ~fitting_cards):
+                    same_rank_fitting_cards = fitting_cards & RANK_MASKS[CARD_RANKS[card]]
+                    chance += same_rank_fitting_cards.bit_count() / (unseen_number * (unseen_number - 1))
+        else:
+            hands_to_go_out = sum(
+                comb((unseen & RANK_MASKS[rank]).bit_count(), opponent_cards)
+                - comb((unseen & RANK_MASKS[rank] & ~fitting_cards).bit_count(), opponent_cards)
+                for rank in RANKS
+            )
+            chance = hands_to_go_out / comb(unseen_number, opponent_cards)
+
+        self._store(key, chance)
+        return chance
+
+    def _store(self, key, value):
+        self.table[key] = value
+
+        if len(self.table) > self.table_size:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def _report(self):
+        if self.on_solve is not None:
+            self.on_solve(self.stats())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return {
+            'solved': self.solved,
+            'timeouts': self.timeouts,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'table_size': len(self.table),
+            'evictions': self.evictions,
+        }
+
+    def format_report(self):
+        return format_endgame_stats(self.stats())
+
+
+def format_endgame_stats(stats):
+    return [
+        f"endgame solved {stats['solved']}, timeouts {stats['timeouts']}",
+        f"endgame table hit rate {stats['hit_rate']:.1%}, hits {stats['hits']}, misses {stats['misses']}, evictions {stats['evictions']}",
+    ]
@@ -0,0 +1,165 @@
+"""
+    Cache of the ranked moves of HeuristicAgent, shared by all the agents with the same weights.
+
+    The ranking depends only on the hand, the card in action, can_through_only_by_rank and whether the opponent
+    has one card left, and it does not change, if the suits are renamed. So the key is the canonical form of
+    the position: the suits are reordered by their cards in the hand (and by being the suit of the card in action),
+    and the same hands with other suits share one entry.
+
+    The queen of spades is the only card with its own points, so while it is in the hand the spades keep their place,
+    and only the other three suits are reordered. Without it, the spades get the suit without a queen,
+    so the canonical hand never has a queen of spades, that the real one has not.
+"""
+
+import sys
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+
+from src.const import Rank, Suit, SUITS, RANKS, CARD_BITS
+
+EVALUATION_CACHE_SIZE = 1 << 16  # entries, the least recently used ones are evicted
+
+SUIT_ROW_MASK = (1 << len(RANKS)) - 1  # the cards of one suit in the hand, moved down to the lowest bits
+QUEEN_ROW_BIT = 1 << RANKS.index(Rank.queen)
+QUEEN_OF_SPADES = CARD_BITS[Rank.queen, Suit.spades]
+SPADES_INDEX = SUITS.index(Suit.spades)
+
+# the suits are sorted by their keys: (1 + row with the queen moved to the top) << 3 | is the suit of the card in action << 2 | suit index,
+# so the suits without a queen go first, and the spades kept in place (key = suit index) go before all of them
+ROW_SORT_KEYS = [(1 + (row | (row & QUEEN_ROW_BIT) << len(RANKS))) << 3 for row in range(1 << len(RANKS))]
+CARD_IN_ACTION_SORT_BIT = 4
+SUIT_INDEX_MASK = 3
+CARD_POSITIONS = [divmod(card_id, len(RANKS)) for card_id in range(len(SUITS) * len(RANKS))]  # card id -> (suit index, rank index)
+
+# the sorted suits go to the canonical positions in the order spades, hearts, diamonds, clubs
+assert SPADES_INDEX == 3 and len(SUITS) == 4, 'canonicalize is unrolled for this order of the suits'
+
+
+def _get_move_order(move):
+    points, bit = move
+    return -points, bit
+
+
+def canonicalize(hand_bits, card_in_action_id):
+    """
+        Returns the canonical hand, the canonical id of the card in action, and the suits of the canonical
+        positions (canonical suit index -> real suit index).
+    """
+
+    card_in_action_suit, card_in_action_rank = CARD_POSITIONS[card_in_action_id]
+    rows = (hand_bits & SUIT_ROW_MASK, hand_bits >> 9 & SUIT_ROW_MASK, hand_bits >> 18 & SUIT_ROW_MASK, hand_bits >> 27)
+
+    keys = [ROW_SORT_KEYS[rows[0]], ROW_SORT_KEYS[rows[1]] | 1, ROW_SORT_KEYS[rows[2]] | 2, ROW_SORT_KEYS[rows[3]] | 3]
+    keys[card_in_action_suit] |= CARD_IN_ACTION_SORT_BIT
+    if hand_bits & QUEEN_OF_SPADES:
+        keys[SPADES_INDEX] = SPADES_INDEX
+
+    keys.sort()
+    suits_by_position = (keys[1] & SUIT_INDEX_MASK, keys[2] & SUIT_INDEX_MASK, keys[3] & SUIT_INDEX_MASK, keys[0] & SUIT_INDEX_MASK)
+
+    canonical_hand = rows[suits_by_position[0]] | rows[suits_by_position[1]] << 9 | rows[suits_by_position[2]] << 18 | rows[suits_by_position[3]] << 27
+    canonical_card_in_action_id = suits_by_position.index(card_in_action_suit) * len(RANKS) + card_in_action_rank
+
+    return canonical_hand, canonical_card_in_action_id, suits_by_position
+
+
+class EvaluationCache:
+    """
+        LRU cache of the ranked moves, see the module docstring. An entry is the tuple of (points, canonical suit index,
+        rank index) of the moves and whether some of them have equal points, get_ranked_moves turns them back
+        into the real cards of the position.
+    """
+
+    def __init__(self, max_entries=EVALUATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries_bytes = 0  # approximate size of the keys and values, see memory_bytes
+
+    def get_ranked_moves(self, hand_bits, card_in_action_id, only_by_rank, in_danger, rank_moves):
+        """
+            Ranked moves (points, bit) of the position, the best one first, the lowest bit first of the equal ones.
+            On a miss they are computed with rank_moves(canonical hand bits, canonical card in action id,
+            only_by_rank, in_danger), which returns them in the same form.
+        """
+
+        canonical_hand, canonical_card_in_action_id, suits_by_position = canonicalize(hand_bits, card_in_action_id)
+        key = canonical_hand | canonical_card_in_action_id << 36 | only_by_rank << 42 | in_danger << 43
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+
+            ranked_moves = rank_moves(canonical_hand, canonical_card_in_action_id, only_by_rank, in_danger)
+            canonical_moves = tuple((points,) + CARD_POSITIONS[bit.bit_length() - 1] for points, bit in ranked_moves)
+            has_equal_moves = len({points for points, bit in ranked_moves}) < len(ranked_moves)
+
+            entry = canonical_moves, has_equal_moves
+            self._put(key, entry)
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        canonical_moves, has_equal_moves = entry
+        moves = [(points, 1 << suits_by_position[position] * 9 + rank_index) for points, position, rank_index in canonical_moves]
+
+        if has_equal_moves:
+            moves.sort(key=_get_move_order)  # the suits are renamed, so the equal moves may change their order
+
+        return moves
+
+    def _put(self, key, entry):
+        if len(self.entries) >= self.max_entries:
+            evicted_key, evicted_entry = self.entries.popitem(last=False)
+            self.entries_bytes -= self._get_entry_size(evicted_key, evicted_entry)
+            self.evictions += 1
+
+        self.entries[key] = entry
+        self.entries_bytes += self._get_entry_size(key, entry)
+
+    @staticmethod
+    def _get_entry_size(key, entry):
+        canonical_moves = entry[0]
+        return sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(canonical_moves) + sum(sys.getsizeof(move) for move in canonical_moves)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def memory_bytes(self):
+        """
+            Approximate memory of the cache: the dict and the keys and tuples of the entries (small ints are shared, so they are not counted).
+        """
+
+        return sys.getsizeof(self.entries) + self.entries_bytes
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.memory_bytes(),
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.entries_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+
+_shared_caches = WeakKeyDictionary()  # weights -> their cache, the weights are not changed after they are made
+
+
+def get_shared_cache(weights):
+    cache = _shared_caches.get(weights)
+
+    if cache is None:
+        cache = _shared_caches[weights] = EvaluationCache()
+
+    return cache
@@ -0,0 +1,275 @@
+"""
+    Binary log of games.
+
+    The file starts with FILE_HEADER, then goes the flat sequence of fixed-width 8 bytes records (RECORD):
+    kind, player, card, effect and a 32-bit value. Every game starts with a GAME_START record, that keeps the seed
+    of the deck (so the deal and every draw can be repeated, the seed has to be from 0 to MAX_SEED to fit the value), followed by one record per action, per drawn card and
+    per fired effect, and ends with a GAME_END record with the winner.
+
+    Only the seed and the actions are needed to replay the game, the rest of the records are kept to examine
+    the games without replaying them and to check, that the replay goes exactly as the original game.
+"""
+
+import mmap
+import struct
+from random import Random
+
+from src.card import get_card_by_id
+from src.const import USER, AGENT, DRAW, PASS, Effect
+from src.deck import Deck
+from src.rules import GameState, RulesEngine, RulesListener, ListenerGroup
+
+MAGIC = b'101R'
+VERSION = 1
+
+FILE_HEADER = struct.Struct('<4sHH')  # magic, version, record size
+RECORD = struct.Struct('<BBBBI')  # kind, player, card, effect, value
+
+GAME_START, PLAY, DRAW_ACTION, PASS_ACTION, CARD_DRAWN, EFFECT, GAME_END = range(1, 8)
+
+PLAYER_CODES = {USER: 0, AGENT: 1, None: 255}
+PLAYERS_BY_CODE = {code: player for player, code in PLAYER_CODES.items()}
+
+EFFECT_CODES = {
+    Effect.opponent_skips_move: 1,
+    Effect.opponent_takes_one: 2,
+    Effect.opponent_takes_two_and_skips: 3,
+    Effect.opponent_takes_five_and_skips: 4,
+    Effect.six_must_be_covered: 5,
+}
+EFFECTS_BY_CODE = {code: effect for effect, code in EFFECT_CODES.items()}
+
+NO_CARD = 255
+MAX_SEED = 2 ** 32 - 1  # the largest seed, that fits the value of a record
+WRITE_BUFFER_SIZE = 1 << 16  # records
+
+
+class GameRecordWriter(RulesListener):
+    """
+        Streams the records of the games to a binary file object.
+
+        It is a RulesListener, so it just has to be added to the listeners of the RulesEngine. Records are packed into
+        a preallocated buffer and written to the file only when the buffer is full, or on flush/close.
+    """
+
+    def __init__(self, file, buffer_records=WRITE_BUFFER_SIZE, write_header=True):
+        self.file = file
+        self.buffer = bytearray(buffer_records * RECORD.size)
+        self.offset = 0
+
+        if write_header and file.tell() == 0:
+            file.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD.size))
+
+    @classmethod
+    def open(cls, path):
+        return cls(open(path, 'ab'))
+
+    def start_game(self, seed):
+        if not 0 <= seed <= MAX_SEED:
+            raise ValueError(f'a logged game needs a seed from 0 to {MAX_SEED}, not {seed}')
+
+        self._write(GAME_START, None, NO_CARD, 0, seed)
+
+    def on_action(self, player, action):
+        if action == DRAW:
+            self._write(DRAW_ACTION, player, NO_CARD, 0, 0)
+        elif action == PASS:
+            self._write(PASS_ACTION, player, NO_CARD, 0, 0)
+        else:
+            self._write(PLAY, player, action.id, 0, 0)
+
+    def on_card_drawn(self, player, card):
+        self._write(CARD_DRAWN, player, card.id, 0, 0)
+
+    def on_effect(self, effect, target_player):
+        self._write(EFFECT, target_player, NO_CARD, EFFECT_CODES[effect], 0)
+
+    def on_game_over(self, winner):
+        self._write(GAME_END, winner, NO_CARD, 0, 0)
+
+    def _write(self, kind, player, card, effect, value):
+        if self.offset == len(self.buffer):
+            self.flush()
+
+        RECORD.pack_into(self.buffer, self.offset, kind, PLAYER_CODES[player], card, effect, value)
+        self.offset += RECORD.size
+
+    def write_records(self, records: bytes):
+        """
+            Appends records, that were already packed somewhere else (for example by the arena workers).
+        """
+
+        self.flush()
+        self.file.write(records)
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.offset])
+        self.file.flush()
+        self.offset = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class GameRecord:
+    def __init__(self, seed, records):
+        self.seed = seed
+        self.records = records  # list of (kind, player code, card id, effect code, value)
+
+    def get_actions(self):
+        """
+            Returns (player, action) of the game, action is a card id, DRAW or PASS.
+        """
+
+        actions = []
+
+        for kind, player, card, _, _ in self.records:
+            if kind == PLAY:
+                actions.append((PLAYERS_BY_CODE[player], card))
+            elif kind == DRAW_ACTION:
+                actions.append((PLAYERS_BY_CODE[player], DRAW))
+            elif kind == PASS_ACTION:
+                actions.append((PLAYERS_BY_CODE[player], PASS))
+
+        return actions
+
+    def get_winner(self):
+        for kind, player, _, _, _ in reversed(self.records):
+            if kind == GAME_END:
+                return PLAYERS_BY_CODE[player]
+
+        return None
+
+    def get_drawn_cards(self):
+        return [(PLAYERS_BY_CODE[player], card) for kind, player, card, _, _ in self.records if kind == CARD_DRAWN]
+
+    def get_effects(self):
+        return [(EFFECTS_BY_CODE[effect], PLAYERS_BY_CODE[player]) for kind, player, _, effect, _ in self.records if kind == EFFECT]
+
+
+class GameLog:
+    """
+        Reads a game log through mmap, so even a multi-gigabyte file is not loaded into memory.
+
+        The index of the games (offsets of their GAME_START records) is built on the first access,
+        by scanning only the kind bytes of the records.
+    """
+
+    INDEX_CHUNK_RECORDS = 1 << 22
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f'{path} is not a game log of version {VERSION}')
+
+        self._game_offsets = None
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def game_offsets(self):
+        if self._game_offsets is None:
+            self._game_offsets = self._build_index()
+
+        return self._game_offsets
+
+    def __len__(self):
+        return len(self.game_offsets)
+
+    def __getitem__(self, game_index) -> GameRecord:
+        offsets = self.game_offsets
+        start = offsets[game_index]
+        end = offsets[game_index + 1] if game_index + 1 < len(offsets) else self._get_records_end()
+
+        records = list(RECORD.iter_unpack(memoryview(self.mm)[start:end]))
+        return GameRecord(seed=records[0][4], records=records[1:])
+
+    def __iter__(self):
+        for game_index in range(len(self)):
+            yield self[game_index]
+
+    def _get_records_end(self):
+        return FILE_HEADER.size + (len(self.mm) - FILE_HEADER.size) // RECORD.size * RECORD.size  # the last record can be cut, if the writer was killed
+
+    def _build_index(self):
+        offsets = []
+        game_start = bytes([GAME_START])
+        end = self._get_records_end()
+        chunk_size = self.INDEX_CHUNK_RECORDS * RECORD.size
+
+        for chunk_start in range(FILE_HEADER.size, end, chunk_size):
+            kinds = self.mm[chunk_start:min(chunk_start + chunk_size, end):RECORD.size]  # the first byte of every record
+
+            position = kinds.find(game_start)
+            while position != -1:
+                offsets.append(chunk_start + position * RECORD.size)
+                position = kinds.find(game_start, position + 1)
+
+        return offsets
+
+
+def create_recorded_game(seed, listener=None):
+    """
+        Returns the RulesEngine of a new game, that can be recorded or replayed: the deck is shuffled by Random(seed).
+    """
+
+    return RulesEngine(GameState(Deck(Random(seed))), listener=listener)
+
+
+def get_action_from_record(rules, action):
+    if action in (DRAW, PASS):
+        return action
+
+    return get_card_by_id(action)
+
+
+def replay_game(game: GameRecord, until_action=None, listener=None, verify=True):
+    """
+        Replays the game headlessly and returns its RulesEngine, stopped after until_action actions (or at the end).
+
+        With verify, it checks, that every action is made by the same player as in the record,
+        and that the replayed game has drawn the same cards.
+    """
+
+    drawn_cards = []
+    recorder = _DrawnCardsRecorder(drawn_cards)
+
+    rules = create_recorded_game(game.seed, listener=recorder if listener is None else ListenerGroup(recorder, listener))
+    rules.start_game()
+
+    actions = game.get_actions()
+    if until_action is not None:
+        actions = actions[:until_action]
+
+    for player, action in actions:
+        if verify and player != rules.state.current_player_move:
+            raise ValueError(f'the record is broken: {player} makes a move instead of {rules.state.current_player_move}')
+
+        rules.apply(get_action_from_record(rules, action))
+
+    if verify and until_action is None:
+        if drawn_cards != game.get_drawn_cards():
+            raise ValueError('the replay has drawn other cards, than the recorded game')
+
+    return rules
+
+
+class _DrawnCardsRecorder(RulesListener):
+    def __init__(self, drawn_cards):
+        self.drawn_cards = drawn_cards
+
+    def on_card_drawn(self, player, card):
+        self.drawn_cards.append((player, card.id))
+
@@ -0,0 +1,141 @@
+import asyncio
+import itertools
+import json
+import time
+from random import Random
+
+from src.const import DRAW
+
+
+class Connection:
+    """
+        Client side of one connection to the game server, many requests can wait for their responses at once.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+        self.request_ids = itertools.count(1)
+        self.waiting = {}  # request id -> future of the response
+        self.reading = asyncio.create_task(self._read_responses())
+
+    @classmethod
+    async def open(cls, host, port, unix_path=None):
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+
+        return cls(reader, writer)
+
+    async def request(self, **request):
+        request_id = request['id'] = next(self.request_ids)
+
+        response = self.waiting[request_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(json.dumps(request, separators=(',', ':')).encode() + b'\n')
+
+        return await response
+
+    async def _read_responses(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            self.waiting.pop(response['id']).set_result(response)
+
+    async def close(self):
+        self.reading.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class LoadTestResults:
+    def __init__(self):
+        self.latencies_ms = []
+        self.games = 0
+        self.errors = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def get_percentile(self, percentile):
+        latencies = sorted(self.latencies_ms)
+        if not latencies:
+            return 0.0
+
+        return latencies[round((len(latencies) - 1) * percentile / 100)]
+
+    def format_report(self):
+        seconds = self.finished_at - self.started_at
+
+        return '\n'.join([
+            f'moves: {len(self.latencies_ms)}, {len(self.latencies_ms) / seconds:.0f} moves/s, finished games: {self.games}, errors: {self.errors}',
+            f'move latency p50 {self.get_percentile(50):.2f} ms, p95 {self.get_percentile(95):.2f} ms, '
+            f'p99 {self.get_percentile(99):.2f} ms, max {max(self.latencies_ms, default=0.0):.2f} ms',
+        ])
+
+
+async def play_session(connection, results, rng, think_time_s, deadline):
+    """
+        Plays games one after another like a (fast) human, until the deadline: waits think_time_s on average
+        before every move, and makes a random legal move, preferring cards to DRAW.
+    """
+
+    while time.perf_counter() < deadline:
+        state = await connection.request(op='new', seed=rng.getrandbits(32))
+        if not state['ok']:
+            results.errors += 1
+            return
+
+        while not state['over'] and time.perf_counter() < deadline:
+            await asyncio.sleep(think_time_s * 2 * rng.random())
+
+            cards = [action for action in state['legal'] if isinstance(action, int)]
+            action = rng.choice(cards) if cards else DRAW if DRAW in state['legal'] else rng.choice(state['legal'])
+
+            started_at = time.perf_counter()
+            response = await connection.request(op='move', session=state['session'], action=action)
+            results.latencies_ms.append((time.perf_counter() - started_at) * 1000)
+
+            if not response['ok']:
+                results.errors += 1
+                break
+
+            state = response
+
+        if state['over']:
+            results.games += 1
+
+        await connection.request(op='close', session=state['session'])
+
+
+async def sample_server_stats(connection, samples, interval_s=2.0):
+    while True:
+        await asyncio.sleep(interval_s)
+        samples.append(await connection.request(op='stats'))
+
+
+async def run_load_test(sessions=1000, connections=50, duration_s=30.0, think_time_s=0.5, host='127.0.0.1', port=8101, unix_path=None, seed=0):
+    """
+        Keeps sessions games going at once over connections connections for duration_s seconds,
+        returns the results and the stats of the server, taken when it had the most sessions.
+    """
+
+    opened = [await Connection.open(host, port, unix_path) for _ in range(connections)]
+    results = LoadTestResults()
+    deadline = results.started_at + duration_s
+
+    stats_samples = []
+    sampling = asyncio.create_task(sample_server_stats(opened[0], stats_samples))
+
+    await asyncio.gather(*(
+        play_session(opened[i % connections], results, Random(seed * 1_000_003 + i), think_time_s, deadline)
+        for i in range(sessions)
+    ))
+
+    results.finished_at = time.perf_counter()
+    sampling.cancel()
+    server_stats = max(stats_samples, key=lambda stats: stats['sessions'], default=await opened[0].request(op='stats'))
+
+    for connection in opened:
+        await connection.close()
+
+    return results, server_stats
@@ -0,0 +1,183 @@
+import math
+import threading
+import time
+from random import Random
+
+from src.agent import HeuristicAgent, RandomAgent
+from src.const import USER, AGENT, DRAW, PASS
+from src.deck import Deck, CardSet, CardPile
+from src.rules import RulesEngine
+from src.simulation import play_until_game_is_over
+
+MAX_ROLLOUT_ACTIONS = 400
+EXPLORATION = 0.7
+
+
+class Node:
+    def __init__(self, action=None, player=None, parent=None):
+        self.action = action  # the action, that leads to this node (card bit, DRAW or PASS)
+        self.player = player  # the player, who made this action
+        self.parent = parent
+        self.children = {}
+
+        self.visits = 0
+        self.availability = 0  # how many times this action was legal, when its parent was visited
+        self.wins = 0.0
+
+    def ucb_score(self):
+        return self.wins / self.visits + EXPLORATION * math.sqrt(math.log(self.availability) / self.visits)
+
+
+class MCTSAgent:
+    """
+        Information set Monte Carlo tree search agent.
+
+        The agent does not know the hand of its opponent and the order of the deck, so on every iteration it
+        guesses them (determinization) from the unseen cards: everything that is not in its hand, not deactivated
+        and not in action. Then it goes down the one tree, shared by all the guesses, using only the actions that are
+        legal in the current guess, and finishes the game with fast rollouts.
+
+        The search stops when time_budget_ms is over or max_rollouts are done, whatever happens first,
+        or earlier, if stop() is called from another thread.
+    """
+
+    def __init__(self, player, time_budget_ms=1000, max_rollouts=None, rollout_policy='heuristic', rng: Random = None, on_decision=None):
+        self.player = player
+        self.time_budget_ms = time_budget_ms
+        self.max_rollouts = max_rollouts
+        self.rollout_policy = rollout_policy
+        self.rng = rng if rng is not None else Random()
+        self.on_decision = on_decision  # called with the stats of every decision
+
+        self.last_decision_stats = None
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        """
+            Makes the running search return its best action so far.
+        """
+
+        self.stop_event.set()
+
+    def choose_action(self, rules):
+        self.stop_event.clear()
+
+        legal_actions = rules.get_legal_actions()
+        if len(legal_actions) == 1:  # nothing to think about
+            self._report(rollouts=0, tree_size=1, spent_seconds=0.0)
+            return legal_actions[0]
+
+        root = Node()
+        rollouts = 0
+        tree_size = 1
+
+        started_at = time.perf_counter()
+        deadline = started_at + self.time_budget_ms / 1000 if self.time_budget_ms is not None else None
+
+        while rollouts == 0 or (self.max_rollouts is None or rollouts < self.max_rollouts) \
+                and (deadline is None or time.perf_counter() < deadline) and not self.stop_event.is_set():  # at least one rollout, so there is a child to choose
+            tree_size += self._run_iteration(root, self._determinize(rules))
+            rollouts += 1
+
+        self._report(rollouts=rollouts, tree_size=tree_size, spent_seconds=time.perf_counter() - started_at)
+
+        best_child = max(root.children.values(), key=lambda node: node.visits)
+        return self._action_from_key(rules, best_child.action)
+
+    def _run_iteration(self, root, rules):
+        """
+            Makes one selection - expansion - rollout - backpropagation pass, returns the number of the new nodes.
+        """
+
+        node = root
+        new_nodes = 0
+
+        while not rules.state.game_is_over:  # selection
+            player = rules.state.current_player_move
+            legal_keys = [self._action_to_key(action) for action in rules.get_legal_actions()]
+
+            for key in legal_keys:
+                child = node.children.get(key)
+                if child is not None:
+                    child.availability += 1
+
+            untried_keys = [key for key in legal_keys if key not in node.children]
+            if untried_keys:  # expansion
+                key = self.rng.choice(untried_keys)
+
+                child = node.children[key] = Node(key, player, node)
+                child.availability = 1
+                new_nodes += 1
+
+                rules.apply(self._action_from_key(rules, key))
+                node = child
+                break
+
+            node = max((node.children[key] for key in legal_keys), key=Node.ucb_score)
+            rules.apply(self._action_from_key(rules, node.action))
+
+        winner = play_until_game_is_over(rules, self._get_rollout_agents(), MAX_ROLLOUT_ACTIONS)
+
+        while node is not None:  # backpropagation
+            node.visits += 1
+
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.player:
+                node.wins += 1
+
+            node = node.parent
+
+        return new_nodes
+
+    def _determinize(self, rules):
+        """
+            Returns the copy of the game, where the hidden cards are dealt randomly.
+        """
+
+        state = rules.state
+        deck = rules.deck
+        my_cards = state.get_player_cards(self.player)
+        opponent = state.get_opponent(self.player)
+
+        known_bits = my_cards.bits | deck.deactivated_cards.bits | (deck.card_in_action.bit if deck.card_in_action else 0)
+        unseen_cards = [card for bit, card in deck.cards_by_bit.items() if not bit & known_bits]
+        self.rng.shuffle(unseen_cards)
+
+        opponent_cards_number = len(state.get_player_cards(opponent))
+
+        guessed_deck = Deck(self.rng)
+        guessed_deck.card_in_action = deck.card_in_action
+        guessed_deck.deactivated_cards = CardPile(deck.deactivated_cards)
+        guessed_deck.deck_cards = CardPile(unseen_cards[opponent_cards_number:])
+
+        hands = {self.player: CardSet(my_cards), opponent: CardSet(unseen_cards[:opponent_cards_number])}
+        guessed_deck.user_cards = hands[USER]
+        guessed_deck.agent_cards = hands[AGENT]
+
+        return RulesEngine(state.copy_with_deck(guessed_deck))
+
+    def _get_rollout_agents(self):
+        if self.rollout_policy == 'random':
+            return {USER: RandomAgent(USER, self.rng), AGENT: RandomAgent(AGENT, self.rng)}
+
+        return {USER: HeuristicAgent(USER), AGENT: HeuristicAgent(AGENT)}
+
+    @staticmethod
+    def _action_to_key(action):
+        return action if action in (DRAW, PASS) else action.bit
+
+    @staticmethod
+    def _action_from_key(rules, key):
+        return key if key in (DRAW, PASS) else rules.deck.cards_by_bit[key]
+
+    def _report(self, rollouts, tree_size, spent_seconds):
+        self.last_decision_stats = {
+            'rollouts': rollouts,
+            'rollouts_per_second': rollouts / spent_seconds if spent_seconds else 0.0,
+            'tree_size': tree_size,
+            'time_ms': spent_seconds * 1000,
+        }
+
+        if self.on_decision is not None:
+            self.on_decision(self.last_decision_stats)
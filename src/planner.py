@@ -0,0 +1,227 @@
+import time
+
+from src.agent import HeuristicAgent
+from src.card import CARDS_BY_BIT
+from src.const import DRAW, PASS, Rank, RANK_MASKS, iterate_bits
+from src.search_state import ONLY_BY_RANK, CAN_GET_NEW_CARD, SHOW_SKIP_BUTTON, CARD_EFFECTS, ALLOWED_CARDS, QUEEN_OF_SPADES, get_turn_flags
+from src.weights import DEFAULT_WEIGHTS
+
+PLAN_WIN_POINTS = 1000  # emptying the hand is worth more than any turn, that does not
+PLAN_CARD_POINTS = 100  # every thrown card is worth that, besides its own points
+PLANNER_MAX_NODES = 2000  # positions searched exactly, after that every position follows only its best valued move
+
+OPENING_CARDS = sum(bit for bit, (taken_cards, flags) in CARD_EFFECTS.items() if not flags & ONLY_BY_RANK)  # after them any matching card can be thrown
+
+
+class PlanningAgent(HeuristicAgent):
+    """
+        Plans the whole turn of the agent at once: the opening card, the cards thrown up after it, the cards
+        covering a Six, the cards after the opponent skips its move, and where the turn ends with PASS or DRAW.
+
+        A plan is valued as the sum of the points (_value_the_move) of its cards, every card valued in the hand
+        it is thrown from, plus card_points for every card (so getting rid of the cards goes first, and the points
+        choose between the ways to do it), plus PLAN_WIN_POINTS if it empties the hand. The greedy HeuristicAgent takes the best
+        card every time, the planner takes the best sequence. Like the greedy agent, it draws a card only
+        when it can not throw any, and does not throw a Six, that it can not cover. What comes after
+        a drawn card is unknown, so DRAW ends the plan, and the next turn of the agent begins with it.
+
+        The search is a depth-first search over the positions of the turn: the hand (a subset of the hand
+        the turn started with), the card in action, the turn flags and whether the opponent has one card left.
+        Every position is searched once (memoized), and a card is not searched, if its points plus the most
+        the rest of the hand can give (_get_upper_bound) do not beat the best card of the position found so far.
+        After max_nodes positions, the rest of the positions follow only their best valued card, as the greedy agent.
+
+        choose_action makes the first action of the plan, so the agent can play anywhere a HeuristicAgent does.
+        plan_turn returns the whole plan, that is how GameController plays it.
+    """
+
+    def __init__(self, player, weights=DEFAULT_WEIGHTS, card_points=PLAN_CARD_POINTS, max_nodes=PLANNER_MAX_NODES, on_plan=None):
+        super().__init__(player, weights=weights)
+        self.card_points = card_points
+        self.max_nodes = max_nodes
+        self.on_plan = on_plan  # called with the stats of every plan
+
+        self.last_plan_stats = None
+
+        self.memo = {}
+        self.card_bounds = {}
+        self.can_draw_at_start = False
+        self.start_hand_bits = 0
+        self.nodes = 0
+        self.sequences = 0
+        self.memo_hits = 0
+        self.pruned = 0
+
+    def choose_action(self, rules):
+        return self.plan_turn(rules)[0]
+
+    def plan_turn(self, rules):
+        """
+            Returns the list of the actions of the rest of the turn, the last one is PASS, DRAW or the card, that empties the hand.
+        """
+
+        started_at = time.perf_counter()
+
+        state = rules.state
+        hand_bits = state.get_player_cards(self.player).bits
+        opponent_cards_number = len(state.get_player_cards(state.get_opponent(self.player)))
+        flags = get_turn_flags(state)
+
+        self.memo = {}
+        self.card_bounds = {bit: self._get_card_upper_bound(hand_bits, bit) for bit in iterate_bits(hand_bits)}
+        self.can_draw_at_start = rules.deck.has_cards_to_draw()
+        self.start_hand_bits = hand_bits
+        self.nodes = self.sequences = self.memo_hits = self.pruned = 0
+
+        if rules.deck.card_in_action is None:  # before the first card is on the table, any card can be thrown: the greedy one
+            actions = [self._choose_heuristic_action(rules)]
+            self._report(actions, None, time.perf_counter() - started_at)
+            return actions
+
+        value, plan = self._search(hand_bits, rules.deck.card_in_action.bit, flags, opponent_cards_number)
+
+        actions = [CARDS_BY_BIT[action] if action not in (DRAW, PASS) else action for action in plan]
+        self._report(actions, value, time.perf_counter() - started_at)
+
+        return actions
+
+    def _search(self, hand_bits, card_in_action_bit, flags, opponent_cards_number):
+        """
+            Returns (value, plan) of the best rest of the turn from the position, the plan is a tuple of card bits, DRAW and PASS.
+        """
+
+        in_danger = opponent_cards_number == 1
+        key = (hand_bits, card_in_action_bit, flags, in_danger)
+
+        result = self.memo.get(key)
+        if result is not None:
+            self.memo_hits += 1
+            return result
+
+        self.nodes += 1
+
+        moves = self._get_moves(hand_bits, card_in_action_bit, flags)
+        if not moves:
+            self.sequences += 1
+            can_draw = flags & CAN_GET_NEW_CARD and (self.can_draw_at_start or hand_bits != self.start_hand_bits)
+            result = self.memo[key] = (0, (DRAW if can_draw else PASS,))
+            return result
+
+        valued_moves = sorted(((self._value_the_move(hand_bits, CARDS_BY_BIT[bit], in_danger) + self.card_points, bit) for bit in iterate_bits(moves)),
+                              key=lambda move: -move[0])  # the best valued moves first, so the bound cuts more
+
+        if self.nodes > self.max_nodes:
+            valued_moves = valued_moves[:1]  # out of the budget: the greedy move
+
+        best_value, best_plan = None, None
+        if flags & SHOW_SKIP_BUTTON:
+            self.sequences += 1
+            best_value, best_plan = 0, (PASS,)
+
+        for points, bit in valued_moves:
+            if best_value is not None and points + self._get_upper_bound(hand_bits & ~bit, bit) <= best_value:
+                self.pruned += 1
+                continue
+
+            value, plan = self._play(hand_bits, bit, opponent_cards_number)
+            value += points
+
+            if best_value is None or value > best_value:
+                best_value, best_plan = value, (bit,) + plan
+
+        result = self.memo[key] = (best_value, best_plan)
+        return result
+
+    def _play(self, hand_bits, bit, opponent_cards_number):
+        hand_bits &= ~bit
+
+        if not hand_bits:
+            self.sequences += 1
+            return PLAN_WIN_POINTS, ()
+
+        taken_cards, flags = CARD_EFFECTS[bit]
+
+        return self._search(hand_bits, bit, flags, opponent_cards_number + taken_cards)
+
+    def _get_moves(self, hand_bits, card_in_action_bit, flags):
+        """
+            The cards the planner may throw: RulesEngine.get_possible_moves_mask, without the Sixes, that can not be covered.
+        """
+
+        allowed_cards, same_rank_cards = ALLOWED_CARDS[card_in_action_bit]
+        if flags & ONLY_BY_RANK:
+            return hand_bits & same_rank_cards
+
+        moves = hand_bits & allowed_cards
+
+        for six_bit in iterate_bits(moves & RANK_MASKS[Rank.six]):
+            if not self._can_cover_six(hand_bits, CARDS_BY_BIT[six_bit].suit):
+                moves &= ~six_bit
+
+        return moves
+
+    def _get_upper_bound(self, hand_bits, played_bit):
+        """
+            The most the rest of the turn can give with hand_bits after played_bit. After a card, that lets only its rank
+            be thrown up, only the cards of the rank can be thrown, unless one of them opens the turn again (OPENING_CARDS).
+            The hand is emptied only if every card of it is thrown, otherwise only the cards, that can give something, count.
+        """
+
+        if not hand_bits:
+            return PLAN_WIN_POINTS
+
+        reachable_cards = hand_bits
+        if CARD_EFFECTS[played_bit][1] & ONLY_BY_RANK:
+            same_rank_cards = hand_bits & ALLOWED_CARDS[played_bit][1]
+            if not same_rank_cards & OPENING_CARDS:
+                reachable_cards = same_rank_cards
+
+        card_bounds = self.card_bounds
+        useful_cards_bound = sum(max(card_bounds[bit], 0) for bit in iterate_bits(reachable_cards))
+
+        if reachable_cards != hand_bits:
+            return useful_cards_bound
+
+        return max(PLAN_WIN_POINTS + sum(card_bounds[bit] for bit in iterate_bits(hand_bits)), useful_cards_bound)
+
+    def _get_card_upper_bound(self, hand_bits, bit):
+        """
+            The most points the card can get in a hand, that is a part of hand_bits, in danger or not. The bounds are found
+            once for the hand the turn starts with: the hand only gets smaller, so the counts of ranks and suits in it only decrease.
+            Every term is linear in a count, that can be anything from 1 to its count in hand_bits, so its maximum is at one of the ends.
+        """
+
+        weights = self.weights
+        card = CARDS_BY_BIT[bit]
+        rank_points = weights.rank_points[card.rank]
+        same_rank_cards = self._count_cards_with_specific_rank(hand_bits, card.rank)
+
+        bound = rank_points + max(0, (same_rank_cards - 1) * (weights.same_rank + rank_points)) + max(0, -weights.lonely_suit)
+        if bit == QUEEN_OF_SPADES:
+            bound += weights.queen_of_spades
+        if card.rank == Rank.six:
+            bound += max(0, weights.six_sequence * (hand_bits & ~RANK_MASKS[Rank.six]).bit_count())
+
+        danger_bound = rank_points + max(0, -weights.danger_lonely_suit)
+        if card.rank == Rank.seven:
+            danger_bound += max(weights.danger_seven, weights.danger_seven * same_rank_cards)
+        if card.rank == Rank.eight:
+            danger_bound += max(weights.danger_eight, weights.danger_eight * same_rank_cards)
+        if bit == QUEEN_OF_SPADES:
+            danger_bound += weights.danger_queen_of_spades
+
+        return max(bound, danger_bound) + self.card_points
+
+    def _report(self, actions, value, spent_seconds):
+        self.last_plan_stats = {
+            'time_ms': spent_seconds * 1000,
+            'sequences': self.sequences,
+            'nodes': self.nodes,
+            'memo_hits': self.memo_hits,
+            'pruned': self.pruned,
+            'plan_length': len(actions),
+            'value': value,
+        }
+
+        if self.on_plan is not None:
+            self.on_plan(self.last_plan_stats)
@@ -0,0 +1,94 @@
+import csv
+import json
+from collections import deque
+from time import perf_counter_ns
+
+from src.const import PROFILER_WINDOW
+
+# phases of one iteration of the main loop, wait and tick are sleeping, the rest is the work of the frame
+PHASES = ('wait', 'events', 'ai', 'animation', 'draw', 'display', 'tick')
+SLEEP_PHASES = ('wait', 'tick')
+
+
+class FrameProfiler:
+    """
+        Times every phase of every frame with perf_counter_ns.
+
+        The main loop calls start_frame, then mark(phase) right after each phase, and end_frame. The profiler keeps
+        the last window frames for rolling percentiles, and with export_path it streams every frame to a file:
+        CSV if the path ends with .csv, JSON lines otherwise. All the times are in nanoseconds.
+    """
+
+    def __init__(self, window=PROFILER_WINDOW, export_path=None):
+        self.timings = {phase: deque(maxlen=window) for phase in PHASES + ('work',)}
+        self.frames = 0
+
+        self.current = dict.fromkeys(PHASES, 0)
+        self.last_mark_at = 0
+
+        self.export_file = None
+        self.csv_writer = None
+
+        if export_path is not None:
+            self.export_file = open(export_path, 'w', newline='')
+
+            if export_path.endswith('.csv'):
+                self.csv_writer = csv.writer(self.export_file)
+                self.csv_writer.writerow(('frame',) + PHASES + ('work',))
+
+    def start_frame(self):
+        for phase in PHASES:
+            self.current[phase] = 0
+
+        self.last_mark_at = perf_counter_ns()
+
+    def mark(self, phase):
+        """
+            Adds the time since the previous mark (or the start of the frame) to the phase.
+        """
+
+        now = perf_counter_ns()
+        self.current[phase] += now - self.last_mark_at
+        self.last_mark_at = now
+
+    def end_frame(self):
+        current = self.current
+        work = sum(current.values()) - sum(current[phase] for phase in SLEEP_PHASES)
+
+        for phase in PHASES:
+            self.timings[phase].append(current[phase])
+        self.timings['work'].append(work)
+
+        if self.csv_writer is not None:
+            self.csv_writer.writerow((self.frames,) + tuple(current[phase] for phase in PHASES) + (work,))
+        elif self.export_file is not None:
+            self.export_file.write(json.dumps({'frame': self.frames, **current, 'work': work}) + '\n')
+
+        self.frames += 1
+
+    def get_percentiles(self, phase, percentiles=(50, 95, 99)):
+        """
+            Returns the percentiles of the phase over the last frames, in milliseconds.
+        """
+
+        timings = sorted(self.timings[phase])
+        if not timings:
+            return tuple(0.0 for _ in percentiles)
+
+        last = len(timings) - 1
+        return tuple(timings[round(last * percentile / 100)] / 1_000_000 for percentile in percentiles)
+
+    def format_report(self):
+        lines = [f'{"phase":>9}   p50 ms   p95 ms   p99 ms']
+
+        for phase in PHASES + ('work',):
+            p50, p95, p99 = self.get_percentiles(phase)
+            lines.append(f'{phase:>9} {p50:8.2f} {p95:8.2f} {p99:8.2f}')
+
+        lines.append(f'{"frames":>9} {self.frames}')
+        return lines
+
+    def close(self):
+        if self.export_file is not None:
+            self.export_file.close()
+            self.export_file = None
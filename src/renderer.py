@@ -0,0 +1,90 @@
+import pygame as pg
+
+
+class DirtyRenderer:
+    """
+        Redraws only the parts of the screen, that have changed since the previous frame.
+
+        Every frame it gets the layers of sprites (anything with image and rect) from the bottom to the top,
+        compares them with what was drawn on the previous frame and restores from the background
+        only the areas of the sprites, that appeared, disappeared, moved or changed the image.
+    """
+
+    def __init__(self, screen: pg.Surface, background: pg.Surface):
+        self.screen = screen
+        self.background = background
+
+        self._drawn_sprites = {}  # sprite -> (rect, image) it had, when it was drawn the last time
+        self._damage = [screen.get_rect()]  # the first frame is drawn completely
+
+    def mark_dirty(self, rect):
+        self._damage.append(pg.Rect(rect))
+
+    def mark_all_dirty(self):
+        self._damage.append(self.screen.get_rect())
+
+    def render(self, layers) -> list:
+        """
+            Draws the changed areas and returns them, so they can be passed to pg.display.update.
+            Returns an empty list if nothing has changed.
+        """
+
+        damage = self._damage
+        sprites_to_draw = [sprite for layer in layers for sprite in layer]
+        drawn_sprites = {}
+
+        for sprite in sprites_to_draw:
+            drawn_sprites[sprite] = (sprite.rect.copy(), sprite.image)
+
+            previous = self._drawn_sprites.pop(sprite, None)
+            if previous is None:
+                damage.append(sprite.rect.copy())
+            elif previous[0] != sprite.rect or previous[1] is not sprite.image:
+                damage.append(previous[0])
+                damage.append(sprite.rect.copy())
+
+        damage.extend(rect for rect, _ in self._drawn_sprites.values())  # sprites, that are not shown anymore
+
+        self._drawn_sprites = drawn_sprites
+        self._damage = []
+
+        if not damage:
+            return []
+
+        screen_rect = self.screen.get_rect()
+        dirty_rects = [rect.clip(screen_rect) for rect in self._merge_rects(damage)]
+
+        for area in dirty_rects:
+            self.screen.set_clip(area)
+            self.screen.blit(self.background, area, area)
+
+            for sprite in sprites_to_draw:
+                if sprite.rect.colliderect(area):
+                    self.screen.blit(sprite.image, sprite.rect)
+
+        self.screen.set_clip(None)
+
+        return dirty_rects
+
+    @staticmethod
+    def _merge_rects(rects):
+        """
+            Joins overlapping rects, so that no pixel is drawn twice in one frame.
+        """
+
+        merged = []
+
+        for rect in rects:
+            rect = pg.Rect(rect)
+
+            i = 0
+            while i < len(merged):
+                if rect.colliderect(merged[i]):
+                    rect.union_ip(merged.pop(i))
+                    i = 0
+                else:
+                    i += 1
+
+            merged.append(rect)
+
+        return merged
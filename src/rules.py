@@ -0,0 +1,264 @@
+from src.const import USER, AGENT, DRAW, PASS, Rank, Suit, Effect, RANK_MASKS, SUIT_MASKS
+
+
+class RulesListener:
+    """
+        Receives notifications about everything that happens on the table.
+
+        RulesEngine does not know anything about the screen, so whoever wants to show the game
+        (GameController for example) subclasses this and animates the cards in the callbacks.
+    """
+
+    def on_cards_dealt(self):
+        pass
+
+    def on_card_played(self, player, card):
+        pass
+
+    def on_card_drawn(self, player, card):
+        pass
+
+    def on_action(self, player, action):
+        pass
+
+    def on_effect(self, effect, target_player):
+        pass
+
+    def on_game_over(self, winner):
+        pass
+
+
+class ListenerGroup(RulesListener):
+    """
+        Forwards every notification to several listeners, for example to the screen and to the game recorder.
+    """
+
+    def __init__(self, *listeners):
+        self.listeners = listeners
+
+    def on_cards_dealt(self):
+        for listener in self.listeners:
+            listener.on_cards_dealt()
+
+    def on_card_played(self, player, card):
+        for listener in self.listeners:
+            listener.on_card_played(player, card)
+
+    def on_card_drawn(self, player, card):
+        for listener in self.listeners:
+            listener.on_card_drawn(player, card)
+
+    def on_action(self, player, action):
+        for listener in self.listeners:
+            listener.on_action(player, action)
+
+    def on_effect(self, effect, target_player):
+        for listener in self.listeners:
+            listener.on_effect(effect, target_player)
+
+    def on_game_over(self, winner):
+        for listener in self.listeners:
+            listener.on_game_over(winner)
+
+
+class GameState:
+    def __init__(self, deck):
+        self.deck = deck
+
+        self.current_player_move = USER
+        self.game_is_over = False
+        self.winner = None
+
+        self.show_skip_button = True  # if True, current player is allowed to finish his move
+
+        self.can_through_only_by_rank = True  # this value represents if we have already made a move.
+        # if can_through_only_by_rank is True, that means that we can only through cards with the same rank, as on the table
+        #
+        # If we through QUEEN, now we can through up only cards with the rank of QUEEN, and can_through_only_by_rank will be True
+
+        self.can_get_new_card = False
+        self.six_in_action = False
+
+    def copy_with_deck(self, deck):
+        """
+            Returns the copy of the turn flags, that plays with another deck (for example with a guessed deal of the hidden cards).
+        """
+
+        state = GameState(deck)
+        state.__dict__.update({name: value for name, value in self.__dict__.items() if name != 'deck'})
+
+        return state
+
+    def get_player_cards(self, player):
+        return self.deck.user_cards if player == USER else self.deck.agent_cards
+
+    @staticmethod
+    def get_opponent(player):
+        return USER if player == AGENT else AGENT
+
+
+class RulesEngine:
+    """
+        Pure game logic of 101, with no pygame or display dependency.
+
+        Moves are applied with apply(action), where action is a Card from the hand of the current player,
+        DRAW (take a card from the deck) or PASS (finish the move).
+    """
+
+    def __init__(self, state: GameState, listener: RulesListener = None):
+        self.state = state
+        self.deck = state.deck
+        self.listener = listener if listener is not None else RulesListener()
+
+    def start_game(self):
+        self.deck.initialize_deck()
+        self.listener.on_cards_dealt()
+
+        self._check_the_effect_of_the_move()
+
+    def clone(self):
+        """
+            Returns the independent copy of the game without the listener, for example to let an agent think
+            on it in another thread.
+        """
+
+        return RulesEngine(self.state.copy_with_deck(self.deck.copy()))
+
+    def apply(self, action):
+        self.listener.on_action(self.state.current_player_move, action)
+
+        if action == DRAW:
+            self.draw_card()
+        elif action == PASS:
+            self.finish_move()
+        else:
+            self.make_a_move(action)
+
+    def can_make_move(self, chosen_card):
+        state = self.state
+
+        return self.deck.card_in_action is None \
+            or ((self.deck.card_in_action.suit == chosen_card.suit or chosen_card.rank == Rank.jack) and not state.can_through_only_by_rank) \
+            or self.deck.card_in_action.rank == chosen_card.rank
+
+    def get_possible_moves_mask(self, player=None):
+        """
+            Bitboard of the cards, that player (current player by default) can through right now.
+        """
+
+        player = self.state.current_player_move if player is None else player
+        hand_bits = self.state.get_player_cards(player).bits
+        card_in_action = self.deck.card_in_action
+
+        if card_in_action is None:
+            return hand_bits
+
+        allowed_cards = RANK_MASKS[card_in_action.rank]
+        if not self.state.can_through_only_by_rank:
+            allowed_cards |= SUIT_MASKS[card_in_action.suit] | RANK_MASKS[Rank.jack]
+
+        return hand_bits & allowed_cards
+
+    def get_possible_moves(self, player=None):
+        return self.deck.get_cards(self.get_possible_moves_mask(player))
+
+    def can_draw_card(self):
+        return self.state.can_get_new_card and self.deck.has_cards_to_draw()
+
+    def get_legal_actions(self):
+        actions = self.get_possible_moves()
+
+        if self.can_draw_card():
+            actions.append(DRAW)
+        if self.state.show_skip_button or not actions:
+            actions.append(PASS)
+
+        return actions
+
+    def make_a_move(self, card):
+        state = self.state
+        player = state.current_player_move
+
+        self.deck.deactivated_cards.append(self.deck.card_in_action)
+        state.get_player_cards(player).difference_update({card})
+        self.deck.card_in_action = card
+
+        self.listener.on_card_played(player, card)
+
+        self._check_the_effect_of_the_move()
+        self._check_if_game_is_over()
+
+    def draw_card(self):
+        state = self.state
+
+        self._player_gets_a_card_from_deck(state.current_player_move)
+
+        if not state.six_in_action:
+            state.can_get_new_card = False
+            state.show_skip_button = True
+
+    def finish_move(self):
+        state = self.state
+
+        state.current_player_move = state.get_opponent(state.current_player_move)
+        state.show_skip_button = False
+        state.can_get_new_card = True
+        state.can_through_only_by_rank = False
+
+    def _check_if_game_is_over(self):
+        if len(self.deck.agent_cards) == 0 or len(self.deck.user_cards) == 0:
+            self.state.game_is_over = True
+            self.state.winner = self.state.current_player_move
+
+            self.listener.on_game_over(self.state.winner)
+
+    def _check_the_effect_of_the_move(self):
+        state = self.state
+        card_in_action = self.deck.card_in_action
+
+        state.can_get_new_card = False
+        state.show_skip_button = True
+        state.can_through_only_by_rank = True
+        state.six_in_action = False
+
+        target_player = state.get_opponent(state.current_player_move)
+
+        if card_in_action.rank == Rank.ace:
+            self.listener.on_effect(Effect.opponent_skips_move, target_player)
+            self._opponent_skips_move()
+        elif card_in_action.rank == Rank.eight:
+            self.listener.on_effect(Effect.opponent_takes_one, target_player)
+            self._player_gets_a_card_from_deck(target_player)
+        elif card_in_action.rank == Rank.seven:
+            self.listener.on_effect(Effect.opponent_takes_two_and_skips, target_player)
+            for _ in range(2):
+                self._player_gets_a_card_from_deck(target_player)
+
+            self._opponent_skips_move()
+        elif card_in_action.suit == Suit.spades and card_in_action.rank == Rank.queen:
+            self.listener.on_effect(Effect.opponent_takes_five_and_skips, target_player)
+            for _ in range(5):
+                self._player_gets_a_card_from_deck(target_player)
+
+            self._opponent_skips_move()
+        elif card_in_action.rank == Rank.six:
+            self.listener.on_effect(Effect.six_must_be_covered, state.current_player_move)
+            state.six_in_action = True
+            state.can_get_new_card = True
+            state.show_skip_button = False
+            state.can_through_only_by_rank = False
+
+    def _player_gets_a_card_from_deck(self, player):
+        random_card = self.deck.get_random_card_from_deck()
+        if random_card is None:  # every card is already in somebody's hands
+            return
+
+        self.state.get_player_cards(player).add(random_card)
+        self.listener.on_card_drawn(player, random_card)
+
+    def _opponent_skips_move(self):
+        state = self.state
+
+        state.show_skip_button = False
+        state.can_get_new_card = True
+        state.can_through_only_by_rank = False
@@ -0,0 +1,253 @@
+from random import Random
+
+from src.card import CARDS_BY_BIT
+from src.const import USER, AGENT, DRAW, PASS, Rank, Suit, CARD_BITS, RANK_MASKS, SUIT_MASKS, iterate_bits
+from src.deck import Deck, CardSet, CardPile
+from src.rules import GameState, RulesEngine
+
+# turn flags, packed into one int
+ONLY_BY_RANK, SIX_IN_ACTION, CAN_GET_NEW_CARD, SHOW_SKIP_BUTTON = 1, 2, 4, 8
+
+
+def get_turn_flags(state):
+    """
+        The turn flags of GameState packed into one int.
+    """
+
+    return (ONLY_BY_RANK if state.can_through_only_by_rank else 0) | (SIX_IN_ACTION if state.six_in_action else 0) \
+        | (CAN_GET_NEW_CARD if state.can_get_new_card else 0) | (SHOW_SKIP_BUTTON if state.show_skip_button else 0)
+
+
+CARD_RANKS = {bit: rank for (rank, suit), bit in CARD_BITS.items()}
+CARD_SUITS = {bit: suit for (rank, suit), bit in CARD_BITS.items()}
+QUEEN_OF_SPADES = CARD_BITS[Rank.queen, Suit.spades]
+TAKEN_CARDS = {Rank.eight: 1, Rank.seven: 2}  # the opponent takes them (queen of spades: 5)
+SKIPPING_RANKS = (Rank.ace, Rank.seven)  # besides the queen of spades
+
+
+def _get_card_effect(bit):
+    rank = CARD_RANKS[bit]
+
+    taken_cards = 5 if bit == QUEEN_OF_SPADES else TAKEN_CARDS.get(rank, 0)
+    if bit == QUEEN_OF_SPADES or rank in SKIPPING_RANKS:
+        flags = CAN_GET_NEW_CARD  # the opponent skips the move, so the player goes on
+    elif rank == Rank.six:
+        flags = SIX_IN_ACTION | CAN_GET_NEW_CARD
+    else:
+        flags = ONLY_BY_RANK | SHOW_SKIP_BUTTON
+
+    return taken_cards, flags
+
+
+CARD_EFFECTS = {bit: _get_card_effect(bit) for bit in CARD_RANKS}  # bit -> (cards the opponent takes, turn flags after the card)
+ALLOWED_CARDS = {  # bit of the card in action -> (cards that can be thrown after a finished move, cards of the same rank)
+    bit: (RANK_MASKS[CARD_RANKS[bit]] | SUIT_MASKS[CARD_SUITS[bit]] | RANK_MASKS[Rank.jack], RANK_MASKS[CARD_RANKS[bit]])
+    for bit in CARD_RANKS
+}
+
+
+class SearchState:
+    """
+        Compact copy of the game for look-ahead search: actions are applied in place and taken back with undo.
+
+        The state is a few immutable values: the hands are bitboards, the draw pile is a tuple of card bits
+        with the number of cards left in it, the discard pile is a linked list of (bit, rest) pairs, and the turn
+        flags are packed into one int. So the undo token of apply is just the tuple of the previous values,
+        undo puts them back, and clone copies ten references.
+
+        The rng is never changed in place either: a reshuffle shuffles with a copy of it, so states sharing
+        an rng do not affect each other, and the cards drawn after a reshuffle are the same ones
+        as in the RulesEngine the state was taken from.
+    """
+
+    __slots__ = ('user_cards', 'agent_cards', 'deck_cards', 'deck_size', 'deactivated_cards', 'card_in_action',
+                 'current_player_move', 'flags', 'winner', 'rng')
+
+    @classmethod
+    def from_rules(cls, rules):
+        state = rules.state
+        deck = rules.deck
+
+        deactivated_cards = None
+        for card in deck.deactivated_cards:
+            deactivated_cards = (card.bit, deactivated_cards)
+
+        rng = Random()
+        rng.setstate(deck.rng.getstate())
+
+        flags = get_turn_flags(state)
+
+        return cls()._restore((
+            deck.user_cards.bits, deck.agent_cards.bits, tuple(card.bit for card in deck.deck_cards), len(deck.deck_cards),
+            deactivated_cards, deck.card_in_action.bit, state.current_player_move, flags, state.winner, rng,
+        ))
+
+    def to_rules(self):
+        """
+            Returns the RulesEngine (without a listener) in the same position, with the same future draws.
+        """
+
+        deck = Deck(Random())
+        deck.rng.setstate(self.rng.getstate())
+
+        deck.user_cards = CardSet(CARDS_BY_BIT[bit] for bit in iterate_bits(self.user_cards))
+        deck.agent_cards = CardSet(CARDS_BY_BIT[bit] for bit in iterate_bits(self.agent_cards))
+        deck.deck_cards = CardPile(CARDS_BY_BIT[bit] for bit in self.deck_cards[:self.deck_size])
+        deck.deactivated_cards = CardPile(CARDS_BY_BIT[bit] for bit in self._get_deactivated_cards())
+        deck.card_in_action = CARDS_BY_BIT[self.card_in_action]
+
+        state = GameState(deck)
+        state.current_player_move = self.current_player_move
+        state.game_is_over = self.winner is not None
+        state.winner = self.winner
+        state.can_through_only_by_rank = self.can_through_only_by_rank
+        state.six_in_action = self.six_in_action
+        state.can_get_new_card = self.can_get_new_card
+        state.show_skip_button = self.show_skip_button
+
+        return RulesEngine(state)
+
+    def clone(self):
+        return SearchState()._restore(self._get_token())
+
+    def apply(self, action):
+        """
+            Applies the action (a Card of the current player, DRAW or PASS) and returns the token, that takes it back.
+        """
+
+        token = (self.user_cards, self.agent_cards, self.deck_cards, self.deck_size, self.deactivated_cards,
+                 self.card_in_action, self.current_player_move, self.flags, self.winner, self.rng)  # _get_token, inlined on the hot path
+
+        if action == DRAW:
+            self._draw_card()
+        elif action == PASS:
+            self._finish_move()
+        else:
+            self._make_a_move(action.bit)
+
+        return token
+
+    def undo(self, token):
+        (self.user_cards, self.agent_cards, self.deck_cards, self.deck_size, self.deactivated_cards,
+         self.card_in_action, self.current_player_move, self.flags, self.winner, self.rng) = token
+
+    def get_possible_moves_mask(self):
+        hand = self.user_cards if self.current_player_move == USER else self.agent_cards
+        allowed_cards, same_rank_cards = ALLOWED_CARDS[self.card_in_action]
+
+        return hand & (same_rank_cards if self.flags & ONLY_BY_RANK else allowed_cards)
+
+    def get_legal_actions(self):
+        actions = [CARDS_BY_BIT[bit] for bit in iterate_bits(self.get_possible_moves_mask())]
+
+        if self.can_draw_card():
+            actions.append(DRAW)
+        if self.flags & SHOW_SKIP_BUTTON or not actions:
+            actions.append(PASS)
+
+        return actions
+
+    def can_draw_card(self):
+        return self.flags & CAN_GET_NEW_CARD and (self.deck_size != 0 or self.deactivated_cards is not None)
+
+    @property
+    def game_is_over(self):
+        return self.winner is not None
+
+    @property
+    def can_through_only_by_rank(self):
+        return bool(self.flags & ONLY_BY_RANK)
+
+    @property
+    def six_in_action(self):
+        return bool(self.flags & SIX_IN_ACTION)
+
+    @property
+    def can_get_new_card(self):
+        return bool(self.flags & CAN_GET_NEW_CARD)
+
+    @property
+    def show_skip_button(self):
+        return bool(self.flags & SHOW_SKIP_BUTTON)
+
+    def _get_token(self):
+        return (self.user_cards, self.agent_cards, self.deck_cards, self.deck_size, self.deactivated_cards,
+                self.card_in_action, self.current_player_move, self.flags, self.winner, self.rng)
+
+    def _restore(self, token):
+        self.undo(token)
+        return self
+
+    def _make_a_move(self, bit):
+        player = self.current_player_move
+
+        self.deactivated_cards = (self.card_in_action, self.deactivated_cards)
+        self.card_in_action = bit
+
+        if player == USER:
+            self.user_cards &= ~bit
+        else:
+            self.agent_cards &= ~bit
+
+        taken_cards, self.flags = CARD_EFFECTS[bit]
+        if taken_cards:
+            opponent = AGENT if player == USER else USER
+            for _ in range(taken_cards):
+                self._player_gets_a_card_from_deck(opponent)
+
+        if not self.user_cards or not self.agent_cards:
+            self.winner = player
+
+    def _draw_card(self):
+        self._player_gets_a_card_from_deck(self.current_player_move)
+
+        if not self.flags & SIX_IN_ACTION:
+            self.flags = self.flags & ~CAN_GET_NEW_CARD | SHOW_SKIP_BUTTON
+
+    def _finish_move(self):
+        self.current_player_move = AGENT if self.current_player_move == USER else USER
+        self.flags = self.flags & SIX_IN_ACTION | CAN_GET_NEW_CARD  # six_in_action stays, as in RulesEngine.finish_move
+
+    def _player_gets_a_card_from_deck(self, player):
+        if not self.deck_size:
+            self._reshuffle_the_deck()
+
+            if not self.deck_size:  # every card is already in somebody's hands
+                return
+
+        self.deck_size -= 1
+        bit = self.deck_cards[self.deck_size]
+
+        if player == USER:
+            self.user_cards |= bit
+        else:
+            self.agent_cards |= bit
+
+    def _reshuffle_the_deck(self):
+        if self.deactivated_cards is None:
+            return
+
+        cards = self._get_deactivated_cards()
+
+        rng = Random()
+        rng.setstate(self.rng.getstate())
+        rng.shuffle(cards)  # the same shuffle, as Deck makes with its rng, so the same cards are drawn
+
+        self.rng = rng
+        self.deck_cards = tuple(cards)
+        self.deck_size = len(cards)
+        self.deactivated_cards = None
+
+    def _get_deactivated_cards(self):
+        """
+            Bits of the discard pile, from the bottom to the top, like Deck.deactivated_cards.
+        """
+
+        cards = []
+        node = self.deactivated_cards
+        while node is not None:
+            cards.append(node[0])
+            node = node[1]
+
+        cards.reverse()
+        return cards
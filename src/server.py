@@ -0,0 +1,334 @@
+"""
+    Game server: many human vs agent games of 101 at once, over TCP or a Unix socket.
+
+    The protocol is JSON lines: every request and every response is one JSON object on its own line.
+    A request may carry an "id", that is copied to its response, so a client can send many requests
+    over one connection without waiting, the responses can come in another order.
+
+        {"op": "new", "seed": 7}                      starts a game (seed is optional)
+        {"op": "move", "session": 1, "action": 12}    makes a move: a card id from "legal", "DRAW" or "PASS"
+        {"op": "state", "session": 1}
+        {"op": "close", "session": 1}
+        {"op": "stats"}                               sessions, memory, moves, evictions
+
+    A card id is Card.id: suit_index * 9 + rank_index (the bit of the card in the bitboards of src.const),
+    so the cards are single numbers on the wire. After the move of the user the agent makes its whole move,
+    and the response lists its actions in "agent_actions". Errors are {"ok": false, "error": "..."}.
+"""
+
+import asyncio
+import gc
+import itertools
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+from types import FunctionType, ModuleType
+
+from src.agent import HeuristicAgent
+from src.const import USER, AGENT, DRAW, PASS
+from src.deck import Deck
+from src.rules import GameState, RulesEngine
+
+MAX_SESSIONS = 20000
+SESSION_IDLE_TIMEOUT_S = 600
+EVICTION_INTERVAL_S = 10
+AGENT_WORKERS = 4
+MAX_AGENT_ACTIONS = 200  # the agent can not make more actions in one move, it is just a guard
+
+SHARED_TYPES = (type, ModuleType, FunctionType)
+
+logger = logging.getLogger(__name__)
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Session:
+    def __init__(self, session_id, seed):
+        self.id = session_id
+        self.seed = seed
+
+        self.rules = RulesEngine(GameState(Deck(Random(seed))))
+        self.rules.start_game()
+        self.agent = HeuristicAgent(AGENT)
+
+        self.lock = asyncio.Lock()  # the requests of one session are handled one by one
+        self.last_active = time.monotonic()
+        self.moves = 0
+
+        self.memory_size = 0  # measured by GameServer in the agent executor, see GameServer._measure_memory_size
+        self.memory_is_stale = True  # the game has changed since memory_size was measured
+
+    def apply_user_action(self, action):
+        if self.rules.state.game_is_over:
+            raise ProtocolError('the game is over')
+
+        if self.rules.state.current_player_move != USER:
+            raise ProtocolError('it is not your move')
+
+        for legal_action in self.rules.get_legal_actions():
+            if encode_action(legal_action) == action:
+                self.rules.apply(legal_action)
+                self.moves += 1
+                return
+
+        raise ProtocolError(f'illegal action: {action}')
+
+    def play_agent_move(self):
+        """
+            Lets the agent make its actions, until it is the move of the user again. Runs in the agent executor.
+        """
+
+        state = self.rules.state
+        actions = []
+
+        while state.current_player_move == AGENT and not state.game_is_over and len(actions) < MAX_AGENT_ACTIONS:
+            action = self.agent.choose_action(self.rules)
+            self.rules.apply(action)
+            actions.append(encode_action(action))
+
+        return actions
+
+    def to_json(self):
+        state = self.rules.state
+        deck = self.rules.deck
+        is_user_move = state.current_player_move == USER and not state.game_is_over
+
+        return {
+            'session': self.id,
+            'player': state.current_player_move,
+            'hand': [encode_action(card) for card in sorted(deck.user_cards, key=lambda card: card.bit)],
+            'opponent_cards': len(deck.agent_cards),
+            'card_in_action': encode_action(deck.card_in_action) if deck.card_in_action is not None else None,
+            'deck': len(deck.deck_cards),
+            'legal': [encode_action(action) for action in self.rules.get_legal_actions()] if is_user_move else [],
+            'over': state.game_is_over,
+            'winner': state.winner,
+        }
+
+    def get_memory_size(self):
+        """
+            Estimated number of bytes, held by this session (the game and the agent).
+        """
+
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__) + get_deep_size((self.rules, self.agent))
+
+
+def encode_action(action):
+    if action in (DRAW, PASS):
+        return action
+
+    return action.id
+
+
+def get_deep_size(obj):
+    """
+        Sum of sys.getsizeof of everything reachable from obj, except classes, modules and functions.
+    """
+
+    seen = set()
+    size = 0
+    objects = [obj]
+
+    while objects:
+        new_objects = []
+
+        for o in objects:
+            if id(o) in seen or isinstance(o, SHARED_TYPES):
+                continue
+
+            seen.add(id(o))
+            size += sys.getsizeof(o)
+            new_objects.append(o)
+
+        objects = gc.get_referents(*new_objects)
+
+    return size
+
+
+class GameServer:
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_timeout_s=SESSION_IDLE_TIMEOUT_S, agent_workers=AGENT_WORKERS):
+        self.max_sessions = max_sessions
+        self.idle_timeout_s = idle_timeout_s
+
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.executor = ThreadPoolExecutor(max_workers=agent_workers, thread_name_prefix='agent')
+
+        self.moves = 0
+        self.evicted_sessions = 0
+
+    async def serve_tcp(self, host, port):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve_unix(self, path):
+        return await asyncio.start_unix_server(self.handle_connection, path)
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            writer.close()
+
+    async def _respond(self, line, writer):
+        request_id = None
+
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = await self.handle_request(request)
+        except ProtocolError as e:
+            response = {'ok': False, 'error': str(e)}
+        except (ValueError, AttributeError, TypeError):
+            response = {'ok': False, 'error': 'bad request'}
+        except Exception:
+            logger.exception('request failed: %r', line)
+            response = {'ok': False, 'error': 'internal'}
+
+        if request_id is not None:
+            response['id'] = request_id
+
+        if writer.is_closing():
+            return
+
+        writer.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+
+        try:
+            await writer.drain()  # a client, that does not read, is not let to fill the memory with the responses
+        except ConnectionError:
+            pass
+
+    async def handle_request(self, request):
+        op = request.get('op')
+
+        if op == 'new':
+            return await self._new_session(request.get('seed'))
+        if op == 'move':
+            return await self._move(self._get_session(request), request.get('action'))
+        if op == 'state':
+            return {'ok': True, **self._get_session(request).to_json()}
+        if op == 'close':
+            self.sessions.pop(self._get_session(request).id)
+            return {'ok': True}
+        if op == 'stats':
+            return {'ok': True, **self.get_stats()}
+
+        raise ProtocolError(f'unknown op: {op}')
+
+    def _get_session(self, request):
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise ProtocolError('no such session')
+
+        session.last_active = time.monotonic()
+        return session
+
+    async def _new_session(self, seed):
+        if len(self.sessions) >= self.max_sessions:
+            raise ProtocolError('too many sessions')
+
+        session_id = next(self.session_ids)
+        session = self.sessions[session_id] = Session(session_id, seed if seed is not None else Random().getrandbits(32))
+
+        async with session.lock:
+            await self._measure_memory_size(session)
+            agent_actions = await self._play_agent_move(session)  # some effects of the first card make the user skip the move
+
+        return {'ok': True, **session.to_json(), 'agent_actions': agent_actions}
+
+    async def _measure_memory_size(self, session):
+        """
+            Measures the memory of the session in the agent executor, so the walk over its objects does not block the event loop.
+            The caller holds the lock of the session.
+        """
+
+        session.memory_size = await asyncio.get_running_loop().run_in_executor(self.executor, session.get_memory_size)
+        session.memory_is_stale = False
+
+    async def measure_stale_sessions(self):
+        """
+            Measures again the memory of the sessions, that have made moves since they were measured.
+        """
+
+        for session in [session for session in self.sessions.values() if session.memory_is_stale]:
+            if session.id not in self.sessions:
+                continue  # closed or evicted meanwhile
+
+            async with session.lock:
+                await self._measure_memory_size(session)
+
+    async def _move(self, session, action):
+        async with session.lock:
+            session.apply_user_action(action)
+            self.moves += 1
+
+            agent_actions = await self._play_agent_move(session)
+            session.memory_is_stale = True
+
+        return {'ok': True, **session.to_json(), 'agent_actions': agent_actions}
+
+    async def _play_agent_move(self, session):
+        state = session.rules.state
+        if state.current_player_move != AGENT or state.game_is_over:
+            return []
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, session.play_agent_move)
+
+    def evict_idle_sessions(self, now=None):
+        now = time.monotonic() if now is None else now
+        idle_ids = [session_id for session_id, session in self.sessions.items() if now - session.last_active > self.idle_timeout_s]
+
+        for session_id in idle_ids:
+            del self.sessions[session_id]
+
+        self.evicted_sessions += len(idle_ids)
+        return len(idle_ids)
+
+    async def evict_idle_sessions_forever(self, interval_s=EVICTION_INTERVAL_S):
+        while True:
+            await asyncio.sleep(interval_s)
+            self.evict_idle_sessions()
+            await self.measure_stale_sessions()
+
+    def get_stats(self):
+        """
+            The memory is the sum of the sizes of the sessions, measured when a session is made,
+            and again every eviction interval, if the session has made moves since.
+        """
+
+        memory = sum(session.memory_size for session in self.sessions.values())
+
+        return {
+            'sessions': len(self.sessions),
+            'memory_bytes': memory,
+            'bytes_per_session': memory // len(self.sessions) if self.sessions else 0,
+            'moves': self.moves,
+            'evicted_sessions': self.evicted_sessions,
+        }
+
+
+async def run_server(host='127.0.0.1', port=8101, unix_path=None, **server_options):
+    game_server = GameServer(**server_options)
+    server = await (game_server.serve_unix(unix_path) if unix_path is not None else game_server.serve_tcp(host, port))
+    eviction = asyncio.create_task(game_server.evict_idle_sessions_forever())
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        eviction.cancel()
+        game_server.executor.shutdown(wait=False)
@@ -0,0 +1,37 @@
+from random import Random
+
+from src.const import USER, AGENT
+from src.deck import Deck
+from src.rules import GameState, RulesEngine
+
+MAX_ACTIONS_PER_GAME = 2000
+
+
+def play_headless_game(user_agent, agent_agent, max_actions=MAX_ACTIONS_PER_GAME, rng: Random = None, listener=None):
+    """
+        Plays one full game without a window, images or animation.
+
+        Returns the winner (USER or AGENT), or None if the game was not finished in max_actions actions.
+        The deal and the draws are made with rng, so a seeded rng replays the same game.
+    """
+
+    rules = RulesEngine(GameState(Deck(rng)), listener=listener)
+    rules.start_game()
+
+    return play_until_game_is_over(rules, {USER: user_agent, AGENT: agent_agent}, max_actions)
+
+
+def play_until_game_is_over(rules, agents, max_actions=MAX_ACTIONS_PER_GAME):
+    """
+        Continues the game of rules with agents (dict player -> agent) from any position.
+    """
+
+    state = rules.state
+
+    for _ in range(max_actions):
+        if state.game_is_over:
+            return state.winner
+
+        rules.apply(agents[state.current_player_move].choose_action(rules))
+
+    return state.winner
@@ -0,0 +1,156 @@
+import queue
+import threading
+
+import pygame as pg
+
+from src.const import Rank, Suit, RANKS, SUITS, CARD_SIZE
+
+
+class SurfaceCache:
+    """
+        Process-wide storage of the card images, already scaled to the card size.
+
+        Every image is decoded from the PNG (or taken from the asset pack) only once (a miss), all the sprites showing
+        the same card share one surface (a hit).
+
+        The surfaces are converted and stored only by the thread, that owns the display (get and take_preloaded),
+        the preloading thread only decodes the images and hands them over through a queue. Only converted surfaces
+        are cached: an image decoded before the video mode is set waits in _unconverted, until a get after set_mode.
+
+        misses counts the images decoded by get, preloaded the ones decoded by the preloading thread.
+    """
+
+    def __init__(self):
+        self._surfaces = {}
+        self._unconverted = {}  # decoded images, that could not be converted yet
+        self._preloaded = queue.SimpleQueue()  # (key, decoded image) from the preloading thread
+        self._lock = threading.Lock()  # guards the counters
+        self.asset_pack = None  # AssetPack with the images already decoded and scaled
+
+        self.hits = 0
+        self.misses = 0
+        self.preloaded = 0
+
+    def get(self, rank, suit, size=None):
+        size = CARD_SIZE if size is None else tuple(size)
+        key = (rank, suit, size)
+
+        surface = self._surfaces.get(key)
+        if surface is None:
+            self.take_preloaded()  # the preloading thread may have decoded it already
+            surface = self._surfaces.get(key)
+
+        if surface is not None:
+            with self._lock:
+                self.hits += 1
+            return surface
+
+        image = self._unconverted.get(key)
+        if image is not None:
+            with self._lock:
+                self.hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            image = self._decode(rank, suit, size)
+
+        return self._store(key, image)
+
+    def preload(self, size=None):
+        """
+            Loads all 36 cards and the back side, so that nothing is decoded in the middle of the game.
+        """
+
+        for suit in SUITS:
+            for rank in RANKS:
+                self.get(rank, suit, size)
+
+        self.get(Rank.back_side, Suit.back_side, size)
+
+    def preload_in_background(self, size=None):
+        """
+            Starts decoding all the cards in a daemon thread, so the window shows up without waiting for all the images.
+            The decoded images are stored by take_preloaded, that has to be called every frame. A card, that is needed
+            before the thread gets to it, is just loaded by the caller: at worst an image is decoded twice.
+        """
+
+        size = CARD_SIZE if size is None else tuple(size)
+        thread = threading.Thread(target=self._decode_all, args=(size,), name='surface-preload', daemon=True)
+        thread.start()
+
+        return thread
+
+    def take_preloaded(self):
+        """
+            Converts and stores the images decoded by the preloading thread so far.
+        """
+
+        while True:
+            try:
+                key, image = self._preloaded.get_nowait()
+            except queue.Empty:
+                return
+
+            if key not in self._surfaces:
+                self._store(key, image)
+
+    def _store(self, key, image):
+        """
+            Caches the converted image, or keeps it in _unconverted, while there is no video mode to convert it to.
+        """
+
+        if pg.display.get_surface() is None:
+            self._unconverted[key] = image
+            return image
+
+        self._unconverted.pop(key, None)
+        surface = self._surfaces[key] = image.convert_alpha()
+
+        return surface
+
+    def _decode_all(self, size):
+        cards = [(rank, suit) for suit in SUITS for rank in RANKS] + [(Rank.back_side, Suit.back_side)]
+
+        for rank, suit in cards:
+            key = (rank, suit, size)
+            if key not in self._surfaces and key not in self._unconverted:
+                image = self._decode(rank, suit, size)
+
+                with self._lock:
+                    self.preloaded += 1
+                self._preloaded.put((key, image))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'preloaded': self.preloaded,
+                'surfaces': len(self._surfaces),
+                'unconverted': len(self._unconverted),
+            }
+
+    def format_report(self):
+        stats = self.stats()
+        return [f"images decoded: {stats['misses']} on demand, {stats['preloaded']} preloaded, surface hits {stats['hits']}"]
+
+    @staticmethod
+    def get_picture_path(rank, suit):
+        if rank == Rank.back_side:
+            return 'src/img/back-side.png'
+
+        return f'src/img/cards/{rank}_of_{suit}.png'
+
+    @classmethod
+    def load_image(cls, rank, suit, size):
+        return pg.transform.scale(pg.image.load(cls.get_picture_path(rank, suit)), size)
+
+    def _decode(self, rank, suit, size):
+        image = self.asset_pack.get_card(rank, suit, size) if self.asset_pack is not None else None
+        if image is None:
+            image = self.load_image(rank, suit, size)
+
+        return image
+
+
+surface_cache = SurfaceCache()
@@ -0,0 +1,190 @@
+import json
+import os
+import time
+from multiprocessing import Pool
+from random import Random
+
+from src.agent import HeuristicAgent
+from src.const import USER, AGENT
+from src.simulation import play_headless_game
+from src.weights import HeuristicWeights, DEFAULT_WEIGHTS
+
+POPULATION_SIZE = 24
+ELITE_SIZE = 4  # the best individuals go to the next generation unchanged (but are played again)
+TOURNAMENT_SIZE = 3
+MUTATION_RATE = 0.3  # chance of every weight to be mutated
+MUTATION_SCALE = 0.25  # standard deviation of a mutation, relative to the size of the weight
+MIN_MUTATION_SIGMA = 10
+SEEDS_PER_TASK = 50  # every seed is played twice, the tuned agent takes both seats
+
+
+def evaluate_weights(task):
+    """
+        Worker function: plays the weights against the baseline weights on every seed, in both seats.
+        Returns the index of the individual, its wins, the number of the games and the time it took.
+    """
+
+    individual, vector, baseline_vector, seeds = task
+    weights = HeuristicWeights.from_vector(vector)
+    baseline = HeuristicWeights.from_vector(baseline_vector)
+
+    started_at = time.perf_counter()
+    wins = 0
+
+    for seed in seeds:
+        for seat in (USER, AGENT):
+            tuned_agent = HeuristicAgent(seat, weights=weights)
+            baseline_agent = HeuristicAgent(AGENT if seat == USER else USER, weights=baseline)
+            agents = {seat: tuned_agent, baseline_agent.player: baseline_agent}
+
+            wins += play_headless_game(agents[USER], agents[AGENT], rng=Random(seed)) == seat
+
+    return individual, wins, 2 * len(seeds), time.perf_counter() - started_at
+
+
+class GeneticTuner:
+    """
+        Genetic algorithm over the vector of HeuristicWeights.
+
+        The fitness of an individual is its win rate against the baseline weights. In one generation every
+        individual plays the same seeded deals (in both seats), so they are compared on equal terms. A deal is
+        played twice, so games_per_individual has to be at least 2, and an odd number is rounded down.
+        Every generation uses its own Random(seed, generation), and the state is saved to the checkpoint after every
+        generation, so an interrupted run, started again with the same checkpoint, goes on exactly as it would.
+    """
+
+    def __init__(self, checkpoint_path, games_per_individual=400, population_size=POPULATION_SIZE, seed=0, workers=None,
+                 baseline=DEFAULT_WEIGHTS):
+        if games_per_individual < 2:
+            raise ValueError(f'every individual has to play at least 2 games (one deal in both seats), not {games_per_individual}')
+
+        self.checkpoint_path = checkpoint_path
+        self.games_per_individual = games_per_individual
+        self.population_size = population_size
+        self.seed = seed
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.baseline_vector = baseline.to_vector()
+
+        self.generation = 0
+        self.population = None
+        self.best = None  # {'vector', 'fitness', 'generation'}
+        self.history = []
+
+        if os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+        else:
+            self.population = self._create_first_population()
+
+    def get_best_weights(self):
+        return HeuristicWeights.from_vector(self.best['vector'])
+
+    def run(self, generations, on_generation=None):
+        """
+            Runs the generations, that are left up to generations in total (the ones in the checkpoint are counted).
+        """
+
+        with Pool(self.workers) as pool:
+            while self.generation < generations:
+                rng = Random(self.seed * 1_000_003 + self.generation)
+
+                started_at = time.perf_counter()
+                fitness, games, cpu_seconds = self._evaluate(pool, rng)
+                seconds = time.perf_counter() - started_at
+
+                best_index = max(range(len(fitness)), key=fitness.__getitem__)
+                if self.best is None or fitness[best_index] > self.best['fitness']:
+                    self.best = {'vector': self.population[best_index], 'fitness': fitness[best_index], 'generation': self.generation}
+
+                stats = {
+                    'generation': self.generation,
+                    'best_fitness': fitness[best_index],
+                    'mean_fitness': sum(fitness) / len(fitness),
+                    'games': games,
+                    'games_per_second': games / seconds,
+                    'games_per_second_per_core': games / cpu_seconds,
+                }
+                self.history.append(stats)
+
+                self.population = self._create_next_population(fitness, rng)
+                self.generation += 1
+                self._save_checkpoint()
+
+                if on_generation is not None:
+                    on_generation(self, stats)
+
+    def _evaluate(self, pool, rng):
+        seeds = [rng.getrandbits(32) for _ in range(self.games_per_individual // 2)]
+        tasks = [
+            (individual, vector, self.baseline_vector, seeds[start:start + SEEDS_PER_TASK])
+            for individual, vector in enumerate(self.population)
+            for start in range(0, len(seeds), SEEDS_PER_TASK)
+        ]
+
+        wins = [0] * len(self.population)
+        games = [0] * len(self.population)
+        cpu_seconds = 0.0
+
+        for individual, task_wins, task_games, task_seconds in pool.imap_unordered(evaluate_weights, tasks):
+            wins[individual] += task_wins
+            games[individual] += task_games
+            cpu_seconds += task_seconds
+
+        return [w / g for w, g in zip(wins, games)], sum(games), cpu_seconds
+
+    def _create_first_population(self):
+        rng = Random(self.seed)
+        return [self.baseline_vector] + [self._mutate(self.baseline_vector, rng) for _ in range(self.population_size - 1)]
+
+    def _create_next_population(self, fitness, rng):
+        ranked = sorted(range(len(self.population)), key=lambda i: -fitness[i])
+        next_population = [self.population[i] for i in ranked[:ELITE_SIZE]]
+
+        while len(next_population) < self.population_size:
+            mother = self._select(fitness, rng)
+            father = self._select(fitness, rng)
+            child = [rng.choice(genes) for genes in zip(mother, father)]  # uniform crossover
+
+            next_population.append(self._mutate(child, rng))
+
+        return next_population
+
+    def _select(self, fitness, rng):
+        contenders = rng.sample(range(len(self.population)), TOURNAMENT_SIZE)
+        return self.population[max(contenders, key=fitness.__getitem__)]
+
+    @staticmethod
+    def _mutate(vector, rng):
+        return [
+            round(value + rng.gauss(0, max(abs(value) * MUTATION_SCALE, MIN_MUTATION_SIGMA))) if rng.random() < MUTATION_RATE else value
+            for value in vector
+        ]
+
+    def _save_checkpoint(self):
+        checkpoint = {
+            'seed': self.seed,
+            'games_per_individual': self.games_per_individual,
+            'baseline': self.baseline_vector,
+            'generation': self.generation,
+            'population': self.population,
+            'best': self.best,
+            'history': self.history,
+        }
+
+        temporary_path = self.checkpoint_path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(checkpoint, file)
+
+        os.replace(temporary_path, self.checkpoint_path)  # the old checkpoint stays whole, if the process is killed while writing
+
+    def _load_checkpoint(self):
+        with open(self.checkpoint_path) as file:
+            checkpoint = json.load(file)
+
+        self.seed = checkpoint['seed']
+        self.games_per_individual = checkpoint['games_per_individual']
+        self.baseline_vector = checkpoint['baseline']
+        self.generation = checkpoint['generation']
+        self.population = checkpoint['population']
+        self.population_size = len(self.population)
+        self.best = checkpoint['best']
+        self.history = checkpoint['history']
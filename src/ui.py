@@ -0,0 +1,111 @@
+import pygame as pg
+
+from src.const import Color, UI_FONT_NAME, UI_FONT_SIZE, UI_PANEL_FONT_NAME, UI_PANEL_FONT_SIZE
+from src.viewport import viewport
+
+
+class TextCache:
+    """
+        Resolves every system font only once and keeps every rendered text surface,
+        so the same text is never rasterized twice.
+    """
+
+    def __init__(self):
+        self._fonts = {}
+        self._surfaces = {}
+
+    def get_font(self, font_name=UI_FONT_NAME, size=UI_FONT_SIZE):
+        key = (font_name, size)
+
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = pg.font.SysFont(font_name, size)
+
+        return font
+
+    def render(self, text, font_name=UI_FONT_NAME, size=UI_FONT_SIZE, color=Color.LIGHT_RED, background=Color.WHITE):
+        key = (text, font_name, size, color, background)
+
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = self._surfaces[key] = self.get_font(font_name, size).render(text, True, color, background)
+
+        return surface
+
+
+text_cache = TextCache()
+
+
+class TextWidget(pg.sprite.Sprite):
+    """
+        Prebuilt line of text, that can be drawn as a sprite and knows its own rect for hit-testing.
+        center and size are logical, the text is rasterized right at the render scale.
+    """
+
+    def __init__(self, text, center, font_name=UI_FONT_NAME, size=UI_FONT_SIZE, color=Color.LIGHT_RED, background=Color.WHITE):
+        super().__init__()
+
+        self.center = viewport.to_render(center)
+        self.style = (font_name, viewport.scale_length(size), color, background)
+
+        self.text = None
+        self.set_text(text)
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+
+        self.text = text
+        self.image = text_cache.render(text, *self.style)
+        self.rect = self.image.get_rect(center=self.center)
+
+    def contains(self, pos) -> bool:
+        return self.rect.collidepoint(viewport.to_render(pos))
+
+
+class GameOverBanner(pg.sprite.Group):
+    def __init__(self, center):
+        x, y = center
+
+        self.title = TextWidget('GAME OVER', (x, y))
+        self.winner_text = TextWidget('', (x, y + 100))
+
+        super().__init__([self.title, self.winner_text])
+
+    def set_winner(self, winner_string):
+        self.winner_text.set_text(winner_string)
+
+
+class TextPanel(pg.sprite.Sprite):
+    """
+        Several lines of often changing text (like the profiler overlay). Its lines are not kept in the TextCache,
+        as the same text almost never comes back.
+    """
+
+    def __init__(self, topleft, size=UI_PANEL_FONT_SIZE, color=Color.BLACK, background=Color.WHITE):
+        super().__init__()
+
+        self.topleft = viewport.to_render(topleft)
+        self.font = text_cache.get_font(UI_PANEL_FONT_NAME, viewport.scale_length(size))
+        self.color = color
+        self.background = background
+
+        self.lines = None
+        self.set_lines([''])
+
+    def set_lines(self, lines):
+        if lines == self.lines:
+            return
+
+        self.lines = lines
+        line_surfaces = [self.font.render(line, True, self.color, self.background) for line in lines]
+
+        width = max(surface.get_width() for surface in line_surfaces)
+        line_height = self.font.get_linesize()
+
+        self.image = pg.Surface((width, line_height * len(lines))).convert()
+        self.image.fill(self.background)
+        for i, surface in enumerate(line_surfaces):
+            self.image.blit(surface, (0, i * line_height))
+
+        self.rect = self.image.get_rect(topleft=self.topleft)
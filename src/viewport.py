@@ -0,0 +1,37 @@
+from src.const import Point, LOGICAL_SIZE, RENDER_SCALE
+
+
+class Viewport:
+    """
+        Maps the logical coordinates (LOGICAL_SIZE, in which the whole layout is written) to the pixels
+        of the render surface, that is render_scale times bigger or smaller.
+
+        The window shows the render surface with pg.SCALED, so the frame is scaled to the window only once,
+        by SDL, and the mouse positions come back in the pixels of the render surface.
+    """
+
+    def __init__(self, render_scale=RENDER_SCALE):
+        self.render_scale = None
+        self.render_size = None
+
+        self.set_render_scale(render_scale)
+
+    def set_render_scale(self, render_scale):
+        self.render_scale = render_scale
+        self.render_size = self.scale_size(LOGICAL_SIZE)
+
+    def scale_size(self, size):
+        width, height = size
+        return max(1, round(width * self.render_scale)), max(1, round(height * self.render_scale))
+
+    def scale_length(self, length):
+        return max(1, round(length * self.render_scale))
+
+    def to_render(self, pos):
+        return round(pos[0] * self.render_scale), round(pos[1] * self.render_scale)
+
+    def to_logical(self, pos):
+        return Point(pos[0] / self.render_scale, pos[1] / self.render_scale)
+
+
+viewport = Viewport()
@@ -0,0 +1,64 @@
+import json
+
+from src.const import RANKS, CARDS_POINTS_BY_RANK
+
+
+class HeuristicWeights:
+    """
+        The points, HeuristicAgent values the moves with.
+
+        rank_points - initial points of a card by its rank (CARDS_POINTS_BY_RANK by default),
+        the rest are the bonuses and penalties of _value_the_move and _value_the_move_in_danger_situation.
+        Weights are kept in JSON files, and can be turned into a flat vector and back for the optimizer.
+    """
+
+    SCALARS = (
+        'queen_of_spades',  # bonus for the queen of spades
+        'same_rank',  # bonus for every other card of the same rank, that can be thrown up after the move
+        'lonely_suit',  # penalty for throwing the last card of a suit
+        'six_sequence',  # bonus for every card of the sequence, that covers a six
+        'danger_seven',  # in danger: bonus for every seven
+        'danger_eight',  # in danger: bonus for every eight
+        'danger_queen_of_spades',
+        'danger_lonely_suit',
+    )
+
+    def __init__(self, rank_points=None, queen_of_spades=150, same_rank=60, lonely_suit=70, six_sequence=60,
+                 danger_seven=250, danger_eight=120, danger_queen_of_spades=350, danger_lonely_suit=70):
+        self.rank_points = dict(CARDS_POINTS_BY_RANK if rank_points is None else rank_points)
+
+        self.queen_of_spades = queen_of_spades
+        self.same_rank = same_rank
+        self.lonely_suit = lonely_suit
+        self.six_sequence = six_sequence
+        self.danger_seven = danger_seven
+        self.danger_eight = danger_eight
+        self.danger_queen_of_spades = danger_queen_of_spades
+        self.danger_lonely_suit = danger_lonely_suit
+
+    def to_dict(self):
+        return {'rank_points': dict(self.rank_points), **{name: getattr(self, name) for name in self.SCALARS}}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    def to_vector(self):
+        return [self.rank_points[rank] for rank in RANKS] + [getattr(self, name) for name in self.SCALARS]
+
+    @classmethod
+    def from_vector(cls, vector):
+        rank_points = dict(zip(RANKS, vector[:len(RANKS)]))
+        return cls(rank_points, **dict(zip(cls.SCALARS, vector[len(RANKS):])))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=4)
+
+
+DEFAULT_WEIGHTS = HeuristicWeights()
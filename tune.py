@@ -0,0 +1,45 @@
+import argparse
+import os
+from functools import partial
+
+from src.tuner import GeneticTuner, POPULATION_SIZE
+
+
+def parse_games(value):
+    games = int(value)
+    if games < 2:
+        raise argparse.ArgumentTypeError('every individual has to play at least 2 games: one deal in both seats')
+
+    return games
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='tunes the weights of the heuristic agent with a genetic algorithm on self-play games')
+    parser.add_argument('--generations', type=int, default=50, help='total number of generations, including the ones in the checkpoint')
+    parser.add_argument('--population', type=int, default=POPULATION_SIZE)
+    parser.add_argument('--games', type=parse_games, default=400, help='games of every individual in every generation, at least 2, an odd number is rounded down (every deal is played in both seats)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', default='tuning_checkpoint.json', help='the run goes on from this file, if it exists')
+    parser.add_argument('--output', default='weights.json', help='the best weights are written here after every generation')
+
+    return parser.parse_args()
+
+
+def print_generation(output_path, tuner, stats):
+    print(f"generation {stats['generation']}: best {stats['best_fitness']:.1%}, mean {stats['mean_fitness']:.1%}, "
+          f"{stats['games_per_second']:.0f} games/s, {stats['games_per_second_per_core']:.0f} games/s per core")
+
+    tuner.get_best_weights().save(output_path)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    tuner = GeneticTuner(args.checkpoint, games_per_individual=args.games, population_size=args.population, seed=args.seed, workers=args.workers)
+    if tuner.generation:
+        print(f'resuming from generation {tuner.generation}')
+
+    tuner.run(args.generations, on_generation=partial(print_generation, args.output))
+
+    print(f"best: {tuner.best['fitness']:.1%} against the baseline (generation {tuner.best['generation']}), written to {args.output}")